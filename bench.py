@@ -0,0 +1,375 @@
+"""Benchmark pentru joc.py: camere cu boți care intră, plasează bombe, se mișcă și scriu pe chat.
+
+Boții folosesc clientul de test Flask (fără rețea HTTP), iar mesajele trec fie printr-un
+broker în proces care imită API-ul pika.BlockingConnection (--transport fake), fie prin
+RabbitMQ-ul local (--transport rabbitmq). Rezultatul (latențe p50/p99 și operații pe
+secundă per endpoint și per consumer) e un JSON, ca rulările pe commit-uri diferite să
+poată fi comparate:
+
+    python bench.py --rooms 8 --players 4 --duration 20 --output rezultat.json
+"""
+import argparse
+import collections
+import functools
+import heapq
+import json
+import os
+import random
+import subprocess
+import threading
+import time
+import types
+
+# Logurile fiecărui mesaj ar încetini chiar lucrul măsurat
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import joc
+
+DIRECTIONS = ('UP', 'DOWN', 'LEFT', 'RIGHT')
+
+# BROKER ÎN PROCES (TRANSPORT 'fake')
+
+# Implementează doar partea din pika pe care o folosește joc.py: exchange-uri topic/fanout
+# și coada implicită, consume() cu inactivity_timeout, ack-uri ignorate. Mesajele
+# neconfirmate nu se relivrează și x-single-active-consumer nu e impus.
+
+def topic_match(pattern, key):
+    words, parts = pattern.split('.'), key.split('.')
+
+    def match(i, j):
+        if i == len(words):
+            return j == len(parts)
+        if words[i] == '#':
+            return any(match(i + 1, k) for k in range(j, len(parts) + 1))
+        if j == len(parts):
+            return False
+        return words[i] in ('*', parts[j]) and match(i + 1, j + 1)
+
+    return match(0, 0)
+
+class FakeBroker:
+    """Cozile și legăturile comune tuturor conexiunilor false din proces"""
+
+    def __init__(self):
+        self.queues = collections.defaultdict(collections.deque)
+        self.bindings = collections.defaultdict(set)    # exchange -> {(pattern, coadă)}
+        self.exchanges = {}
+        self.routes = {}                                # (exchange, routing key) -> cozi
+        self.changed = threading.Condition()
+
+    def bind(self, exchange, pattern, queue_name):
+        with self.changed:
+            self.bindings[exchange].add((pattern, queue_name))
+            self.routes.clear()
+
+    def unbind(self, exchange, pattern, queue_name):
+        with self.changed:
+            self.bindings[exchange].discard((pattern, queue_name))
+            self.routes.clear()
+
+    def route(self, exchange, routing_key):
+        key = (exchange, routing_key)
+        targets = self.routes.get(key)
+        if targets is None:
+            kind = self.exchanges.get(exchange, 'direct')
+            targets = self.routes[key] = [
+                queue_name for pattern, queue_name in self.bindings[exchange]
+                if kind == 'fanout' or (kind == 'topic' and topic_match(pattern, routing_key)) or pattern == routing_key
+            ]
+        return targets
+
+    def publish(self, exchange, routing_key, properties, body):
+        with self.changed:
+            targets = [routing_key] if exchange == '' else self.route(exchange, routing_key)
+            for queue_name in targets:
+                self.queues[queue_name].append((routing_key, properties, body))
+            self.changed.notify_all()
+
+    def get(self, queue_name, timeout):
+        with self.changed:
+            messages = self.queues[queue_name]
+            if not messages:
+                self.changed.wait(timeout)
+            return messages.popleft() if messages else None
+
+broker = FakeBroker()
+
+class FakeChannel:
+    def __init__(self, connection):
+        self.connection = connection
+        self.is_open = True
+        self._tag = 0
+
+    def confirm_delivery(self):
+        pass
+
+    def exchange_declare(self, exchange, exchange_type='direct', durable=False, **kwargs):
+        broker.exchanges[exchange] = exchange_type
+
+    def queue_declare(self, queue='', **kwargs):
+        broker.queues[queue]
+        return types.SimpleNamespace(method=types.SimpleNamespace(queue=queue, message_count=len(broker.queues[queue])))
+
+    def queue_bind(self, queue, exchange, routing_key=None, **kwargs):
+        broker.bind(exchange, routing_key or '', queue)
+
+    def queue_unbind(self, queue, exchange, routing_key=None, **kwargs):
+        broker.unbind(exchange, routing_key or '', queue)
+
+    def basic_qos(self, prefetch_count=0, **kwargs):
+        pass
+
+    def basic_publish(self, exchange, routing_key, body, properties=None, mandatory=False):
+        broker.publish(exchange, routing_key, properties, body)
+
+    def basic_ack(self, delivery_tag=0, multiple=False):
+        pass
+
+    def consume(self, queue, inactivity_timeout=None, **kwargs):
+        while self.is_open:
+            message = broker.get(queue, inactivity_timeout or 1)
+            if message is None:
+                yield None, None, None
+                continue
+            routing_key, properties, body = message
+            self._tag += 1
+            method = types.SimpleNamespace(delivery_tag=self._tag, routing_key=routing_key, redelivered=False)
+            yield method, properties or joc.pika.BasicProperties(), body
+
+    def cancel(self):
+        return 0
+
+    def close(self):
+        self.is_open = False
+
+class FakeConnection:
+    """Înlocuitor pentru pika.BlockingConnection"""
+
+    def __init__(self, parameters=None):
+        self.is_open = True
+
+    def channel(self):
+        return FakeChannel(self)
+
+    def process_data_events(self, time_limit=0):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+TRANSPORTS = {
+    'fake': FakeConnection,
+    'rabbitmq': joc.pika.BlockingConnection,
+}
+
+# MĂSURĂTORI
+
+class Recorder:
+    """Latențele fiecărei operații, grupate pe nume (endpoint sau consumer)"""
+
+    def __init__(self):
+        self.samples = collections.defaultdict(list)
+        self.statuses = collections.defaultdict(collections.Counter)
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds, status=None):
+        with self._lock:
+            self.samples[name].append(seconds)
+            if status is not None:
+                self.statuses[name][status] += 1
+
+    def summary(self, elapsed):
+        result = {}
+        for name, samples in sorted(self.samples.items()):
+            ordered = sorted(samples)
+            result[name] = {
+                'count': len(ordered),
+                'ops_per_sec': round(len(ordered) / elapsed, 1),
+                'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+                'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+                'max_ms': round(ordered[-1] * 1000, 3),
+            }
+            if name in self.statuses:
+                result[name]['status'] = {str(code): count for code, count in sorted(self.statuses[name].items())}
+        return result
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def timed_handler(recorder, name, handler):
+    """Handler-ul consumer-ului, cu durata fiecărui apel înregistrată"""
+    @functools.wraps(handler)
+    def wrapper(data):
+        started = time.perf_counter()
+        try:
+            return handler(data)
+        finally:
+            recorder.add(name, time.perf_counter() - started)
+    return wrapper
+
+# BOȚI
+
+class RoomBots:
+    """Boții unei camere, conduși de un singur thread după un orar de evenimente"""
+
+    def __init__(self, room_id, players, rates, endpoints, rng):
+        self.room_id = room_id
+        self.players = [f'bot{i}' for i in range(players)]
+        self.rates = rates
+        self.endpoints = endpoints
+        self.rng = rng
+        self.client = joc.app.test_client()
+        self.state = {}
+
+    def call(self, name, method, path, **kwargs):
+        started = time.perf_counter()
+        response = getattr(self.client, method)(path, **kwargs)
+        self.endpoints.add(name, time.perf_counter() - started, response.status_code)
+        return response
+
+    def post(self, name, path, data):
+        return self.call(name, 'post', path, json={'room': self.room_id, **data})
+
+    def poll(self, player):
+        response = self.call('GET /api/state', 'get', f'/api/state?room={self.room_id}&player={player}')
+        if response.status_code == 200:
+            self.state = response.get_json()
+
+    def setup(self):
+        """Intrarea tuturor boților și bombele lor; jocul pornește după ultima bombă"""
+        for player in self.players:
+            self.post('POST /api/join', '/api/join', {'name': player})
+        self.wait_for(lambda state: len(state.get('players', {})) >= len(self.players))
+        size = self.state.get('grid_size', joc.GRID_SIZE)
+        for player in self.players:
+            for _ in range(joc.MAX_BOMBS):
+                x, y = self.rng.randrange(size), self.rng.randrange(size)
+                self.post('POST /api/place_bomb', '/api/place_bomb', {'player': player, 'x': x, 'y': y})
+
+    def wait_for(self, condition, timeout=5):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            self.poll(self.players[0])
+            if condition(self.state):
+                return True
+            time.sleep(0.01)
+        return False
+
+    def run(self, deadline):
+        self.setup()
+        now = time.time()
+        # (momentul următor, tip, interval) pentru fiecare fel de operație cu rată nenulă
+        schedule = [(now, kind, 1 / rate) for kind, rate in self.rates.items() if rate > 0]
+        heapq.heapify(schedule)
+        while schedule:
+            at, kind, interval = heapq.heappop(schedule)
+            if at >= deadline:
+                break
+            delay = at - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            getattr(self, kind)()
+            heapq.heappush(schedule, (at + interval, kind, interval))
+
+    def polls(self):
+        self.poll(self.rng.choice(self.players))
+
+    def moves(self):
+        phase = self.state.get('phase')
+        if phase == 'finished':
+            self.post('POST /api/reset', '/api/reset', {})
+            self.setup()
+        elif phase == 'playing' and self.state.get('current_turn') in self.players:
+            self.post('POST /api/move', '/api/move', {
+                'player': self.state['current_turn'],
+                'direction': self.rng.choice(DIRECTIONS)
+            })
+
+    def chats(self):
+        self.post('POST /api/chat', '/api/chat', {
+            'player': self.rng.choice(self.players),
+            'message': 'gg'
+        })
+
+# MAIN
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def run(args):
+    joc.pika.BlockingConnection = TRANSPORTS[args.transport]
+    joc.RABBITMQ_HOST = args.host
+
+    handlers = Recorder()
+    for table in (joc.CONSUMERS, joc.CHAT_CONSUMERS, joc.STATS_CONSUMERS):
+        for config in table.values():
+            handler = config['handler']
+            if not hasattr(handler, '__wrapped__'):
+                config['handler'] = timed_handler(handlers, handler.__name__, handler)
+    joc.run_all()
+
+    endpoints = Recorder()
+    rates = {'polls': args.poll_rate, 'moves': args.move_rate, 'chats': args.chat_rate}
+    deadline = time.time() + args.duration
+    bots = [
+        RoomBots(f'bench{i}', args.players, rates, endpoints, random.Random(args.seed + i))
+        for i in range(args.rooms)
+    ]
+    threads = [threading.Thread(target=room.run, args=(deadline,), daemon=True) for room in bots]
+    started = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - started
+    joc.async_publisher.flush(timeout=10)
+
+    return {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'transport': args.transport,
+        'config': {
+            'rooms': args.rooms,
+            'players': args.players,
+            'duration': args.duration,
+            'poll_rate': args.poll_rate,
+            'move_rate': args.move_rate,
+            'chat_rate': args.chat_rate,
+            'codec': joc.MESSAGE_CODEC,
+            'shards': joc.STATE_SHARDS,
+        },
+        'elapsed': round(elapsed, 3),
+        'endpoints': endpoints.summary(elapsed),
+        'consumers': handlers.summary(elapsed),
+        'publisher': joc.async_publisher.snapshot(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark pentru joc.py')
+    parser.add_argument('--transport', choices=sorted(TRANSPORTS), default='fake')
+    parser.add_argument('--host', default=joc.RABBITMQ_HOST, help='brokerul pentru --transport rabbitmq')
+    parser.add_argument('--rooms', type=int, default=4)
+    parser.add_argument('--players', type=int, default=4, help='boți per cameră')
+    parser.add_argument('--duration', type=float, default=10, help='secunde de încărcare')
+    parser.add_argument('--poll-rate', type=float, default=20, help='cereri /api/state pe secundă per cameră')
+    parser.add_argument('--move-rate', type=float, default=10, help='mutări pe secundă per cameră')
+    parser.add_argument('--chat-rate', type=float, default=1, help='mesaje de chat pe secundă per cameră')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='fișierul JSON (implicit stdout)')
+    args = parser.parse_args()
+
+    result = json.dumps(run(args), indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(result + '\n')
+    else:
+        print(result)
+
+if __name__ == '__main__':
+    main()
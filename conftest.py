@@ -0,0 +1,2 @@
+# Testele importă modulele din rădăcina proiectului (joc, joc_asgi, bench): pytest pune
+# directorul acestui fișier în sys.path, deci merge și `pytest`, nu doar `python -m pytest`.
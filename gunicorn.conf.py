@@ -0,0 +1,21 @@
+# Front-end-uri de producție: gunicorn -c gunicorn.conf.py joc:app
+#
+# Fiecare proces gunicorn e un front-end 'web' (ca python joc.py web): nu deține
+# nicio cameră, publică comenzile pe RabbitMQ și servește snapshot-urile primite de
+# la workeri (python joc.py worker), deci toate procesele văd același joc.
+import os
+
+bind = os.environ.get('JOC_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('JOC_WEB_WORKERS', 4))
+# Stream-urile SSE țin câte un thread cât timp clientul e conectat
+worker_class = 'gthread'
+threads = int(os.environ.get('JOC_WEB_THREADS', 64))
+timeout = 60
+# Fiecare proces importă joc.py după fork: PROCESS_ID (și cozile exclusive de
+# snapshot-uri / chat legate de el) trebuie să fie diferite pentru fiecare
+preload_app = False
+
+
+def post_worker_init(worker):
+    import joc
+    joc.run_web()
@@ -1,15 +1,85 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import pika
+import atexit
+import base64
+import collections
+import contextlib
+import gzip
+import heapq
+import itertools
 import json
+import logging
+import logging.handlers
+import os
+import queue
 import random
+import socket
+import struct
+import sys
 import threading
 import time
+import zlib
+import argparse
+import bisect
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Backend-uri opționale pentru mesajele din cozi; fără ele se folosește json din stdlib
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 app = Flask(__name__)
 
 # CONFIGURARE
 
 RABBITMQ_HOST = 'localhost'
+PUBLISHER_POOL_SIZE = int(os.environ.get('PUBLISHER_POOL_SIZE', 4))  # Conexiuni persistente pentru publicarea sincronă
+PUBLISHER_IDLE_CHECK = 30       # Secunde după care un canal inactiv e verificat
+PUBLISH_QUEUE_MAXSIZE = 10000   # Mesaje în așteptare în pipeline-ul asincron
+PUBLISH_BATCH_SIZE = 100        # Mesaje publicate per lot
+PUBLISH_THREADS = 4             # Benzi de publicare în paralel, fiecare cu canalul ei cu confirmări
+PUBLISH_BACKPRESSURE = 'block'  # 'block' | 'drop_new' | 'drop_oldest'
+PUBLISH_BLOCK_TIMEOUT = 0.5     # Cât așteaptă un handler când coada e plină ('block')
+CONSUMER_BACKOFF_MIN = 0.5      # Prima pauză înainte de reconectarea unui consumer
+CONSUMER_BACKOFF_MAX = 30       # Pauza maximă între reconectări
+ACTOR_BATCH_SIZE = 64           # Comenzi aplicate înainte de a publica un nou snapshot
+ACTOR_CALL_TIMEOUT = 5          # Cât așteaptă un apelant rezultatul unei comenzi
+STATS_FLUSH_INTERVAL = 2        # Secunde între agregările statisticilor
+STATS_WINDOW = 600              # Fereastra glisantă a statisticilor (secunde)...
+STATS_BUCKET = 60               # ...împărțită în găleți de atâtea secunde
+STATE_HISTORY = 256             # Versiuni de stare păstrate pentru răspunsuri delta
+CHAT_HISTORY = 40               # Mesaje de chat păstrate per cameră (inel circular)
+CHAT_RATE = 1.0                 # Mesaje de chat pe secundă permise unui jucător...
+CHAT_BURST = 5                  # ...cu rafale de până la atâtea mesaje
+CHAT_MAX_LENGTH = 200
+PLAYER_NAME_MAX_LENGTH = 15      # Ca maxlength-ul câmpului din pagină
+STREAM_KEEPALIVE = 5            # Secunde între ping-urile SSE (detectează clienții plecați)
+PLAYER_TIMEOUT = 10             # Secunde fără semn de viață până la eliminare
+FOUND_ITEM_TTL = 3              # Secunde cât rămâne afișat un item găsit
+TURN_TIMEOUT = 15               # Secunde pentru o mutare; apoi tura trece la următorul (0 = fără limită)
+EVENT_LOG_DIR = os.environ.get('EVENT_LOG_DIR')  # Jurnalul durabil al comenzilor (nesetat = doar în memorie)
+EVENT_LOG_COMMIT_INTERVAL = 0.05  # Secunde între fsync-uri: comenzile se scriu pe disc în loturi
+EVENT_LOG_SEGMENT_RECORDS = 50000  # Înregistrări per segment; la rotire se scrie starea camerelor
+STATE_SHARDS = 8                # Thread-uri actor / cozi de comenzi; camera -> shard prin hash
+DEFAULT_ROOM = 'lobby'          # Camera folosită când clientul nu trimite una
+ROOM_IDLE_TIMEOUT = 300         # Camerele goale sunt eliminate după atâtea secunde
+ROOM_FINISHED_TTL = 120         # Camerele cu jocul terminat sunt eliminate după atâtea secunde
+MESSAGE_CODEC = os.environ.get('MESSAGE_CODEC', 'json')  # 'json' | 'msgpack' | 'binary' (mișcări împachetate)
+ROOM_SEED = os.environ.get('ROOM_SEED')  # Dacă e setat, fiecare cameră are un RNG determinist (teste reproductibile)
+WORKER_HEARTBEAT = 2            # Secunde între anunțurile de prezență ale workerilor
+WORKER_TIMEOUT = 6              # Un worker fără anunț de atâta timp e considerat mort
+HANDOVER_TIMEOUT = 10           # Cât așteaptă noul deținător al unui shard predarea de la cel vechi
+RING_REPLICAS = 64              # Noduri virtuale per worker în inelul de hash consistent
+PROCESS_ID = f'{socket.gethostname()}-{os.getpid()}'
+METRICS_PORT = int(os.environ.get('METRICS_PORT', 9100))  # /metrics al unui worker (nu servește HTTP altfel; 0 = oprit)
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')    # DEBUG afișează fiecare mesaj / comandă
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')  # 'text' (câmpuri cheie=valoare) | 'json'
 
 # 5 Cozi RabbitMQ - Fiecare pentru un tip de mesaj
 QUEUE_STATISTICS = 'game_statistics'  # Statistici joc
@@ -18,209 +88,2342 @@ QUEUE_MOVES = 'game_moves'            # Mișcări jucători
 QUEUE_CHAT = 'game_chat'              # Mesaje chat
 QUEUE_ACTIONS = 'game_actions'        # Acțiuni generale
 
-GRID_SIZE = 15
+# Comenzile (mișcări, chat, acțiuni) trec printr-un exchange topic, câte o coadă per
+# shard: routing key = '<coadă>.<shard>', iar shard-ul se calculează din id-ul camerei
+EXCHANGE_GAME = 'game_commands'
+COMMAND_QUEUES = (QUEUE_MOVES, QUEUE_CHAT, QUEUE_ACTIONS)
+
+# Mod distribuit: workerii publică starea camerelor pe EXCHANGE_SNAPSHOTS ('snapshot.<shard>'),
+# iar prezența lor pe EXCHANGE_WORKERS (fanout); front-end-urile și ceilalți workeri ascultă
+EXCHANGE_SNAPSHOTS = 'game_snapshots'
+EXCHANGE_WORKERS = 'game_workers'
+# Chat-ul jucătorilor ocolește starea jocului: 'chat.<cameră>' ajunge la fiecare front-end
+EXCHANGE_CHAT = 'game_chat_fanout'
+# Evenimentele pentru statistici ajung la fiecare front-end, care le agregă pentru /api/stats
+EXCHANGE_STATS = 'game_stats_fanout'
+EXCHANGE_TYPES = {EXCHANGE_GAME: 'topic', EXCHANGE_SNAPSHOTS: 'topic', EXCHANGE_WORKERS: 'fanout', EXCHANGE_CHAT: 'topic',
+                  EXCHANGE_STATS: 'fanout'}
+
+GRID_SIZE = 15                  # Mărimea implicită; fiecare cameră o poate alege la primul join
+GRID_MIN_SIZE = 10
+GRID_MAX_SIZE = 1000
+VIEWPORT_SIZE = 15              # Latura zonei din grilă trimise unui client
+VIEWPORT_MAX = 64               # Cea mai mare zonă pe care o poate cere un client
+PROJECTION_CACHE_SIZE = 256     # Răspunsuri per jucător păstrate pentru fiecare versiune a unei camere
+GZIP_MIN_SIZE = 1024            # Răspunsurile mai mici nu merită comprimate
+GZIP_LEVEL = 6
 MAX_BOMBS = 5
 PLAYER_EMOJIS = ['❤️', '⭐', '🌙', '🔥', '💎', '🌸', '🎵', '🦋']
 
+# Codurile celulelor din harta compactă (un octet per celulă)
+CELL_EMPTY = 0
+CELL_BOMB = 1
+CELL_EXPLORED = 2               # Un item a fost găsit aici
+FIRST_ITEM_CODE = 3
+ITEM_TYPES = ('apple', 'star', 'diamond', 'heart', 'bomb_extra')
+ITEM_CODES = {item_type: FIRST_ITEM_CODE + i for i, item_type in enumerate(ITEM_TYPES)}
+CLEAR_ITEMS_TABLE = bytes(code if code < FIRST_ITEM_CODE else CELL_EMPTY for code in range(256))
+
+# LOGURI ȘI METRICI
+
+# Logurile trec printr-o coadă: thread-ul care loghează doar pune înregistrarea deoparte,
+# iar scrierea la stdout se face pe thread-ul QueueListener. Fiecare linie are nivel,
+# mesaj și câmpuri structurate (room=..., player=...), în text sau JSON (LOG_FORMAT).
+
+class LogFormatter(logging.Formatter):
+    """O linie per eveniment: mesajul urmat de câmpurile structurate"""
+
+    def __init__(self, style):
+        super().__init__()
+        self.json = style == 'json'
+
+    def format(self, record):
+        fields = getattr(record, 'fields', {})
+        if self.json:
+            return json.dumps({
+                'ts': round(record.created, 6),
+                'level': record.levelname,
+                'thread': record.threadName,
+                'msg': record.getMessage(),
+                **fields
+            }, ensure_ascii=False, default=str)
+        created = time.strftime('%H:%M:%S', time.localtime(record.created))
+        line = f'{created}.{int(record.msecs):03d} {record.levelname:<7} {record.getMessage()}'
+        if fields:
+            line += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        return line
+
+logger = logging.getLogger('joc')
+logger.setLevel(LOG_LEVEL)
+logger.propagate = False
+log_queue = queue.SimpleQueue()
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
+log_output = logging.StreamHandler(sys.stdout)
+log_output.setFormatter(LogFormatter(LOG_FORMAT))
+log_listener = logging.handlers.QueueListener(log_queue, log_output)
+log_listener.start()
+atexit.register(log_listener.stop)
+
+def log(level, message, **fields):
+    """Loghează asincron; câmpurile nu se formatează deloc dacă nivelul e filtrat"""
+    if logger.isEnabledFor(level):
+        logger.log(level, message, extra={'fields': fields})
+
+# Metricile sunt contoare, histograme și gauge-uri cu etichete, păstrate în memorie
+# și expuse la /metrics în formatul text Prometheus.
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+class Metrics:
+    """Registru thread-safe de metrici; etichetele sunt argumente cu nume"""
+
+    def __init__(self):
+        self._kinds = {}        # nume -> (tip, descriere, găleți)
+        self._values = {}       # (nume, etichete) -> număr sau [contoare găleți..., sumă, total]
+        self._gauges = {}       # nume -> funcție apelată la fiecare citire
+        self._lock = threading.Lock()
+
+    def counter(self, name, description):
+        self._kinds[name] = ('counter', description, None)
+
+    def histogram(self, name, description, buckets=LATENCY_BUCKETS):
+        self._kinds[name] = ('histogram', description, buckets)
+
+    def gauge(self, name, description, fn):
+        self._kinds[name] = ('gauge', description, None)
+        self._gauges[name] = fn
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        buckets = self._kinds[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(buckets) + 2)
+            counts[bisect.bisect_left(buckets, value)] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def render(self):
+        with self._lock:
+            values = {key: list(value) if isinstance(value, list) else value for key, value in self._values.items()}
+        by_name = {}
+        for (name, labels), value in values.items():
+            by_name.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name, (kind, description, buckets) in self._kinds.items():
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'gauge':
+                lines.append(f'{name} {self._gauges[name]()}')
+                continue
+            for labels, value in sorted(by_name.get(name, ())):
+                if kind == 'counter':
+                    lines.append(f'{name}{metric_labels(labels)} {value}')
+                    continue
+                cumulative = 0
+                for bound, count in zip((*buckets, '+Inf'), value):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{metric_labels(labels + (("le", bound),))} {cumulative}')
+                lines.append(f'{name}_sum{metric_labels(labels)} {value[-2]}')
+                lines.append(f'{name}_count{metric_labels(labels)} {value[-1]}')
+        return '\n'.join(lines) + '\n'
+
+def metric_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+metrics = Metrics()
+metrics.histogram('joc_publish_seconds', 'Durata publicării unui lot de mesaje, per coadă')
+metrics.counter('joc_published_total', 'Mesaje confirmate de broker, per coadă')
+metrics.counter('joc_publish_failures_total', 'Mesaje respinse sau nepublicate, per coadă')
+metrics.histogram('joc_consumer_seconds', 'Timpul de procesare al unui mesaj, per handler')
+metrics.counter('joc_consumer_errors_total', 'Mesaje la care handler-ul a aruncat o excepție')
+metrics.histogram('joc_queue_lag_seconds', 'Timpul petrecut de un mesaj în coadă (publicare -> livrare)')
+metrics.histogram('joc_end_to_end_seconds', 'De la cererea HTTP care a produs mesajul până la aplicarea lui')
+metrics.histogram('joc_state_serialize_seconds', 'Serializarea unei proiecții /api/state')
+metrics.histogram('joc_state_response_bytes', 'Mărimea răspunsurilor /api/state (după compresie)', SIZE_BUCKETS)
+
+# Momentul publicării (ms) călătorește în antetul fiecărui mesaj
+SENT_AT_HEADER = 'x-sent-at-ms'
+
 # STAREA JOCULUI
-game = {
-    'phase': 'setup',
-    'players': {},
-    'bombs': [],
-    'items': [],
-    'chat': [],
-    'current_turn': None,
-    'player_order': [],
-    'available_emojis': PLAYER_EMOJIS.copy(),
-    'found_items': [],
-    'winner': None
-}
 
+def room_rng(room_id):
+    """RNG-ul camerei: derivat din ROOM_SEED și id-ul camerei, altfel aleator"""
+    if ROOM_SEED is None:
+        return random.Random()
+    return random.Random(f'{ROOM_SEED}:{room_id}')
+
+def new_game_state(room_id):
+    return {
+        'room': room_id,
+        'rng': room_rng(room_id),
+        'phase': 'setup',
+        'players': {},
+        'grid': GridIndex(GRID_SIZE),
+        'chat': collections.deque(maxlen=CHAT_HISTORY),
+        'messages': collections.deque(maxlen=CHAT_HISTORY),  # Mesajele jucătorilor (vezi ChatHub)
+        'message_seq': 0,
+        'current_turn': None,
+        'turn_deadline': None,
+        'player_order': TurnRing(),
+        'available_emojis': PLAYER_EMOJIS.copy(),
+        'found_items': [],
+        'winner': None,
+        'chat_seq': 0,
+        'started_at': None,
+        'round': 0,                 # Crește la fiecare reset: clienții primesc atunci starea completă
+        'epoch': os.urandom(4).hex()  # Distinge camerele recreate (versiunile o iau de la 0) în ETag-uri
+    }
 
-# RABBITMQ - PRODUCER
-def send_to_queue(queue_name, data):
-    """Trimite mesaj în coada specificată"""
-    try:
-        connection = pika.BlockingConnection(
-            pika.ConnectionParameters(host=RABBITMQ_HOST, heartbeat=600, blocked_connection_timeout=300)
-        )
-        channel = connection.channel()
-        channel.queue_declare(queue=queue_name, durable=True)
-        channel.basic_publish(
-            exchange='',
-            routing_key=queue_name,
-            body=json.dumps(data),
-            properties=pika.BasicProperties(delivery_mode=2)
-        )
-        connection.close()
-        print(f'📤 [{queue_name}] Mesaj trimis: {data.get("action", data.get("type", "update"))}')
-    except Exception as e:
-        print(f'❌ Eroare RabbitMQ [{queue_name}]: {e}')
+class GridIndex:
+    """Grila camerei: un octet per celulă (CELL_EMPTY, CELL_BOMB, CELL_EXPLORED sau codul unui item).
+
+    Proprietarii bombelor și pozițiile jucătorilor sunt puține, deci stau în
+    dicționare; restul hărții costă un octet pe celulă chiar și la 1000×1000.
+    Dicționarele JSON ({'x', 'y', 'owner'} / {'x', 'y', 'type'}) se construiesc
+    doar la cerere, pentru celulele din viewport-ul unui client.
+    """
+
+    @classmethod
+    def imported(cls, exported):
+        """Grila din forma lui exported(), pe care o păstrează (nu se mai recomprimă)"""
+        grid = cls(exported['size'], zlib.decompress(base64.b64decode(exported['board'])))
+        for index, owner in exported['bomb_owners']:
+            grid.bomb_owners[index] = owner
+            grid.bombs_by_owner.setdefault(owner, set()).add(index)
+        grid._exported = exported
+        return grid
+
+    def __init__(self, size, board=None):
+        self.size = size
+        self.board = bytearray(board) if board is not None else bytearray(size * size)
+        self.bomb_owners = {}       # index celulă -> jucător
+        self.bombs_by_owner = {}    # jucător -> indecșii bombelor lui
+        self.players = {}           # (x, y) -> numele jucătorilor din celulă
+        self.bomb_count = self.board.count(CELL_BOMB)
+        self.item_count = sum(self.board.count(code) for code in ITEM_CODES.values())
+        self._frozen = None
+        self._exported = None
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.size and 0 <= y < self.size
+
+    def _changed(self):
+        self._frozen = None
+        self._exported = None
+
+    def add_bomb(self, x, y, owner):
+        index = y * self.size + x
+        if self.board[index] != CELL_EMPTY:
+            return False
+        self.board[index] = CELL_BOMB
+        self.bomb_owners[index] = owner
+        self.bombs_by_owner.setdefault(owner, set()).add(index)
+        self.bomb_count += 1
+        self._changed()
+        return True
+
+    def pop_bomb(self, x, y):
+        index = y * self.size + x
+        if self.board[index] != CELL_BOMB:
+            return None
+        self.board[index] = CELL_EMPTY
+        owner = self.bomb_owners.pop(index)
+        cells = self.bombs_by_owner[owner]
+        cells.discard(index)
+        if not cells:
+            del self.bombs_by_owner[owner]
+        self.bomb_count -= 1
+        self._changed()
+        return {'x': x, 'y': y, 'owner': owner}
+
+    def remove_bombs_of(self, owner):
+        for index in self.bombs_by_owner.pop(owner, ()):
+            self.board[index] = CELL_EMPTY
+            del self.bomb_owners[index]
+            self.bomb_count -= 1
+            self._changed()
+
+    def add_item(self, x, y, item_type):
+        index = y * self.size + x
+        if self.board[index] != CELL_EMPTY:
+            return False
+        self.board[index] = ITEM_CODES[item_type]
+        self.item_count += 1
+        self._changed()
+        return True
+
+    def pop_item(self, x, y):
+        index = y * self.size + x
+        code = self.board[index]
+        if code < FIRST_ITEM_CODE:
+            return None
+        self.board[index] = CELL_EXPLORED
+        self.item_count -= 1
+        self._changed()
+        return {'x': x, 'y': y, 'type': ITEM_TYPES[code - FIRST_ITEM_CODE]}
+
+    def clear_items(self):
+        self.board = bytearray(self.board.translate(CLEAR_ITEMS_TABLE))
+        self.item_count = 0
+        self._changed()
+
+    def has_player(self, x, y):
+        return (x, y) in self.players
+
+    def place_player(self, name, x, y):
+        self.players.setdefault((x, y), set()).add(name)
+
+    def remove_player(self, name, x, y):
+        names = self.players.get((x, y))
+        if names is not None:
+            names.discard(name)
+            if not names:
+                del self.players[(x, y)]
+
+    def move_player(self, name, old_x, old_y, new_x, new_y):
+        self.remove_player(name, old_x, old_y)
+        self.place_player(name, new_x, new_y)
+
+    def is_free(self, x, y):
+        return self.board[y * self.size + x] == CELL_EMPTY and (x, y) not in self.players
+
+    def sample_free(self, count, rng):
+        """Până la `count` celule libere distincte, alese uniform, fără repetare.
+
+        Fisher-Yates parțial peste permutarea virtuală a tuturor celulelor: doar
+        pozițiile interschimbate stau în dicționar, iar celulele ocupate (bombe,
+        jucători - puține) sunt sărite, deci O(count + ocupate) indiferent de densitate.
+        """
+        total = self.size * self.size
+        swapped = {}
+        cells = []
+        for i in range(total):
+            if len(cells) >= count:
+                break
+            j = rng.randrange(i, total)
+            index = swapped.get(j, j)
+            swapped[j] = swapped.get(i, i)
+            x, y = index % self.size, index // self.size
+            if self.is_free(x, y):
+                cells.append((x, y))
+        return cells
+
+    def free_cells(self):
+        empty = self.board.count(CELL_EMPTY)
+        return empty - sum(1 for x, y in self.players if self.board[y * self.size + x] == CELL_EMPTY)
+
+    def frozen(self):
+        """Copie imuabilă a hărții pentru snapshot-uri, refolosită cât timp harta nu se schimbă"""
+        if self._frozen is None:
+            self._frozen = (bytes(self.board), dict(self.bomb_owners))
+        return self._frozen
+
+    def matches(self, exported):
+        """True dacă `exported` descrie exact harta de acum (aceiași octeți, aceleași bombe)"""
+        current = self._exported
+        return current is not None and current['size'] == exported['size'] and \
+            current['board'] == exported['board'] and current['bomb_owners'] == exported['bomb_owners']
+
+    def place_players(self, players):
+        """Reface indexul jucătorilor (ex. după o mutare primită într-un snapshot)"""
+        self.players = {}
+        for name, player in players.items():
+            self.place_player(name, player['x'], player['y'])
+
+    def exported(self):
+        """Harta comprimată pentru export_state; o mutare nu atinge harta, deci nu o recomprimă"""
+        if self._exported is None:
+            self._exported = {
+                'size': self.size,
+                'board': base64.b64encode(zlib.compress(bytes(self.board))).decode('ascii'),
+                'bomb_owners': list(self.bomb_owners.items())
+            }
+        return self._exported
 
-# RABBITMQ - CONSUMERS
+class TurnRing:
+    """Ordinea turelor ca listă circulară dublu înlănțuită, indexată după nume.
 
-def statistics_consumer():
-    """Consumer pentru statistici"""
-    try:
-        connection = pika.BlockingConnection(
-            pika.ConnectionParameters(host=RABBITMQ_HOST, heartbeat=600, blocked_connection_timeout=300)
-        )
-        channel = connection.channel()
-        channel.queue_declare(queue=QUEUE_STATISTICS, durable=True)
-        channel.basic_qos(prefetch_count=1)
+    Adăugarea, scoaterea și trecerea la următorul jucător sunt O(1); lista ordonată
+    (pentru snapshot-uri) se reconstruiește doar după o modificare.
+    """
 
-        def callback(ch, method, properties, body):
-            try:
-                data = json.loads(body)
-                print(f'📊 [STATISTICS] {data}')
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-            except Exception as e:
-                print(f'❌ Statistics Error: {e}')
-                ch.basic_ack(delivery_tag=method.delivery_tag)
+    def __init__(self, names=()):
+        self._next = {}
+        self._prev = {}
+        self.head = None
+        self._order = ()
+        for name in names:
+            self.append(name)
 
-        channel.basic_consume(queue=QUEUE_STATISTICS, on_message_callback=callback)
-        print('📊 [STATISTICS CONSUMER] Pornit!')
-        channel.start_consuming()
-    except Exception as e:
-        print(f'❌ Statistics Consumer Error: {e}')
+    def __len__(self):
+        return len(self._next)
 
-def state_consumer():
-    """Consumer pentru starea jocului"""
+    def __contains__(self, name):
+        return name in self._next
+
+    def __iter__(self):
+        return iter(self.order())
+
+    def append(self, name):
+        """Adaugă jucătorul la sfârșitul ordinii (înaintea primului)"""
+        if name in self._next:
+            return
+        if self.head is None:
+            self.head = name
+            self._next[name] = self._prev[name] = name
+        else:
+            last = self._prev[self.head]
+            self._next[last] = self._prev[self.head] = name
+            self._prev[name], self._next[name] = last, self.head
+        self._order = None
+
+    def remove(self, name):
+        """Scoate jucătorul; întoarce cel care urma după el (None dacă inelul s-a golit)"""
+        if name not in self._next:
+            return None
+        following, previous = self._next.pop(name), self._prev.pop(name)
+        self._order = None
+        if following == name:
+            self.head = None
+            return None
+        self._next[previous], self._prev[following] = following, previous
+        if self.head == name:
+            self.head = following
+        return following
+
+    def next_of(self, name):
+        return self._next.get(name, self.head)
+
+    def order(self):
+        if self._order is None:
+            order, name = [], self.head
+            for _ in range(len(self._next)):
+                order.append(name)
+                name = self._next[name]
+            self._order = tuple(order)
+        return self._order
+
+def chat_after(chat, seq):
+    """Mesajele cu seq > `seq`; numerele de secvență sunt consecutive, deci poziția se calculează direct"""
+    if not chat:
+        return []
+    start = max(0, seq - chat[0]['seq'] + 1)
+    return list(itertools.islice(chat, start, None))
+
+def clamp_grid_size(value):
     try:
-        connection = pika.BlockingConnection(
-            pika.ConnectionParameters(host=RABBITMQ_HOST, heartbeat=600, blocked_connection_timeout=300)
+        return max(GRID_MIN_SIZE, min(GRID_MAX_SIZE, int(value)))
+    except (TypeError, ValueError):
+        return GRID_SIZE
+
+def export_state(state):
+    """Starea ca JSON simplu (snapshot-urile dintre procese); harta pleacă comprimată"""
+    data = {key: value for key, value in state.items() if key not in ('grid', 'rng')}
+    data['chat'] = list(state['chat'])
+    data['messages'] = list(state['messages'])
+    data['player_order'] = list(state['player_order'])
+    data['grid'] = state['grid'].exported()
+    return data
+
+def import_state(data, previous=None):
+    """Inversul lui export_state: reconstruiește harta și indexul jucătorilor.
+
+    Dacă harta e aceeași cu a stării `previous` (o mutare nu o atinge), grila acesteia
+    e refolosită și doar jucătorii sunt reindexați, fără a decomprima harta.
+    """
+    state = dict(data)
+    state['chat'] = collections.deque(state['chat'], maxlen=CHAT_HISTORY)
+    state['messages'] = collections.deque(state.get('messages', ()), maxlen=CHAT_HISTORY)
+    state.setdefault('message_seq', 0)
+    state['player_order'] = TurnRing(state['player_order'])
+    state.setdefault('turn_deadline', None)
+    exported = state['grid']
+    if previous is not None and previous['grid'].matches(exported):
+        grid = previous['grid']
+    else:
+        grid = GridIndex.imported(exported)
+    grid.place_players(state['players'])
+    state['grid'] = grid
+    state['rng'] = room_rng(state['room'])
+    return state
+
+def room_shard(room_id):
+    """Shard-ul unei camere; crc32 e stabil între procese, spre deosebire de hash()"""
+    return zlib.crc32(room_id.encode('utf-8')) % STATE_SHARDS
+
+def command_queue(queue_name, shard):
+    return f'{queue_name}.{shard}'
+
+# Starea fiecărei camere e modificată DOAR de thread-ul actorului shard-ului ei.
+# Consumer-ele, Flask și thread-ul de curățenie trimit comenzi; cititorii primesc snapshot-uri.
+
+def build_snapshot(state, version=0):
+    """Copie pentru cititori; nu se mai modifică după publicare.
+
+    Jucătorii sunt copiați (se modifică pe loc); harta e o copie `bytes` refolosită
+    până la următoarea bombă/item atins, iar mesajele de chat sunt partajate.
+    `last_seen` rămâne pe server: altfel fiecare heartbeat ar crea o versiune nouă.
+    """
+    players = {}
+    for name, p in state['players'].items():
+        player = dict(p)
+        player.pop('last_seen', None)
+        players[name] = player
+
+    grid = state['grid']
+    board, bomb_owners = grid.frozen()
+    return {
+        'version': version,
+        'room': state['room'],
+        'phase': state['phase'],
+        'grid_size': grid.size,
+        'board': board,
+        'bomb_owners': bomb_owners,
+        'items_left': grid.item_count,
+        'players': players,
+        'chat': list(state['chat']),
+        'current_turn': state['current_turn'],
+        'turn_deadline': state['turn_deadline'],
+        'player_order': state['player_order'].order(),
+        'available_emojis': list(state['available_emojis']),
+        'found_items': list(state['found_items']),
+        'winner': state['winner'],
+        'chat_seq': state['chat_seq'],
+        'round': state['round'],
+        'epoch': state['epoch']
+    }
+
+META_KEYS = ('phase', 'current_turn', 'turn_deadline', 'player_order', 'available_emojis', 'winner', 'items_left')
+BOARD_KEYS = ('board', 'bomb_owners')
+BOARD_CHUNK = 4096
+
+def board_changes(old, new, size):
+    """Celulele (x, y) care diferă între două hărți de aceeași mărime.
+
+    Harta se compară pe bucăți (memcmp); doar bucățile diferite se parcurg octet cu octet.
+    """
+    cells = set()
+    if old is new:
+        return cells
+    old_view, new_view = memoryview(old), memoryview(new)
+    for start in range(0, len(new), BOARD_CHUNK):
+        end = min(start + BOARD_CHUNK, len(new))
+        if old_view[start:end] != new_view[start:end]:
+            for index in range(start, end):
+                if old[index] != new[index]:
+                    cells.add((index % size, index // size))
+    return cells
+
+def board_bomb(snapshot, x, y):
+    """Bomba din celula (x, y), ca dicționarul JSON de până acum, sau None"""
+    index = y * snapshot['grid_size'] + x
+    if snapshot['board'][index] != CELL_BOMB:
+        return None
+    return {'x': x, 'y': y, 'owner': snapshot['bomb_owners'][index]}
+
+def board_explored(snapshot, x, y):
+    return snapshot['board'][y * snapshot['grid_size'] + x] == CELL_EXPLORED
+
+def found_cells(snapshot):
+    return {(item['x'], item['y']): item for item in snapshot['found_items']}
+
+def diff_snapshots(old, new):
+    """Jucătorii și celulele care diferă între două snapshot-uri; None dacă nimic nu s-a schimbat"""
+    players = {
+        name for name in old['players'].keys() | new['players'].keys()
+        if old['players'].get(name) != new['players'].get(name)
+    }
+
+    if old['grid_size'] != new['grid_size']:
+        # Grilă nouă (cameră golită și recreată cu altă mărime): clienții primesc starea completă
+        cells = set()
+    else:
+        size = new['grid_size']
+        cells = board_changes(old['board'], new['board'], size)
+        cells.update(
+            (index % size, index // size)
+            for index, _ in old['bomb_owners'].items() ^ new['bomb_owners'].items()
+        )
+        old_found, new_found = found_cells(old), found_cells(new)
+        cells.update(
+            cell for cell in old_found.keys() | new_found.keys()
+            if old_found.get(cell) != new_found.get(cell)
         )
-        channel = connection.channel()
-        channel.queue_declare(queue=QUEUE_STATE, durable=True)
-        channel.basic_qos(prefetch_count=1)
 
-        def callback(ch, method, properties, body):
+    meta = any(old[key] != new[key] for key in META_KEYS) or old['grid_size'] != new['grid_size']
+    if not (players or cells or meta or old['chat_seq'] != new['chat_seq']):
+        return None
+
+    return {'players': players, 'cells': cells}
+
+def board_layout(snapshot):
+    """Ce trebuie să rămână la fel ca un delta să fie valid: faza (vizibilitatea bombelor), grila și runda"""
+    return snapshot['phase'], snapshot['grid_size'], snapshot['round']
+
+class Room:
+    """Starea unei camere plus snapshot-ul și istoricul publicate pentru cititori"""
+
+    def __init__(self, room_id):
+        self.id = room_id
+        self.state = new_game_state(room_id)
+        self.last_activity = time.time()
+        self._snapshot = build_snapshot(self.state)
+        # Inel de modificări recente: (versiune, jucători, celule, chat_seq, board_layout)
+        self._changes = collections.deque(maxlen=STATE_HISTORY)
+        self._changes.append((0, frozenset(), frozenset(), self.state['chat_seq'], board_layout(self._snapshot)))
+        # Snapshot-ul și istoricul se publică împreună, ca cititorii să le vadă consistent
+        # Proiecțiile per jucător se păstrează lângă versiunea din care au fost calculate
+        self._published = (self._snapshot, tuple(self._changes), {})
+        self._changed = threading.Condition()
+        # Apelate (pe actor) după fiecare versiune nouă, ex. pentru a trezi stream-uri asyncio
+        self._watchers = set()
+
+    def snapshot(self):
+        return self._published[0]
+
+    def published(self):
+        """(snapshot, istoric de modificări, cache de proiecții) publicate atomic"""
+        return self._published
+
+    def wait_for_change(self, version, timeout):
+        """Blochează până apare o versiune diferită de `version` sau expiră timeout-ul"""
+        with self._changed:
+            return self._changed.wait_for(lambda: self._published[0]['version'] != version, timeout)
+
+    def watch(self, callback):
+        self._watchers.add(callback)
+
+    def unwatch(self, callback):
+        self._watchers.discard(callback)
+
+    def publish(self, version=None):
+        """Apelat doar de actorul camerei, după un lot de comenzi; True dacă a apărut o versiune nouă"""
+        if version is None:
+            version = self._snapshot['version'] + 1
+        snapshot = build_snapshot(self.state, version)
+        changes = diff_snapshots(self._snapshot, snapshot)
+        if changes is None:
+            return False
+
+        self._snapshot = snapshot
+        self.last_activity = time.time()
+        self._changes.append((
+            snapshot['version'],
+            frozenset(changes['players']),
+            frozenset(changes['cells']),
+            snapshot['chat_seq'],
+            board_layout(snapshot)
+        ))
+        with self._changed:
+            self._published = (snapshot, tuple(self._changes), {})
+            self._changed.notify_all()
+        for callback in tuple(self._watchers):
+            callback()
+        return True
+
+    def install(self, state, version):
+        """Înlocuiește starea cu cea publicată de procesul care deține camera.
+
+        Versiunea rămâne cea a deținătorului, ca `since` al clienților să aibă sens
+        indiferent de procesul care le răspunde. În aceeași epocă versiunile vechi sunt
+        ignorate; o epocă diferită (cameră recreată la deținător) înlocuiește oricum starea.
+        """
+        if state['epoch'] == self.state['epoch'] and version <= self._snapshot['version']:
+            return False
+        self.state = state
+        return self.publish(version)
+
+class GameActor:
+    """Bucla unică de comenzi a unui shard; deține starea camerelor din shard.
+
+    Comenzile se aplică în ordinea sosirii, în loturi; după fiecare lot se publică
+    un snapshot nou pentru fiecare cameră atinsă, printr-o simplă atribuire, așa că
+    cititorii nu așteaptă niciodată.
+    """
+
+    def __init__(self, registry, shard):
+        self.registry = registry
+        self.shard = shard
+        self._commands = queue.SimpleQueue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        # Termene (prezență, iteme găsite, camere inactive) într-un heap; fiecare
+        # (cameră, tip, cheie) are un singur termen valabil, intrările depășite se ignoră
+        self._deadlines = []
+        self._timers = {}
+        self._timer_seq = itertools.count()
+        self._timer_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True, name=f'GameActor-{self.shard}')
+                self._thread.start()
+
+    def submit(self, room_id, fn, *args, create=True):
+        """Programează fn(starea camerei, *args) pe thread-ul actorului; întoarce un Future.
+
+        Cu room_id None, fn(*args) rulează fără cameră (ex. evacuarea camerelor).
+        Cu create=False comanda e ignorată (rezultat None) dacă, în momentul aplicării,
+        camera nu există - nu o creează.
+        """
+        future = Future()
+        if threading.current_thread() is self._thread:
+            # Apel din interiorul unei comenzi: se execută direct, în aceeași ordine
+            self._execute(room_id, fn, args, future, create)
+            return future
+
+        if self._thread is None:
+            self.start()
+        self._commands.put((room_id, fn, args, future, create))
+        return future
+
+    def schedule(self, deadline, room_id, kind, key=None):
+        """Programează un termen; dacă există deja unul mai apropiat pentru același timer, rămâne acela.
+
+        Handler-ul verifică la expirare dacă termenul mai e valabil (ex. un heartbeat
+        între timp) și se reprogramează, așa că un heartbeat nu atinge heap-ul.
+        """
+        timer = (room_id, kind, key)
+        with self._timer_lock:
+            current = self._timers.get(timer)
+            if current is not None and current <= deadline:
+                return
+            self._timers[timer] = deadline
+            heapq.heappush(self._deadlines, (deadline, next(self._timer_seq), timer))
+        if threading.current_thread() is not self._thread:
+            # Trezește bucla, care poate aștepta un termen mai îndepărtat
+            if self._thread is None:
+                self.start()
+            self._commands.put(None)
+
+    def _next_timeout(self):
+        with self._timer_lock:
+            if not self._deadlines:
+                return None
+            return max(0.0, self._deadlines[0][0] - time.time())
+
+    def _fire_timers(self, now):
+        """Rulează handler-ele termenelor ajunse la scadență; întoarce camerele modificate"""
+        fired = []
+        with self._timer_lock:
+            while self._deadlines and self._deadlines[0][0] <= now:
+                deadline, _, timer = heapq.heappop(self._deadlines)
+                if self._timers.get(timer) == deadline:
+                    del self._timers[timer]
+                    fired.append(timer)
+
+        changed = []
+        for room_id, kind, key in fired:
+            room = self.registry.peek(room_id)
+            if room is None:
+                continue
             try:
-                data = json.loads(body)
-                print(f'🎮 [STATE] {data}')
-                ch.basic_ack(delivery_tag=method.delivery_tag)
+                if TIMER_HANDLERS[kind](self.registry, room, key, now):
+                    changed.append(room)
             except Exception as e:
-                print(f'❌ State Error: {e}')
-                ch.basic_ack(delivery_tag=method.delivery_tag)
+                log(logging.ERROR, '❌ Eroare la expirarea unui termen', room=room_id, kind=kind, error=e)
+        return changed
+
+    def _execute(self, room_id, fn, args, future, create=True):
+        room = None
+        if room_id is not None:
+            room = self.registry.get(room_id) if create else self.registry.peek(room_id)
+            if room is None:
+                future.set_result(None)
+                return None
+        with event_log.stamped():
+            try:
+                result = fn(room.state, *args) if room is not None else fn(*args)
+            except Exception as e:
+                future.set_exception(e)
+                return room
+            if room is not None and fn in JOURNALED_FUNCTIONS:
+                event_log.append(room_id, JOURNALED_FUNCTIONS[fn], args)
+        future.set_result(result)
+        return room
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self._commands.get(timeout=self._next_timeout())]
+            except queue.Empty:
+                batch = []
+            while batch and len(batch) < ACTOR_BATCH_SIZE:
+                try:
+                    batch.append(self._commands.get_nowait())
+                except queue.Empty:
+                    break
+
+            touched = {}
+            for command in batch:
+                if command is None:
+                    continue
+                room_id, fn, args, future, create = command
+                if not future.set_running_or_notify_cancel():
+                    continue
+                room = self._execute(room_id, fn, args, future, create)
+                if room is not None:
+                    touched[room.id] = room
+            for room in self._fire_timers(time.time()):
+                touched[room.id] = room
+
+            for room in touched.values():
+                if room.publish():
+                    self.registry.published_room(room)
+
+class RoomRegistry:
+    """Toate camerele din proces; fiecare cameră aparține unui singur actor (shard)"""
+
+    def __init__(self, shards):
+        self.actors = [GameActor(self, shard) for shard in range(shards)]
+        self._rooms = {}
+        self._lock = threading.Lock()
+        # Trezește stream-urile deschise pe o cameră care încă nu există
+        self._created = threading.Condition(self._lock)
+        self._watchers = set()
+        # Shard-urile ale căror camere le modifică procesul (None = toate, modul 'all')
+        self.owned_shards = None
+        # Apelate pe actor după fiecare versiune nouă / evacuare (ex. publicarea snapshot-ului în worker)
+        self.on_publish = None
+        self.on_evict = None
+
+    def owns(self, room_id):
+        return self.owned_shards is None or room_shard(room_id) in self.owned_shards
+
+    def published_room(self, room):
+        if self.on_publish is not None:
+            self.on_publish(room)
+
+    def get(self, room_id):
+        room = self._rooms.get(room_id)
+        if room is None:
+            with self._lock:
+                room = self._rooms.get(room_id)
+                if room is None:
+                    room = Room(room_id)
+                    # Starea inițială (cu RNG-ul) intră în jurnal înaintea oricărei comenzi
+                    event_log.record_room(room)
+                    self._rooms[room_id] = room
+                    self.schedule(room_id, room.last_activity + ROOM_IDLE_TIMEOUT, 'room')
+                    self._created.notify_all()
+                    for callback in tuple(self._watchers):
+                        callback()
+        return room
+
+    def peek(self, room_id):
+        return self._rooms.get(room_id)
+
+    def wait_for_room(self, room_id, timeout):
+        """Blochează până apare camera (fără a o crea) sau expiră timeout-ul"""
+        with self._created:
+            return self._created.wait_for(lambda: room_id in self._rooms, timeout)
+
+    def watch(self, callback):
+        self._watchers.add(callback)
+
+    def unwatch(self, callback):
+        self._watchers.discard(callback)
+
+    def room_ids(self, owned=False):
+        with self._lock:
+            return [room_id for room_id in self._rooms if not owned or self.owns(room_id)]
+
+    def published(self, room_id):
+        """Snapshot-ul publicat al camerei, fără a o crea (camerele necunoscute apar goale)"""
+        room = self._rooms.get(room_id)
+        if room is None:
+            return empty_room_published(room_id)
+        return room.published()
+
+    def actor(self, room_id):
+        return self.actors[room_shard(room_id)]
+
+    def submit(self, room_id, fn, *args, create=True):
+        return self.actor(room_id).submit(room_id, fn, *args, create=create)
+
+    def schedule(self, room_id, deadline, kind, key=None):
+        self.actor(room_id).schedule(deadline, room_id, kind, key)
+
+    def adopt(self, shard):
+        """Programează termenele camerelor unui shard preluat (starea a venit prin snapshot-uri)"""
+        def schedule_shard():
+            now = time.time()
+            for room_id in self.room_ids():
+                room = self._rooms.get(room_id)
+                if room is not None and room_shard(room_id) == shard:
+                    # last_seen din snapshot e doar de la ultima versiune (touch nu o schimbă):
+                    # jucătorii primesc un PLAYER_TIMEOUT întreg, cât să ajungă touch-urile din coadă
+                    for player in room.state['players'].values():
+                        player['last_seen'] = now
+                    schedule_room_timers(self, room)
+        return self.actors[shard].submit(None, schedule_shard)
+
+    def call(self, room_id, fn, *args, create=True):
+        """Ca submit, dar așteaptă rezultatul (și propagă excepțiile comenzii)"""
+        return self.submit(room_id, fn, *args, create=create).result(timeout=ACTOR_CALL_TIMEOUT)
+
+    def install(self, room_id, data, version):
+        """Programează pe actorul camerei instalarea unei stări exportate de deținătorul ei"""
+        def install_state():
+            room = self._rooms.get(room_id)
+            if room is not None and room.state['epoch'] != data['epoch']:
+                # Recreată la deținător (workeri reporniți, replay): versiunile o iau de la
+                # capăt, deci istoricul și stream-urile camerei vechi nu mai sunt valide
+                self.discard(room_id)
+                room = None
+            if room is not None and version <= room.snapshot()['version']:
+                return False
+            # Pe actor, ca grila camerei să poată fi refolosită când harta nu s-a schimbat
+            state = import_state(data, room.state if room is not None else None)
+            return self.get(room_id).install(state, version)
+        return self.actor(room_id).submit(None, install_state)
+
+    def discard(self, room_id):
+        """Scoate camera din proces (rulează pe actorul ei)"""
+        with self._lock:
+            return self._rooms.pop(room_id, None)
+
+    def drain(self, shard):
+        """Așteaptă aplicarea tuturor comenzilor deja trimise actorului shard-ului"""
+        self.actors[shard].submit(None, lambda: None).result(timeout=ACTOR_CALL_TIMEOUT)
+
+    def evict_if_idle(self, room_id, current_time):
+        """Închide camera dacă e goală sau terminată de prea mult timp; True dacă a închis-o.
+
+        Rulează pe actorul camerei, deci nicio comandă nu e aplicată în paralel.
+        """
+        room = self._rooms.get(room_id)
+        if room is None:
+            return False
+        idle = current_time - room.last_activity
+        empty = not room.state['players'] and idle > ROOM_IDLE_TIMEOUT
+        finished = room.state['phase'] == 'finished' and idle > ROOM_FINISHED_TTL
+        if not (empty or finished):
+            return False
+        self.discard(room_id)
+        stream_presence.forget_room(room_id)
+        event_log.append(room_id, 'evict')
+        if self.on_evict is not None:
+            self.on_evict(room_id)
+        log(logging.INFO, '🧹 Cameră închisă', room=room_id)
+        return True
+
+def empty_room_published(room_id):
+    snapshot = build_snapshot(new_game_state(room_id))
+    return (snapshot, ((0, frozenset(), frozenset(), 0, board_layout(snapshot)),), {})
+
+rooms = RoomRegistry(STATE_SHARDS)
+
+
+# CODECURI (FORMATUL MESAJELOR)
+#
+# Formatul fiecărui mesaj e anunțat în `content_type`-ul AMQP; consumer-ele decodează
+# după el, deci producători și consumatori cu MESSAGE_CODEC diferit coexistă la rollout.
+# Mesajele fără content_type (versiuni vechi) sunt JSON.
+
+CONTENT_JSON = 'application/json'
+CONTENT_MSGPACK = 'application/msgpack'
+CONTENT_MOVE = 'application/x-joc-move'
+
+# Mișcare împachetată: acțiune, direcție, x, y, apoi camera și jucătorul (lungime + UTF-8)
+MOVE_HEADER = struct.Struct('!BBhh')
+MOVE_ACTIONS = ('move', 'place_bomb')
+MOVE_DIRECTIONS = (None, 'UP', 'DOWN', 'LEFT', 'RIGHT')
+
+def json_encode(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data)
+
+def json_bytes(data):
+    body = json_encode(data)
+    return body if isinstance(body, bytes) else body.encode()
+
+def json_decode(body):
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+def pack_move(data):
+    """Comenzile de mișcare / plasare bombă în format binar; None dacă nu se potrivesc schemei"""
+    if set(data) - {'action', 'player', 'direction', 'x', 'y', 'room'}:
+        return None
+    action, direction = data.get('action'), data.get('direction')
+    x, y = data.get('x', 0), data.get('y', 0)
+    player, room_id = data.get('player'), data.get('room')
+    if action not in MOVE_ACTIONS or direction not in MOVE_DIRECTIONS:
+        return None
+    if not (type(x) is int and type(y) is int and -32768 <= x < 32768 and -32768 <= y < 32768):
+        return None
+    if not (isinstance(player, str) and isinstance(room_id, str)):
+        return None
+    room_bytes, player_bytes = room_id.encode(), player.encode()
+    if len(room_bytes) > 255 or len(player_bytes) > 255:
+        return None
+    return b''.join((
+        MOVE_HEADER.pack(MOVE_ACTIONS.index(action), MOVE_DIRECTIONS.index(direction), x, y),
+        bytes((len(room_bytes),)), room_bytes,
+        bytes((len(player_bytes),)), player_bytes
+    ))
+
+def unpack_move(body):
+    action, direction, x, y = MOVE_HEADER.unpack_from(body)
+    offset = MOVE_HEADER.size
+    room_end = offset + 1 + body[offset]
+    room_id = body[offset + 1:room_end].decode()
+    player = body[room_end + 1:room_end + 1 + body[room_end]].decode()
+    data = {'action': MOVE_ACTIONS[action], 'player': player, 'room': room_id}
+    if data['action'] == 'move':
+        data['direction'] = MOVE_DIRECTIONS[direction]
+    else:
+        data['x'], data['y'] = x, y
+    return data
+
+DECODERS = {
+    CONTENT_JSON: json_decode,
+    CONTENT_MOVE: unpack_move
+}
+if msgpack is not None:
+    DECODERS[CONTENT_MSGPACK] = msgpack.unpackb
+
+def encode_message(data, codec=None):
+    """(corp în bytes, content_type) pentru un mesaj, după MESSAGE_CODEC.
+
+    'binary' împachetează doar mișcările; restul mesajelor (și orice format
+    indisponibil, ex. msgpack neinstalat) pleacă în JSON.
+    """
+    codec = codec or MESSAGE_CODEC
+    if codec == 'binary':
+        body = pack_move(data)
+        if body is not None:
+            return body, CONTENT_MOVE
+    elif codec == 'msgpack' and msgpack is not None:
+        return msgpack.packb(data), CONTENT_MSGPACK
+    return json_bytes(data), CONTENT_JSON
+
+def decode_message(body, content_type=None):
+    decoder = DECODERS.get(content_type or CONTENT_JSON)
+    if decoder is None:
+        raise ValueError(f'format necunoscut: {content_type}')
+    return decoder(body)
+
+MESSAGE_PROPERTIES = {}
+
+def message_properties(content_type, sent_at=None):
+    """Proprietățile AMQP (persistente) pentru un format; create o singură dată dacă nu au antet"""
+    if sent_at is not None:
+        return pika.BasicProperties(delivery_mode=2, content_type=content_type,
+                                    headers={SENT_AT_HEADER: int(sent_at * 1000)})
+    properties = MESSAGE_PROPERTIES.get(content_type)
+    if properties is None:
+        properties = MESSAGE_PROPERTIES[content_type] = pika.BasicProperties(
+            delivery_mode=2, content_type=content_type)
+    return properties
+
+if MESSAGE_CODEC == 'msgpack' and msgpack is None:
+    log(logging.WARNING, '⚠️ MESSAGE_CODEC=msgpack, dar modulul msgpack lipsește - se folosește JSON')
 
-        channel.basic_consume(queue=QUEUE_STATE, on_message_callback=callback)
-        print('🎮 [STATE CONSUMER] Pornit!')
-        channel.start_consuming()
-    except Exception as e:
-        print(f'❌ State Consumer Error: {e}')
+# RABBITMQ - PRODUCER
 
-def moves_consumer():
-    """Consumer pentru mișcări"""
-    try:
-        connection = pika.BlockingConnection(
-            pika.ConnectionParameters(host=RABBITMQ_HOST, heartbeat=600, blocked_connection_timeout=300)
-        )
-        channel = connection.channel()
-        channel.queue_declare(queue=QUEUE_MOVES, durable=True)
-        channel.basic_qos(prefetch_count=1)
+def rabbitmq_parameters():
+    return pika.ConnectionParameters(host=RABBITMQ_HOST, heartbeat=600, blocked_connection_timeout=300)
 
-        def callback(ch, method, properties, body):
+def declare_exchange(channel, exchange):
+    """Declară exchange-ul; pentru cel de comenzi și cozile per shard legate la el (idempotent).
+
+    Cozile de shard au un singur consumer activ: când un shard trece la alt worker,
+    cele două procese nu pot consuma în paralel din aceeași coadă.
+    """
+    channel.exchange_declare(exchange=exchange, exchange_type=EXCHANGE_TYPES[exchange], durable=True)
+    if exchange != EXCHANGE_GAME:
+        return
+    for queue_name in COMMAND_QUEUES:
+        for shard in range(STATE_SHARDS):
+            name = command_queue(queue_name, shard)
+            channel.queue_declare(queue=name, durable=True, arguments={'x-single-active-consumer': True})
+            channel.queue_bind(queue=name, exchange=EXCHANGE_GAME, routing_key=name)
+
+def declare_queue(channel, queue_name):
+    channel.queue_declare(queue=queue_name, durable=True)
+
+def declare_command_queue(channel, queue_name):
+    declare_exchange(channel, EXCHANGE_GAME)
+
+class PublisherSlot:
+    """O conexiune + un canal persistent, folosite de un singur thread odată"""
+
+    def __init__(self, confirms=False):
+        self.confirms = confirms
+        self.connection = None
+        self.channel = None
+        self.last_used = 0.0
+
+    def ensure_channel(self):
+        if self.channel is not None and self.channel.is_open:
+            # Conexiunea a stat nefolosită: procesează heartbeat-uri / detectează închiderea
+            if time.time() - self.last_used > PUBLISHER_IDLE_CHECK:
+                self.connection.process_data_events(time_limit=0)
+            if self.channel.is_open:
+                return self.channel
+
+        self.reset()
+        self.connection = pika.BlockingConnection(rabbitmq_parameters())
+        self.channel = self.connection.channel()
+        if self.confirms:
+            self.channel.confirm_delivery()
+        return self.channel
+
+    def reset(self):
+        if self.connection is not None:
+            try:
+                if self.connection.is_open:
+                    self.connection.close()
+            except Exception:
+                pass
+        self.connection = None
+        self.channel = None
+
+class PublisherPool:
+    """Pool thread-safe de canale persistente; reconectează automat canalele căzute"""
+
+    def __init__(self, size, confirms=False):
+        self.size = size
+        self._slots = queue.LifoQueue()
+        for _ in range(size):
+            self._slots.put(PublisherSlot(confirms))
+        self._declared = set()
+        self._declared_lock = threading.Lock()
+
+    def declare(self, channel, exchange, queue_name):
+        key = exchange or queue_name
+        if key in self._declared:
+            return
+        if exchange:
+            declare_exchange(channel, exchange)
+        else:
+            channel.queue_declare(queue=queue_name, durable=True)
+        with self._declared_lock:
+            self._declared.add(key)
+
+    def publish(self, queue_name, data, exchange=''):
+        """Codifică și publică un mesaj; o singură reîncercare pe o conexiune nouă dacă cea veche a murit"""
+        self.publish_batch(queue_name, [(*encode_message(data), time.time())], exchange)
+
+    def publish_batch(self, routing_key, messages, exchange=''):
+        """Publică un lot de (corp, content_type, momentul trimiterii) pe același canal.
+
+        Întoarce (confirmate, respinse).
+
+        Cu confirmări activate, fiecare basic_publish așteaptă ack-ul brokerului;
+        un mesaj respins (nack) e numărat și lotul continuă. La o conexiune căzută
+        se reia o singură dată restul lotului pe o conexiune nouă.
+        """
+        confirmed = nacked = 0
+        started = time.perf_counter()
+        label = metric_queue(exchange, routing_key)
+        slot = self._slots.get()
+        try:
+            for attempt in range(2):
+                try:
+                    channel = slot.ensure_channel()
+                    self.declare(channel, exchange, routing_key)
+                    while confirmed + nacked < len(messages):
+                        body, content_type, sent_at = messages[confirmed + nacked]
+                        try:
+                            channel.basic_publish(
+                                exchange=exchange,
+                                routing_key=routing_key,
+                                body=body,
+                                properties=message_properties(content_type, sent_at)
+                            )
+                            confirmed += 1
+                        except pika.exceptions.NackError:
+                            nacked += 1
+                    slot.last_used = time.time()
+                    metrics.observe('joc_publish_seconds', time.perf_counter() - started, queue=label)
+                    metrics.inc('joc_published_total', confirmed, queue=label)
+                    if nacked:
+                        metrics.inc('joc_publish_failures_total', nacked, queue=label)
+                    return confirmed, nacked
+                except (pika.exceptions.AMQPError, OSError):
+                    slot.reset()
+                    # Topologia poate fi ștearsă între timp - o redeclarăm după reconectare
+                    with self._declared_lock:
+                        self._declared.discard(exchange or routing_key)
+                    if attempt:
+                        metrics.inc('joc_publish_failures_total', len(messages) - confirmed - nacked, queue=label)
+                        raise
+        finally:
+            self._slots.put(slot)
+
+    def close(self, timeout=5):
+        """Închide conexiunile; slot-urile rămân în pool și se reconectează la nevoie"""
+        taken = []
+        deadline = time.time() + timeout
+        try:
+            for _ in range(self.size):
+                taken.append(self._slots.get(timeout=max(0, deadline - time.time())))
+        except queue.Empty:
+            pass
+        for slot in taken:
+            slot.reset()
+            self._slots.put(slot)
+
+def metric_queue(exchange, routing_key):
+    """Eticheta de coadă a unei publicări; routing key-urile per cameră (chat) se adună pe exchange"""
+    if exchange in ('', EXCHANGE_GAME):
+        return routing_key
+    return exchange
+
+publisher_pool = PublisherPool(PUBLISHER_POOL_SIZE)
+
+class AsyncPublisher:
+    """Etapă de publicare în fundal: handler-ele pun mesaje în coadă și revin imediat.
+
+    Mesajele sunt împărțite pe PUBLISH_THREADS benzi după coada RabbitMQ de destinație
+    (ordinea mesajelor dintr-o coadă se păstrează). Fiecare bandă are thread-ul și
+    canalul ei cu confirmări, așa că așteptarea ack-urilor brokerului pe o bandă nu
+    oprește publicarea pe celelalte; thread-ul golește banda în loturi grupate pe coadă.
+    """
+
+    def __init__(self, maxsize, batch_size, policy, threads=1):
+        self.batch_size = batch_size
+        self.policy = policy
+        self.pool = PublisherPool(threads, confirms=True)
+        self.stats = {'enqueued': 0, 'confirmed': 0, 'nacked': 0, 'dropped': 0, 'failed': 0}
+        self._stats_lock = threading.Lock()
+        self._lanes = [queue.Queue(max(1, maxsize // threads)) for _ in range(threads)]
+        self._threads = []
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._threads and all(thread.is_alive() for thread in self._threads):
+                return
+            self._threads = [
+                threading.Thread(target=self._run, args=(lane,), daemon=True, name=f'Publisher-{i}')
+                for i, lane in enumerate(self._lanes)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def count(self, key, value=1):
+        with self._stats_lock:
+            self.stats[key] += value
+
+    def snapshot(self):
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def lane(self, exchange, queue_name):
+        return self._lanes[hash((exchange, queue_name)) % len(self._lanes)]
+
+    def enqueue(self, queue_name, data, exchange=''):
+        """Pune mesajul în coada de publicare; False dacă a fost respins de backpressure"""
+        if not self._threads:
+            self.start()
+
+        lane = self.lane(exchange, queue_name)
+        item = (exchange, queue_name, data, time.time())
+        try:
+            if self.policy == 'block':
+                lane.put(item, timeout=PUBLISH_BLOCK_TIMEOUT)
+            elif self.policy == 'drop_oldest':
+                while True:
+                    try:
+                        lane.put_nowait(item)
+                        break
+                    except queue.Full:
+                        try:
+                            lane.get_nowait()
+                            lane.task_done()
+                            self.count('dropped')
+                        except queue.Empty:
+                            pass
+            else:
+                lane.put_nowait(item)
+        except queue.Full:
+            self.count('dropped')
+            return False
+
+        self.count('enqueued')
+        return True
+
+    def _run(self, lane):
+        while True:
+            batch = [lane.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(lane.get_nowait())
+                except queue.Empty:
+                    break
+
+            by_queue = {}
+            for exchange, queue_name, data, sent_at in batch:
+                # Mesajele deja codificate (ex. snapshot-uri) sunt tupluri (corp, content_type)
+                body, content_type = data if isinstance(data, tuple) else encode_message(data)
+                by_queue.setdefault((exchange, queue_name), []).append((body, content_type, sent_at))
+
+            for (exchange, queue_name), messages in by_queue.items():
+                try:
+                    confirmed, nacked = self.pool.publish_batch(queue_name, messages, exchange=exchange)
+                    with self._stats_lock:
+                        self.stats['confirmed'] += confirmed
+                        self.stats['nacked'] += nacked
+                    log(logging.DEBUG, '📤 Lot publicat', queue=queue_name, confirmed=confirmed, nacked=nacked)
+                except Exception as e:
+                    self.count('failed', len(messages))
+                    log(logging.ERROR, '❌ Eroare RabbitMQ', queue=queue_name, error=e)
+
+            for _ in batch:
+                lane.task_done()
+
+    def pending(self):
+        return sum(lane.qsize() for lane in self._lanes)
+
+    def flush(self, timeout=5):
+        """Așteaptă publicarea mesajelor din coadă; True dacă s-a golit la timp"""
+        deadline = time.time() + timeout
+        for lane in self._lanes:
+            with lane.all_tasks_done:
+                while lane.unfinished_tasks:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return False
+                    lane.all_tasks_done.wait(remaining)
+        return True
+
+    def shutdown(self, timeout=5):
+        if self._threads:
+            self.flush(timeout)
+        self.pool.close()
+
+async_publisher = AsyncPublisher(PUBLISH_QUEUE_MAXSIZE, PUBLISH_BATCH_SIZE, PUBLISH_BACKPRESSURE, PUBLISH_THREADS)
+atexit.register(async_publisher.shutdown)
+metrics.gauge('joc_publish_pending', 'Mesaje care așteaptă publicarea', async_publisher.pending)
+metrics.gauge('joc_rooms', 'Camere păstrate în proces', lambda: len(rooms.room_ids()))
+
+def enqueue_message(queue_name, data):
+    """Trimite asincron o notificare (game_statistics / game_state) tuturor front-end-urilor.
+
+    Întoarce False dacă pipeline-ul e plin.
+    """
+    if event_log.replaying:
+        # Notificările au plecat deja la prima aplicare a comenzilor
+        return True
+    return async_publisher.enqueue(queue_name, data, exchange=EXCHANGE_STATS)
+
+def enqueue_command(queue_name, room_id, data):
+    """Trimite o comandă de joc pe coada shard-ului camerei (exchange topic)"""
+    data['room'] = room_id
+    return async_publisher.enqueue(command_queue(queue_name, room_shard(room_id)), data, exchange=EXCHANGE_GAME)
+
+# STATISTICI (AGREGARE)
+#
+# Notificările game_statistics / game_state pleacă pe EXCHANGE_STATS (fanout), așa că
+# fiecare proces care servește HTTP primește toate evenimentele pe coada lui exclusivă.
+# Consumer-ul doar le pune deoparte; un thread le agregă la fiecare STATS_FLUSH_INTERVAL în găleți de STATS_BUCKET secunde (fereastră
+# glisantă de STATS_WINDOW), global ('*') și per cameră, și publică rezultatele deja
+# serializate, așa că /api/stats nu calculează nimic.
+
+SCORE_BINS = (0, 5, 10, 20, 50)                 # Limitele intervalelor de scor
+DURATION_BINS = (0, 30, 60, 120, 300, 600)      # Limitele intervalelor de durată (secunde)
+
+def histogram_labels(bins):
+    return [f'{low}-{high}' for low, high in zip(bins, bins[1:])] + [f'{bins[-1]}+']
+
+def histogram_label(bins, value):
+    return histogram_labels(bins)[max(0, bisect.bisect_right(bins, value) - 1)]
+
+def new_stats_bucket():
+    return {
+        'joins': 0,
+        'matches_started': 0,
+        'matches_finished': 0,
+        'eliminations': 0,
+        'duration_total': 0.0,
+        'items': collections.Counter(),
+        'scores': collections.Counter(),
+        'durations': collections.Counter()
+    }
+
+def merge_stats_bucket(total, bucket):
+    for key, value in bucket.items():
+        if isinstance(value, collections.Counter):
+            total[key].update(value)
+        else:
+            total[key] += value
+
+class StatsEngine:
+    """Contoare și histograme pe fereastră glisantă, per cameră și globale"""
+
+    def __init__(self, window, bucket_seconds):
+        self.window = window
+        self.bucket_seconds = bucket_seconds
+        self._pending = collections.deque()
+        self._buckets = collections.deque()     # (începutul găleții, {scope: găleată})
+        self._results = {}                      # scope -> JSON serializat
+
+    def record(self, event):
+        """Apelat din consumer-e (mai multe thread-uri): doar îl pune deoparte, O(1)"""
+        self._pending.append(event)
+
+    def result(self, scope='*'):
+        result = self._results.get(scope)
+        if result is None:
+            # Nicio activitate în fereastră: rezultat gol, de mărime constantă
+            result = json_bytes(self._summary(scope, new_stats_bucket(), time.time()))
+        return result
+
+    def run(self):
+        while True:
+            time.sleep(STATS_FLUSH_INTERVAL)
             try:
-                data = json.loads(body)
-                action = data.get('action')
-                player = data.get('player')
-
-                if action == 'move':
-                    direction = data.get('direction')
-                    move_player(player, direction)
-                    print(f'🎯 [MOVES] {player} s-a mișcat: {direction}')
-                elif action == 'place_bomb':
-                    x, y = data.get('x'), data.get('y')
-                    place_bomb_setup(player, x, y)
-                    print(f'💣 [MOVES] {player} a plasat bombă: ({x}, {y})')
-
-                ch.basic_ack(delivery_tag=method.delivery_tag)
+                self.flush()
             except Exception as e:
-                print(f'❌ Moves Error: {e}')
-                ch.basic_ack(delivery_tag=method.delivery_tag)
+                log(logging.ERROR, '❌ Eroare la agregarea statisticilor', error=e)
+
+    def flush(self, now=None):
+        now = time.time() if now is None else now
+        start = now - now % self.bucket_seconds
+        if not self._buckets or self._buckets[-1][0] != start:
+            self._buckets.append((start, {}))
+        current = self._buckets[-1][1]
+
+        while self._pending:
+            event = self._pending.popleft()
+            for scope in ('*', event.get('room')):
+                if scope is not None:
+                    if scope not in current:
+                        current[scope] = new_stats_bucket()
+                    self._apply(current[scope], event)
+
+        while self._buckets[0][0] <= now - self.window:
+            self._buckets.popleft()
+
+        totals = {}
+        for _, scopes in self._buckets:
+            for scope, bucket in scopes.items():
+                if scope not in totals:
+                    totals[scope] = new_stats_bucket()
+                merge_stats_bucket(totals[scope], bucket)
+        # Publicare prin atribuire: cititorii văd fie vechile rezultate, fie pe cele noi
+        self._results = {scope: json_bytes(self._summary(scope, total, now)) for scope, total in totals.items()}
+
+    def _apply(self, bucket, event):
+        kind = event.get('type')
+        if kind == 'player_join':
+            bucket['joins'] += 1
+        elif kind == 'item_found':
+            bucket['items'][event.get('item_type')] += 1
+        elif kind == 'player_eliminated':
+            bucket['eliminations'] += 1
+            bucket['scores'][histogram_label(SCORE_BINS, event.get('score', 0))] += 1
+        elif kind == 'phase_change' and event.get('phase') == 'playing':
+            bucket['matches_started'] += 1
+        elif kind == 'phase_change' and event.get('phase') == 'finished':
+            duration = event.get('duration', 0)
+            bucket['matches_finished'] += 1
+            bucket['duration_total'] += duration
+            bucket['durations'][histogram_label(DURATION_BINS, duration)] += 1
+            for score in event.get('scores', {}).values():
+                bucket['scores'][histogram_label(SCORE_BINS, score)] += 1
+
+    def _summary(self, scope, total, now):
+        # Ratele se raportează la partea din fereastră acoperită deja de date
+        covered = now - self._buckets[0][0] if self._buckets else self.bucket_seconds
+        minutes = max(covered, self.bucket_seconds) / 60
+        finished = total['matches_finished']
+        return {
+            'scope': scope,
+            'window_seconds': self.window,
+            'updated': now,
+            'joins': total['joins'],
+            'matches_started': total['matches_started'],
+            'matches_finished': finished,
+            'items_found': dict(total['items']),
+            'items_found_total': sum(total['items'].values()),
+            'eliminations': total['eliminations'],
+            'eliminations_per_minute': round(total['eliminations'] / minutes, 3),
+            'avg_match_duration': round(total['duration_total'] / finished, 1) if finished else None,
+            'score_histogram': {label: total['scores'][label] for label in histogram_labels(SCORE_BINS)},
+            'duration_histogram': {label: total['durations'][label] for label in histogram_labels(DURATION_BINS)}
+        }
+
+stats_engine = StatsEngine(STATS_WINDOW, STATS_BUCKET)
+
+# COMENZI (VALIDARE LA MARGINE)
+#
+# Fiecare tip de comandă are o schemă (câmp -> verificare) din care validatorul se
+# construiește o singură dată. Rutele resping cu 400 cererile care nu o respectă, deci
+# o comandă greșită nu mai costă o publicare; consumer-ele primesc obiecte cu __slots__
+# în loc de dicționare. Pe fir comenzile rămân dicționare (JSON / msgpack / binar).
+
+class InvalidCommand(ValueError):
+    pass
+
+def player_field(value):
+    if not isinstance(value, str) or not 0 < len(value) <= PLAYER_NAME_MAX_LENGTH:
+        raise InvalidCommand(f'nume de 1-{PLAYER_NAME_MAX_LENGTH} caractere')
+    return value
+
+def enum_field(values):
+    allowed = frozenset(values)
+    def check(value):
+        if not isinstance(value, str) or value not in allowed:
+            raise InvalidCommand('una din ' + ', '.join(values))
+        return value
+    return check
+
+def coordinate_field(value):
+    if type(value) is not int or not 0 <= value < GRID_MAX_SIZE:
+        raise InvalidCommand(f'întreg între 0 și {GRID_MAX_SIZE - 1}')
+    return value
+
+def grid_size_field(value):
+    # Opțională; o mărime în afara limitelor se ajustează, ca până acum
+    if value is None:
+        return None
+    if type(value) is not int:
+        raise InvalidCommand('întreg sau null')
+    return clamp_grid_size(value)
+
+def text_field(max_length):
+    def check(value):
+        if not isinstance(value, str) or not 0 < len(value) <= max_length:
+            raise InvalidCommand(f'text de 1-{max_length} caractere')
+        return value
+    return check
+
+def optional(check):
+    def optional_check(value):
+        return None if value is None else check(value)
+    return optional_check
+
+def compile_validator(schema):
+    """Funcția care verifică un dicționar după schemă și întoarce valorile, în ordinea câmpurilor"""
+    checks = tuple(schema.items())
+
+    def validate(data):
+        if not isinstance(data, dict):
+            raise InvalidCommand('corpul trebuie să fie un obiect JSON')
+        values = []
+        for key, check in checks:
+            try:
+                values.append(check(data.get(key)))
+            except InvalidCommand as e:
+                raise InvalidCommand(f'{key}: {e}') from None
+        return values
+    return validate
+
+class Command:
+    """Comandă validată pentru o cameră; câmpurile sunt cele din schema subclasei"""
+    __slots__ = ('room',)
+    action = None
+    fields = ()
+
+    def __init__(self, room, *values):
+        self.room = room
+        for name, value in zip(self.fields, values):
+            setattr(self, name, value)
+
+    @classmethod
+    def parse(cls, room_id, data):
+        return cls(room_id, *cls.validate(data))
+
+    def message(self):
+        """Forma de pe fir (fără cameră, pe care o adaugă enqueue_command)"""
+        data = {'action': self.action}
+        for name in self.fields:
+            data[name] = getattr(self, name)
+        return data
+
+def command_type(name, action, schema):
+    return type(name, (Command,), {
+        '__slots__': tuple(schema),
+        'action': action,
+        'fields': tuple(schema),
+        'validate': staticmethod(compile_validator(schema))
+    })
 
-        channel.basic_consume(queue=QUEUE_MOVES, on_message_callback=callback)
-        print('🎯 [MOVES CONSUMER] Pornit!')
-        channel.start_consuming()
-    except Exception as e:
-        print(f'❌ Moves Consumer Error: {e}')
+JoinCommand = command_type('JoinCommand', 'join', {'player': player_field, 'grid_size': grid_size_field})
+MoveCommand = command_type('MoveCommand', 'move', {
+    'player': player_field, 'direction': enum_field(MOVE_DIRECTIONS[1:])})
+BombCommand = command_type('BombCommand', 'place_bomb', {
+    'player': player_field, 'x': coordinate_field, 'y': coordinate_field})
+ChatCommand = command_type('ChatCommand', 'chat', {
+    'player': player_field, 'message': text_field(CHAT_MAX_LENGTH)})
+# Comenzile directe ale front-end-urilor fără stare (reset nu are neapărat un jucător)
+TouchCommand = command_type('TouchCommand', 'touch', {'player': player_field})
+LeaveCommand = command_type('LeaveCommand', 'leave', {'player': player_field})
+ResetCommand = command_type('ResetCommand', 'reset', {'player': optional(player_field)})
+
+COMMAND_TYPES = {
+    command.action: command
+    for command in (JoinCommand, MoveCommand, BombCommand, ChatCommand, TouchCommand, LeaveCommand, ResetCommand)
+}
 
-def chat_consumer():
-    """Consumer pentru chat"""
+def message_command(data, command=None):
+    """Comanda dintr-un mesaj primit; None (logat) dacă mesajul nu respectă schema"""
     try:
-        connection = pika.BlockingConnection(
-            pika.ConnectionParameters(host=RABBITMQ_HOST, heartbeat=600, blocked_connection_timeout=300)
-        )
-        channel = connection.channel()
-        channel.queue_declare(queue=QUEUE_CHAT, durable=True)
-        channel.basic_qos(prefetch_count=1)
+        if command is None:
+            command = COMMAND_TYPES.get(data.get('action'))
+            if command is None:
+                raise InvalidCommand(f"acțiune necunoscută: {data.get('action')!r}")
+        return command.parse(data.get('room') or DEFAULT_ROOM, data)
+    except InvalidCommand as e:
+        log(logging.WARNING, '⚠️ Comandă invalidă ignorată', error=e)
+        return None
 
-        def callback(ch, method, properties, body):
+# RABBITMQ - CONSUMERS
+
+def handle_statistics(data):
+    # Producătorii vechi publică direct în coadă: evenimentul e mutat pe fan-out
+    enqueue_message(QUEUE_STATISTICS, data)
+    log(logging.DEBUG, '📊 Statistică (coadă veche)', queue=QUEUE_STATISTICS, event=data.get('type'), room=data.get('room'))
+
+def handle_state(data):
+    enqueue_message(QUEUE_STATE, data)
+    log(logging.DEBUG, '🎮 Stare (coadă veche)', queue=QUEUE_STATE, event=data.get('type'), room=data.get('room'))
+
+def handle_stats_fanout(data):
+    stats_engine.record(data)
+    log(logging.DEBUG, '📊 Statistică', event=data.get('type'), room=data.get('room'))
+
+def handle_moves(data):
+    # Doar join creează camere: comenzile pentru o cameră necunoscută (sau deja închisă) se ignoră
+    command = message_command(data)
+    if type(command) is MoveCommand:
+        rooms.call(command.room, move_player, command.player, command.direction, create=False)
+        log(logging.DEBUG, '🎯 Mișcare', room=command.room, player=command.player, direction=command.direction)
+    elif type(command) is BombCommand:
+        rooms.call(command.room, place_bomb_setup, command.player, command.x, command.y, create=False)
+        log(logging.DEBUG, '💣 Bombă plasată', room=command.room, player=command.player, x=command.x, y=command.y)
+
+def handle_chat(data):
+    # Actorul camerei numerotează mesajul și îl publică pe fan-out
+    command = message_command(data, ChatCommand)
+    if command is None:
+        return
+    rooms.call(command.room, add_message, command.player, command.message, create=False)
+    log(logging.DEBUG, '💬 Chat', room=command.room, player=command.player)
+
+def handle_actions(data):
+    command = message_command(data)
+    if type(command) is JoinCommand:
+        rooms.call(command.room, add_player, command.player, command.grid_size)
+        log(logging.INFO, '✅ Jucător intrat', room=command.room, player=command.player)
+    # Comenzi directe trimise de front-end-uri fără stare (modul distribuit)
+    elif type(command) is TouchCommand:
+        rooms.call(command.room, touch_player, command.player, create=False)
+    elif type(command) is LeaveCommand:
+        rooms.call(command.room, remove_player, command.player, create=False)
+    elif type(command) is ResetCommand:
+        rooms.call(command.room, reset_game, create=False)
+
+def consumer_config(handler, prefetch=50, workers=1, ack_every=20, ack_interval_ms=100, declare=declare_queue,
+                    tick=None):
+    """Configurația unei cozi: prefetch, thread-uri de lucru și ack în lot (N mesaje sau T ms).
+
+    `declare(channel, queue_name)` creează coada (și legăturile ei) la fiecare conectare;
+    `tick(channel, queue_name)`, opțional, rulează pe thread-ul consumer-ului la fiecare
+    trecere prin buclă (cel mult la ack_interval_ms), ex. pentru legături schimbate între timp.
+    """
+    return {
+        'handler': handler,
+        'prefetch': prefetch,
+        'workers': workers,
+        'ack_every': ack_every,
+        'ack_interval_ms': ack_interval_ms,
+        'declare': declare,
+        'tick': tick
+    }
+
+def command_consumers(shards):
+    """Consumer-ele cozilor de comenzi pentru shard-urile date.
+
+    Mișcările, chat-ul și acțiunile rămân pe un singur worker per shard: ordinea
+    contează în cadrul unei camere, iar camerele din shard-uri diferite nu se blochează.
+    """
+    table = {}
+    for shard in shards:
+        table[command_queue(QUEUE_MOVES, shard)] = consumer_config(
+            handle_moves, prefetch=100, ack_every=50, ack_interval_ms=50, declare=declare_command_queue)
+        table[command_queue(QUEUE_CHAT, shard)] = consumer_config(handle_chat, declare=declare_command_queue)
+        table[command_queue(QUEUE_ACTIONS, shard)] = consumer_config(handle_actions, declare=declare_command_queue)
+    return table
+
+NOTIFICATION_CONSUMERS = {
+    QUEUE_STATISTICS: consumer_config(handle_statistics, prefetch=200, workers=2, ack_every=100),
+    QUEUE_STATE: consumer_config(handle_state, prefetch=200, workers=2, ack_every=100)
+}
+
+CONSUMERS = {**NOTIFICATION_CONSUMERS, **command_consumers(range(STATE_SHARDS))}
+
+def declare_stats_queue(channel, queue_name):
+    # Coadă proprie procesului, ștearsă la deconectare; primește evenimentele tuturor camerelor
+    declare_exchange(channel, EXCHANGE_STATS)
+    channel.queue_declare(queue=queue_name, exclusive=True, auto_delete=True)
+    channel.queue_bind(queue=queue_name, exchange=EXCHANGE_STATS)
+
+STATS_CONSUMERS = {
+    f'{EXCHANGE_STATS}.{PROCESS_ID}': consumer_config(
+        handle_stats_fanout, prefetch=500, workers=2, ack_every=200, declare=declare_stats_queue)
+}
+
+class BatchAcker:
+    """Confirmă mesajele cu multiple=True după N mesaje sau T secunde.
+
+    Cu mai mulți workeri mesajele se termină în altă ordine decât au sosit, așa că
+    se confirmă doar prefixul continuu de mesaje terminate.
+    """
+
+    def __init__(self, channel, ack_every, ack_interval):
+        self.channel = channel
+        self.ack_every = ack_every
+        self.ack_interval = ack_interval
+        self.delivered = collections.deque()
+        self.completed = set()
+        self.ready = 0
+        self.last_tag = None
+        self.last_ack = time.monotonic()
+
+    def delivered_tag(self, tag):
+        self.delivered.append(tag)
+
+    def done(self, tag):
+        self.completed.add(tag)
+        while self.delivered and self.delivered[0] in self.completed:
+            self.completed.discard(self.delivered[0])
+            self.last_tag = self.delivered.popleft()
+            self.ready += 1
+
+    def maybe_flush(self):
+        if self.ready >= self.ack_every or (self.ready and time.monotonic() - self.last_ack >= self.ack_interval):
+            self.flush()
+
+    def flush(self):
+        if self.ready:
+            self.channel.basic_ack(delivery_tag=self.last_tag, multiple=True)
+            self.ready = 0
+        self.last_ack = time.monotonic()
+
+class ConsumerEngine:
+    """Un singur motor pentru toate cozile: un thread de conexiune per coadă,
+    workeri opționali și reconectare cu backoff exponențial."""
+
+    def __init__(self, table):
+        self.table = table
+        self._stops = {}
+        self._threads = {}
+
+    def start(self):
+        for queue_name, config in self.table.items():
+            self.add(queue_name, config)
+
+    def add(self, queue_name, config):
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=self._consume_forever,
+            args=(queue_name, config, stop),
+            daemon=True,
+            name=f'Consumer-{queue_name}'
+        )
+        self._stops[queue_name] = stop
+        self._threads[queue_name] = thread
+        thread.start()
+        return thread
+
+    def remove(self, queue_name, timeout=5):
+        stop = self._stops.pop(queue_name, None)
+        thread = self._threads.pop(queue_name, None)
+        if stop is not None:
+            stop.set()
+            thread.join(timeout)
+
+    def stop(self, timeout=5):
+        for queue_name in list(self._stops):
+            self.remove(queue_name, timeout)
+
+    def _consume_forever(self, queue_name, config, stop):
+        delay = CONSUMER_BACKOFF_MIN
+        while not stop.is_set():
+            session = {'connected': False}
             try:
-                data = json.loads(body)
-                player = data.get('player')
-                message = data.get('message', '')
-                add_chat(player, message)
-                print(f'💬 [CHAT] {player}: {message}')
-                ch.basic_ack(delivery_tag=method.delivery_tag)
+                self._consume(queue_name, config, stop, session)
             except Exception as e:
-                print(f'❌ Chat Error: {e}')
-                ch.basic_ack(delivery_tag=method.delivery_tag)
+                if session['connected']:
+                    delay = CONSUMER_BACKOFF_MIN
+                log(logging.ERROR, '❌ Consumer oprit', queue=queue_name, error=e, retry_in=round(delay, 1))
+                stop.wait(delay)
+                delay = min(delay * 2, CONSUMER_BACKOFF_MAX)
+
+    def _consume(self, queue_name, config, stop, session):
+        handler = config['handler']
+        # Cozile exclusive (chat, statistici, ...) au în nume id-ul procesului: eticheta rămâne stabilă
+        metric_label = queue_name.removesuffix(f'.{PROCESS_ID}')
+        connection = pika.BlockingConnection(rabbitmq_parameters())
+        workers = ThreadPoolExecutor(config['workers'], thread_name_prefix=queue_name) if config['workers'] > 1 else None
+        finished = queue.SimpleQueue()
+        try:
+            channel = connection.channel()
+            config['declare'](channel, queue_name)
+            channel.basic_qos(prefetch_count=config['prefetch'])
+            acker = BatchAcker(channel, config['ack_every'], config['ack_interval_ms'] / 1000)
+            session['connected'] = True
+            log(logging.INFO, '📥 Consumer pornit', queue=queue_name, prefetch=config['prefetch'], workers=config['workers'])
+
+            def process(tag, properties, body):
+                started = time.time()
+                try:
+                    handler(decode_message(body, properties.content_type))
+                except Exception as e:
+                    metrics.inc('joc_consumer_errors_total', handler=handler.__name__)
+                    log(logging.ERROR, '❌ Eroare handler', queue=queue_name, handler=handler.__name__, error=e)
+                done = time.time()
+                finished.put(tag)
+                metrics.observe('joc_consumer_seconds', done - started, handler=handler.__name__)
+                sent_at = (properties.headers or {}).get(SENT_AT_HEADER)
+                if sent_at is not None:
+                    metrics.observe('joc_queue_lag_seconds', max(0.0, started - sent_at / 1000), queue=metric_label)
+                    metrics.observe('joc_end_to_end_seconds', max(0.0, done - sent_at / 1000), queue=metric_label)
+
+            for method, properties, body in channel.consume(queue_name, inactivity_timeout=max(0.01, acker.ack_interval)):
+                if stop.is_set():
+                    break
+                if method is not None:
+                    acker.delivered_tag(method.delivery_tag)
+                    if workers is not None:
+                        workers.submit(process, method.delivery_tag, properties, body)
+                    else:
+                        process(method.delivery_tag, properties, body)
+                if config['tick'] is not None:
+                    config['tick'](channel, queue_name)
+                while True:
+                    try:
+                        acker.done(finished.get_nowait())
+                    except queue.Empty:
+                        break
+                acker.maybe_flush()
+
+            # Oprire curată: terminăm mesajele în lucru, confirmăm, restul revin în coadă
+            if workers is not None:
+                workers.shutdown(wait=True)
+                workers = None
+            while True:
+                try:
+                    acker.done(finished.get_nowait())
+                except queue.Empty:
+                    break
+            acker.flush()
+            channel.cancel()
+        finally:
+            if workers is not None:
+                workers.shutdown(wait=False)
+            try:
+                if connection.is_open:
+                    connection.close()
+            except Exception:
+                pass
+
+consumer_engine = ConsumerEngine(CONSUMERS)
+
+
+# SCALARE ORIZONTALĂ (WORKERI ȘI FRONT-END-URI)
+#
+# python joc.py          - totul într-un proces (implicit)
+# python joc.py worker   - logica jocului pentru shard-urile primite din inelul de hash
+# python joc.py web      - Flask fără stare: publică comenzi, citește snapshot-urile workerilor
+# gunicorn -c gunicorn.conf.py joc:app
+#                        - ca 'web', în mai multe procese (vezi gunicorn.conf.py)
+
+def snapshot_routing_key(shard):
+    return f'snapshot.{shard}'
+
+def publish_room_snapshot(room):
+    """on_publish în worker: starea completă a camerei, codificată pe loc (pe actor)"""
+    message = encode_message({
+        'type': 'snapshot',
+        'room': room.id,
+        'version': room.snapshot()['version'],
+        'state': export_state(room.state)
+    })
+    async_publisher.enqueue(snapshot_routing_key(room_shard(room.id)), message, exchange=EXCHANGE_SNAPSHOTS)
 
-        channel.basic_consume(queue=QUEUE_CHAT, on_message_callback=callback)
-        print('💬 [CHAT CONSUMER] Pornit!')
-        channel.start_consuming()
-    except Exception as e:
-        print(f'❌ Chat Consumer Error: {e}')
+def publish_eviction(room_id):
+    async_publisher.enqueue(
+        snapshot_routing_key(room_shard(room_id)),
+        {'type': 'evicted', 'room': room_id},
+        exchange=EXCHANGE_SNAPSHOTS
+    )
 
-def actions_consumer():
-    """Consumer pentru acțiuni generale"""
-    try:
-        connection = pika.BlockingConnection(
-            pika.ConnectionParameters(host=RABBITMQ_HOST, heartbeat=600, blocked_connection_timeout=300)
-        )
-        channel = connection.channel()
-        channel.queue_declare(queue=QUEUE_ACTIONS, durable=True)
-        channel.basic_qos(prefetch_count=1)
+def handle_snapshot(data):
+    kind = data.get('type')
+    if kind == 'released':
+        if shard_coordinator is not None:
+            shard_coordinator.released(data['shard'], data['worker'])
+        return
 
-        def callback(ch, method, properties, body):
-            try:
-                data = json.loads(body)
-                action = data.get('action')
-                player = data.get('player')
+    room_id = data['room']
+    if rooms.owns(room_id):
+        # Ecoul propriilor snapshot-uri
+        return
+    if kind == 'snapshot':
+        rooms.install(room_id, data['state'], data['version'])
+        # Mesajele din snapshot umplu golurile istoricului de chat (doar camere deja urmărite)
+        chat_hub.seed(room_id, data['state']['epoch'], data['state'].get('messages', ()))
+    elif kind == 'evicted':
+        rooms.actor(room_id).submit(None, rooms.discard, room_id)
+
+def republish_room(room_id):
+    # Pe actorul camerei, ca snapshot-ul să nu se intercaleze cu o comandă
+    room = rooms.peek(room_id)
+    if room is not None and rooms.owns(room_id):
+        publish_room_snapshot(room)
+
+def handle_worker(data):
+    if data.get('type') == 'sync':
+        # Un proces nou (sau reconectat) nu a văzut camerele care nu s-au mai schimbat
+        for room_id in rooms.room_ids(owned=True):
+            rooms.actor(room_id).submit(None, republish_room, room_id)
+        return
+    if shard_coordinator is not None:
+        shard_coordinator.heard(data['worker'])
+
+def declare_snapshot_queue(channel, queue_name):
+    # Coadă proprie procesului, ștearsă la deconectare
+    declare_exchange(channel, EXCHANGE_SNAPSHOTS)
+    channel.queue_declare(queue=queue_name, exclusive=True, auto_delete=True)
+    channel.queue_bind(queue=queue_name, exchange=EXCHANGE_SNAPSHOTS, routing_key='snapshot.#')
+    # Abia după legare: cerem workerilor starea curentă a camerelor lor
+    declare_exchange(channel, EXCHANGE_WORKERS)
+    body, content_type = encode_message({'type': 'sync', 'process': PROCESS_ID})
+    channel.basic_publish(exchange=EXCHANGE_WORKERS, routing_key='', body=body,
+                          properties=message_properties(content_type))
+
+def declare_worker_queue(channel, queue_name):
+    declare_exchange(channel, EXCHANGE_WORKERS)
+    channel.queue_declare(queue=queue_name, exclusive=True, auto_delete=True)
+    channel.queue_bind(queue=queue_name, exchange=EXCHANGE_WORKERS)
+
+SNAPSHOT_CONSUMERS = {
+    f'{EXCHANGE_SNAPSHOTS}.{PROCESS_ID}': consumer_config(
+        handle_snapshot, prefetch=500, ack_every=200, declare=declare_snapshot_queue)
+}
+
+WORKER_CONSUMERS = {
+    **NOTIFICATION_CONSUMERS,
+    **SNAPSHOT_CONSUMERS,
+    f'{EXCHANGE_WORKERS}.{PROCESS_ID}': consumer_config(handle_worker, declare=declare_worker_queue)
+}
 
-                if action == 'join':
-                    add_player(player)
-                    print(f'✅ [ACTIONS] {player} a intrat în joc!')
+class HashRing:
+    """Inel de hash consistent: când un worker intră sau iese se mută doar ~1/N din shard-uri"""
 
-                ch.basic_ack(delivery_tag=method.delivery_tag)
+    def __init__(self, nodes, replicas=RING_REPLICAS):
+        self._points = sorted(
+            (zlib.crc32(f'{node}#{i}'.encode('utf-8')), node)
+            for node in nodes for i in range(replicas)
+        )
+        self._hashes = [h for h, _ in self._points]
+
+    def owner(self, key):
+        if not self._points:
+            return None
+        index = bisect.bisect(self._hashes, zlib.crc32(key.encode('utf-8'))) % len(self._points)
+        return self._points[index][1]
+
+def shard_owners(nodes):
+    ring = HashRing(sorted(nodes))
+    return {shard: ring.owner(f'shard-{shard}') for shard in range(STATE_SHARDS)}
+
+class ShardCoordinator:
+    """Împarte shard-urile între workeri și le mută fără a pierde comenzile în zbor.
+
+    Vechiul deținător oprește consumer-ele shard-ului (mesajele neconfirmate revin în
+    coadă), așteaptă ca actorul să aplice ce a primit, publică ultimele snapshot-uri și
+    apoi un marcaj 'released' pe același canal. Noul deținător consumă doar după ce a
+    văzut marcajul (deci și snapshot-urile dinaintea lui), după ce vechiul deținător a
+    dispărut sau după HANDOVER_TIMEOUT; cozile au un singur consumer activ, deci nici
+    atunci două procese nu aplică în paralel comenzile aceluiași shard.
+    """
+
+    def __init__(self, worker_id, engine, registry):
+        self.worker_id = worker_id
+        self.engine = engine
+        self.registry = registry
+        self.registry.owned_shards = set()
+        self.members = {worker_id: time.time()}
+        self.assignment = None      # shard -> deținător, după ultima rebalansare
+        self.pending = {}           # shard -> (deținătorul anterior, început, termen)
+        self.markers = {}           # (shard, worker) -> momentul marcajului 'released'
+        self.started = time.time()
+        self.rebalanced_at = None   # Runda anterioară: marcajele de după ea sunt predări către noi
+        self._lock = threading.Lock()
+
+    def heard(self, worker_id):
+        with self._lock:
+            self.members[worker_id] = time.time()
+
+    def released(self, shard, worker_id):
+        with self._lock:
+            self.markers[(shard, worker_id)] = time.time()
+
+    def run(self):
+        while True:
+            try:
+                publisher_pool.publish('', {'type': 'worker', 'worker': self.worker_id}, exchange=EXCHANGE_WORKERS)
             except Exception as e:
-                print(f'❌ Actions Error: {e}')
-                ch.basic_ack(delivery_tag=method.delivery_tag)
+                log(logging.ERROR, '❌ Anunțul de prezență a eșuat', worker=self.worker_id, error=e)
+            # Prima rebalansare abia după ce am aflat de ceilalți workeri
+            if time.time() - self.started >= WORKER_TIMEOUT:
+                try:
+                    self.rebalance(time.time())
+                except Exception as e:
+                    # Ex. drain() expirat: runda următoare reia shard-urile rămase nepredate
+                    log(logging.ERROR, '❌ Rebalansarea a eșuat', worker=self.worker_id, error=e)
+            time.sleep(WORKER_HEARTBEAT)
+
+    def rebalance(self, now):
+        with self._lock:
+            self.members = {
+                worker: seen for worker, seen in self.members.items()
+                if now - seen <= WORKER_TIMEOUT or worker == self.worker_id
+            }
+            alive = set(self.members)
+            markers = dict(self.markers)
+
+        if self.assignment is None:
+            # La pornire shard-urile sunt ale celorlalți, până le predau explicit
+            self.assignment = shard_owners(alive - {self.worker_id})
+        previous, self.assignment = self.assignment, shard_owners(alive)
+        owned = self.registry.owned_shards
+        # Vechiul deținător poate preda înaintea rundei noastre (ne aude mai devreme decât
+        # rebalansăm): contează orice marcaj de după runda anterioară, nu doar de acum
+        handover_since = self.rebalanced_at or self.started
+        self.rebalanced_at = now
+
+        for shard, owner in self.assignment.items():
+            if owner != self.worker_id:
+                self.pending.pop(shard, None)
+                if shard in owned:
+                    self.release(shard)
+                continue
+            if shard in owned:
+                continue
+
+            if shard not in self.pending:
+                before = previous.get(shard)
+                self.pending[shard] = (before if before != self.worker_id else None, handover_since, now + HANDOVER_TIMEOUT)
+            before, since, deadline = self.pending[shard]
+            handed_over = markers.get((shard, before), 0) >= since
+            if before is None or before not in alive or handed_over or now >= deadline:
+                del self.pending[shard]
+                self.acquire(shard)
+
+    def acquire(self, shard):
+        self.registry.owned_shards.add(shard)
+        self.registry.adopt(shard)
+        for queue_name, config in command_consumers([shard]).items():
+            self.engine.add(queue_name, config)
+        log(logging.INFO, '📦 Shard preluat', worker=self.worker_id, shard=shard)
+
+    def release(self, shard):
+        for queue_name in command_consumers([shard]):
+            self.engine.remove(queue_name)
+        self.registry.drain(shard)
+        self.registry.owned_shards.discard(shard)
+        async_publisher.enqueue(
+            snapshot_routing_key(shard),
+            {'type': 'released', 'shard': shard, 'worker': self.worker_id},
+            exchange=EXCHANGE_SNAPSHOTS
+        )
+        async_publisher.flush()
+        log(logging.INFO, '📤 Shard predat', worker=self.worker_id, shard=shard)
+
+shard_coordinator = None
+
+def relay_presence():
+    """Front-end: workerii nu văd cererile și stream-urile de aici, așa că le trimitem ca 'touch'.
+
+    Un singur 'touch' per jucător la fiecare perioadă, oricâte cereri ar fi făcut.
+    """
+    while True:
+        time.sleep(PLAYER_TIMEOUT / 2)
+        for room_id, player_name in stream_presence.connected() | stream_presence.take_seen():
+            enqueue_command(QUEUE_ACTIONS, room_id, {'action': 'touch', 'player': player_name})
+        chat_hub.prune(time.time())
+
+# CHAT (FAN-OUT PER CAMERĂ)
+#
+# Mesajele jucătorilor nu trec prin snapshot-urile clienților: front-end-ul care primește
+# POST /api/chat le trimite pe coada de chat a shard-ului, actorul camerei le numerotează
+# (seq consecutiv per cameră, o singură dată) și le publică pe EXCHANGE_CHAT ('chat.<cameră>').
+# Fiecare proces Flask are propria coadă exclusivă, legată doar la camerele cu abonați
+# în proces, și le împinge direct clienților conectați la el (SSE). Ultimele mesaje
+# rămân în starea camerei ('messages'), de unde un proces nou își umple istoricul.
+
+def chat_routing_key(room_id):
+    return f'chat.{room_id}'
+
+class RateLimiter:
+    """Token bucket per cheie: `rate` mesaje pe secundă, rafale de până la `burst`"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}          # cheie -> (jetoane, momentul ultimei actualizări)
+        self._lock = threading.Lock()
+
+    def allow(self, key, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1
+            self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+            return allowed
+
+    def prune(self, now):
+        # O găleată care s-ar fi umplut la loc e la fel ca una nouă
+        refill = self.burst / self.rate
+        with self._lock:
+            for key in [key for key, (_, last) in self._buckets.items() if now - last > refill]:
+                del self._buckets[key]
+
+class ChatHub:
+    """Ultimele mesaje de chat primite de acest proces, per cameră, cu așteptare pentru stream-uri"""
+
+    def __init__(self):
+        self._rooms = {}            # cameră -> (inel de mesaje, Condition)
+        self._watchers = {}         # cameră -> funcții apelate la fiecare mesaj nou
+        self._followers = {}        # cameră -> stream-uri abonate în proces
+        self._follow_watchers = set()  # Apelate când se schimbă camerele urmărite
+        self._lock = threading.Lock()
+
+    def _room(self, room_id):
+        with self._lock:
+            entry = self._rooms.get(room_id)
+            if entry is None:
+                entry = self._rooms[room_id] = (collections.deque(maxlen=CHAT_HISTORY), threading.Condition())
+            return entry
+
+    def deliver(self, room_id, message):
+        """Un mesaj numerotat de actorul camerei; duplicatele (seq deja văzut) se ignoră"""
+        history, changed = self._room(room_id)
+        with changed:
+            if history and history[-1]['epoch'] != message['epoch']:
+                # Cameră recreată: seq-urile o iau de la capăt
+                history.clear()
+            elif history and message['seq'] <= history[-1]['seq']:
+                # Redelivery sau mesaj venit deja cu snapshot-ul camerei
+                return
+            history.append(message)
+            changed.notify_all()
+        self._notify(room_id)
+
+    def seed(self, room_id, epoch, messages, create=False):
+        """Completează istoricul din mesajele păstrate în starea camerei (snapshot)"""
+        if not create and room_id not in self._rooms:
+            return
+        history, changed = self._room(room_id)
+        with changed:
+            merged = {}
+            if history and history[-1]['epoch'] == epoch:
+                merged = {message['seq']: message for message in history}
+            for message in messages:
+                merged.setdefault(message['seq'], dict(message, type='chat', room=room_id, epoch=epoch))
+            seqs = sorted(merged)[-CHAT_HISTORY:]
+            if seqs == [message['seq'] for message in history]:
+                return
+            history.clear()
+            history.extend(merged[seq] for seq in seqs)
+            changed.notify_all()
+        self._notify(room_id)
+
+    def _notify(self, room_id):
+        for callback in tuple(self._watchers.get(room_id, ())):
+            callback()
+
+    def after(self, room_id, seq):
+        """(mesajele cu seq > `seq`, True dacă unele au ieșit deja din inel)"""
+        entry = self._rooms.get(room_id)
+        if entry is None:
+            # Primul client al camerei în proces: istoricul vine din starea ei
+            self.seed(room_id, *room_messages(room_id), create=True)
+            entry = self._rooms.get(room_id)
+            if entry is None:
+                return [], False
+        history, changed = entry
+        with changed:
+            if history and seq > history[-1]['seq']:
+                # Cursor dintr-o cameră recreată între timp (seq-urile o iau de la capăt)
+                seq = 0
+            # Golurile (mesaje pierdute înainte de legarea cozii) le umple snapshot-ul următor
+            messages = [message for message in history if message['seq'] > seq]
+            return messages, bool(history) and history[0]['seq'] > seq + 1
+
+    def wait(self, room_id, seq, timeout):
+        """Blochează până apare un mesaj după `seq` sau expiră timeout-ul"""
+        history, changed = self._room(room_id)
+        with changed:
+            return changed.wait_for(lambda: history and history[-1]['seq'] != seq, timeout)
+
+    def watch(self, room_id, callback):
+        with self._lock:
+            self._watchers.setdefault(room_id, set()).add(callback)
+
+    def unwatch(self, room_id, callback):
+        with self._lock:
+            watchers = self._watchers.get(room_id)
+            if watchers is not None:
+                watchers.discard(callback)
+                if not watchers:
+                    del self._watchers[room_id]
+
+    def follow(self, room_id):
+        """Un stream nou pe chat-ul camerei; primul leagă coada procesului la 'chat.<cameră>'"""
+        with self._lock:
+            count = self._followers.get(room_id, 0)
+            self._followers[room_id] = count + 1
+        if count == 0:
+            self.seed(room_id, *room_messages(room_id), create=True)
+            for callback in tuple(self._follow_watchers):
+                callback()
+
+    def unfollow(self, room_id):
+        """Ultimul stream plecat dezleagă camera; istoricul rămâne până la prune"""
+        with self._lock:
+            count = self._followers.get(room_id, 0) - 1
+            if count > 0:
+                self._followers[room_id] = count
+                return
+            self._followers.pop(room_id, None)
+        for callback in tuple(self._follow_watchers):
+            callback()
+
+    def followed(self):
+        with self._lock:
+            return set(self._followers)
+
+    def watch_follows(self, callback):
+        self._follow_watchers.add(callback)
+
+    def prune(self, now):
+        with self._lock:
+            idle = [
+                room_id for room_id, (history, _) in self._rooms.items()
+                if room_id not in self._followers and (not history or now - history[-1]['ts'] > ROOM_IDLE_TIMEOUT)
+            ]
+            for room_id in idle:
+                del self._rooms[room_id]
+
+def room_messages(room_id):
+    """(epoca, ultimele mesaje) din starea camerei văzute de proces: deținută sau replică"""
+    room = rooms.peek(room_id)
+    if room is None:
+        return None, ()
+    state = room.state
+    # tuple(deque) se copiază într-un singur pas sub GIL, chiar dacă actorul adaugă între timp
+    return state['epoch'], tuple(state['messages'])
+
+chat_hub = ChatHub()
+chat_limiter = RateLimiter(CHAT_RATE, CHAT_BURST)
+
+def publish_chat(room_id, sender, message):
+    """Trimite mesajul actorului camerei (coada de chat a shard-ului); False dacă pipeline-ul e plin"""
+    return enqueue_command(QUEUE_CHAT, room_id, {
+        'action': 'chat',
+        'player': sender,
+        'message': str(message)[:CHAT_MAX_LENGTH]
+    })
+
+def add_message(game, sender, message):
+    """Pe actorul camerei: mesajul primește aici seq-ul, apoi pleacă la toate front-end-urile"""
+    now = event_log.clock()
+    game['message_seq'] += 1
+    entry = {
+        'seq': game['message_seq'],
+        'sender': sender,
+        'message': message,
+        'time': time.strftime('%H:%M:%S', time.localtime(now)),
+        'ts': now
+    }
+    game['messages'].append(entry)
+    if not event_log.replaying:
+        async_publisher.enqueue(chat_routing_key(game['room']), dict(
+            entry, type='chat', room=game['room'], epoch=game['epoch']), exchange=EXCHANGE_CHAT)
+
+def handle_chat_fanout(data):
+    chat_hub.deliver(data['room'], data)
+
+# Camerele legate la coada de chat a procesului; le modifică doar thread-ul consumer-ului
+chat_bindings = set()
+chat_bindings_changed = threading.Event()
+chat_hub.watch_follows(chat_bindings_changed.set)
+
+def declare_chat_queue(channel, queue_name):
+    # Coadă proprie procesului, ștearsă la deconectare; legată doar la camerele urmărite aici
+    declare_exchange(channel, EXCHANGE_CHAT)
+    channel.queue_declare(queue=queue_name, exclusive=True, auto_delete=True)
+    chat_bindings.clear()
+    bind_chat_rooms(channel, queue_name)
+
+def bind_chat_rooms(channel, queue_name):
+    """tick al consumer-ului de chat: aduce legăturile cozii la zi cu camerele urmărite"""
+    chat_bindings_changed.clear()
+    followed = chat_hub.followed()
+    for room_id in followed - chat_bindings:
+        channel.queue_bind(queue=queue_name, exchange=EXCHANGE_CHAT, routing_key=chat_routing_key(room_id))
+    for room_id in chat_bindings - followed:
+        channel.queue_unbind(queue=queue_name, exchange=EXCHANGE_CHAT, routing_key=chat_routing_key(room_id))
+    chat_bindings.clear()
+    chat_bindings.update(followed)
+
+def rebind_chat_queue(channel, queue_name):
+    if chat_bindings_changed.is_set():
+        bind_chat_rooms(channel, queue_name)
+
+CHAT_CONSUMERS = {
+    f'{EXCHANGE_CHAT}.{PROCESS_ID}': consumer_config(
+        handle_chat_fanout, prefetch=500, ack_every=200, declare=declare_chat_queue, tick=rebind_chat_queue)
+}
 
-        channel.basic_consume(queue=QUEUE_ACTIONS, on_message_callback=callback)
-        print('⚡ [ACTIONS CONSUMER] Pornit!')
-        channel.start_consuming()
-    except Exception as e:
-        print(f'❌ Actions Consumer Error: {e}')
 
 
 # LOGICA JOCULUI
 
-def add_player(name):
+def add_player(game, name, grid_size=None):
     if name in game['players']:
         return
 
-    emoji = game['available_emojis'].pop(0) if game['available_emojis'] else '🎮'
+    # Primul jucător dintr-o cameră goală alege mărimea grilei
+    if grid_size is not None and not game['players'] and game['phase'] == 'setup':
+        size = clamp_grid_size(grid_size)
+        if size != game['grid'].size:
+            game['grid'] = GridIndex(size)
 
-    # Găsește poziție liberă
-    for _ in range(100):
-        x = random.randint(0, GRID_SIZE-1)
-        y = random.randint(0, GRID_SIZE-1)
+    emoji = game['available_emojis'].pop(0) if game['available_emojis'] else '🎮'
 
-        occupied = any(p['x'] == x and p['y'] == y for p in game['players'].values())
-        if not occupied:
-            break
+    # Găsește poziție liberă (pe o grilă plină, oriunde)
+    grid = game['grid']
+    free = grid.sample_free(1, game['rng'])
+    if free:
+        x, y = free[0]
+    else:
+        x, y = game['rng'].randrange(grid.size), game['rng'].randrange(grid.size)
 
     game['players'][name] = {
         'x': x,
@@ -231,23 +2434,26 @@ def add_player(name):
         'bombs_placed': 0,
         'last_seen': time.time()
     }
+    grid.place_player(name, x, y)
+    rooms.schedule(game['room'], time.time() + PLAYER_TIMEOUT, 'presence', name)
 
     game['player_order'].append(name)
 
     if len(game['player_order']) == 1:
         game['current_turn'] = name
 
-    add_chat('SISTEM', f'{emoji} {name} intră în joc!')
+    add_chat(game, 'SISTEM', f'{emoji} {name} intră în joc!')
 
     # RabbitMQ: Notificare stare
-    send_to_queue(QUEUE_STATE, {
+    enqueue_message(QUEUE_STATE, {
         'type': 'player_join',
+        'room': game['room'],
         'player': name,
         'emoji': emoji,
         'total_players': len(game['players'])
     })
 
-def place_bomb_setup(player_name, x, y):
+def place_bomb_setup(game, player_name, x, y):
     if player_name not in game['players']:
         return
 
@@ -256,51 +2462,49 @@ def place_bomb_setup(player_name, x, y):
     if player['bombs_placed'] >= MAX_BOMBS:
         return
 
-    if not (0 <= x < GRID_SIZE and 0 <= y < GRID_SIZE):
+    if not game['grid'].in_bounds(x, y):
         return
 
-    if any(bomb['x'] == x and bomb['y'] == y for bomb in game['bombs']):
+    if not game['grid'].add_bomb(x, y, player_name):
         return
 
-    game['bombs'].append({'x': x, 'y': y, 'owner': player_name})
     player['bombs_placed'] += 1
 
-    add_chat('SISTEM', f'💣 {player_name} plasează bomba {player["bombs_placed"]}/{MAX_BOMBS}')
+    add_chat(game, 'SISTEM', f'💣 {player_name} plasează bomba {player["bombs_placed"]}/{MAX_BOMBS}')
 
     if all(p['bombs_placed'] >= MAX_BOMBS for p in game['players'].values()):
-        start_game()
+        start_game(game)
 
-def start_game():
+def start_game(game):
     game['phase'] = 'playing'
-    generate_hidden_items()
+    game['started_at'] = event_log.clock()
+    generate_hidden_items(game)
 
     num_players = len(game['players'])
-    total_bombs = len(game['bombs'])
-    total_items = len(game['items'])
+    total_bombs = game['grid'].bomb_count
+    total_items = game['grid'].item_count
 
-    add_chat('SISTEM', '🎮 JOCUL ÎNCEPE! Items-urile sunt ascunse!')
-    add_chat('SISTEM', f'📊 {num_players} jucători | {total_bombs} bombe | {total_items} items')
-    add_chat('SISTEM', f'▶️ Turul lui {game["current_turn"]}')
+    add_chat(game, 'SISTEM', '🎮 JOCUL ÎNCEPE! Items-urile sunt ascunse!')
+    add_chat(game, 'SISTEM', f'📊 {num_players} jucători | {total_bombs} bombe | {total_items} items')
+    add_chat(game, 'SISTEM', f'▶️ Turul lui {game["current_turn"]}')
+    set_turn(game, game['current_turn'])
 
     # RabbitMQ: Notificare start
-    send_to_queue(QUEUE_STATE, {
+    enqueue_message(QUEUE_STATE, {
         'type': 'phase_change',
+        'room': game['room'],
         'phase': 'playing',
         'num_players': num_players,
         'total_bombs': total_bombs,
         'total_items': total_items
     })
 
-def generate_hidden_items():
-    game['items'] = []
+def generate_hidden_items(game):
+    grid, rng = game['grid'], game['rng']
+    grid.clear_items()
     num_players = len(game['players'])
-    num_items = num_players * 10
-
-    occupied = set()
-    for p in game['players'].values():
-        occupied.add((p['x'], p['y']))
-    for b in game['bombs']:
-        occupied.add((b['x'], b['y']))
+    # Pe grilele mici nu pot fi mai multe item-uri decât celule libere
+    num_items = min(num_players * 10, grid.free_cells())
 
     item_distribution = (
         ['apple'] * (num_items // 2) +
@@ -311,20 +2515,14 @@ def generate_hidden_items():
     )
 
     while len(item_distribution) < num_items:
-        item_distribution.append(random.choice(['apple', 'star', 'heart']))
-
-    random.shuffle(item_distribution)
+        item_distribution.append(rng.choice(['apple', 'star', 'heart']))
 
-    while len(game['items']) < num_items and item_distribution:
-        x = random.randint(0, GRID_SIZE-1)
-        y = random.randint(0, GRID_SIZE-1)
+    rng.shuffle(item_distribution)
 
-        if (x, y) not in occupied:
-            item_type = item_distribution.pop()
-            game['items'].append({'x': x, 'y': y, 'type': item_type})
-            occupied.add((x, y))
+    for x, y in grid.sample_free(num_items, rng):
+        grid.add_item(x, y, item_distribution.pop())
 
-def move_player(player_name, direction):
+def move_player(game, player_name, direction):
     if game['phase'] != 'playing':
         return
 
@@ -334,6 +2532,7 @@ def move_player(player_name, direction):
     if game['current_turn'] != player_name:
         return
 
+    grid = game['grid']
     player = game['players'][player_name]
     old_x, old_y = player['x'], player['y']
     new_x, new_y = old_x, old_y
@@ -341,133 +2540,142 @@ def move_player(player_name, direction):
     if direction == 'UP':
         new_y = max(0, old_y - 1)
     elif direction == 'DOWN':
-        new_y = min(GRID_SIZE-1, old_y + 1)
+        new_y = min(grid.size-1, old_y + 1)
     elif direction == 'LEFT':
         new_x = max(0, old_x - 1)
     elif direction == 'RIGHT':
-        new_x = min(GRID_SIZE-1, old_x + 1)
+        new_x = min(grid.size-1, old_x + 1)
 
     if old_x == new_x and old_y == new_y:
         return
 
     player['x'] = new_x
     player['y'] = new_y
+    grid.move_player(player_name, old_x, old_y, new_x, new_y)
 
     # Verifică bombă
-    for bomb in game['bombs'][:]:
-        if bomb['x'] == new_x and bomb['y'] == new_y:
-            if bomb['owner'] != player_name:
-                player['hp'] -= 1
-                player['score'] = max(0, player['score'] - 1)
-                add_chat('SISTEM', f'💣 {player_name} lovește o bombă! HP: {player["hp"]}')
-
-                if player['hp'] <= 0:
-                    add_chat('SISTEM', f'💀 {player_name} ELIMINAT!')
-                    eliminate_player(player_name)
-                    next_turn()
-                    return
+    bomb = grid.pop_bomb(new_x, new_y)
+    if bomb is not None and bomb['owner'] != player_name:
+        player['hp'] -= 1
+        player['score'] = max(0, player['score'] - 1)
+        add_chat(game, 'SISTEM', f'💣 {player_name} lovește o bombă! HP: {player["hp"]}')
 
-            game['bombs'].remove(bomb)
-            break
+        if player['hp'] <= 0:
+            add_chat(game, 'SISTEM', f'💀 {player_name} ELIMINAT!')
+            eliminate_player(game, player_name)
+            return
 
     # Verifică items
-    for item in game['items'][:]:
-        if item['x'] == new_x and item['y'] == new_y:
-            handle_item(player_name, player, item)
-            game['items'].remove(item)
-            break
+    item = grid.pop_item(new_x, new_y)
+    if item is not None:
+        handle_item(game, player_name, player, item)
 
     if player_name in game['players']:
-        next_turn()
+        next_turn(game)
 
-def handle_item(player_name, player, item):
+def handle_item(game, player_name, player, item):
+    found_at = event_log.clock()
     game['found_items'].append({
         'x': item['x'],
         'y': item['y'],
         'type': item['type'],
-        'time': time.time()
+        'time': found_at
     })
+    rooms.schedule(game['room'], found_at + FOUND_ITEM_TTL, 'found')
 
     if item['type'] == 'apple':
         player['score'] += 1
-        add_chat('SISTEM', f'🍎 {player_name} a găsit un măr! +1 | Total: {player["score"]}')
+        add_chat(game, 'SISTEM', f'🍎 {player_name} a găsit un măr! +1 | Total: {player["score"]}')
     elif item['type'] == 'star':
         player['score'] += 3
-        add_chat('SISTEM', f'⭐ {player_name} a găsit o stea! +3 | Total: {player["score"]}')
+        add_chat(game, 'SISTEM', f'⭐ {player_name} a găsit o stea! +3 | Total: {player["score"]}')
     elif item['type'] == 'diamond':
         player['score'] += 5
-        add_chat('SISTEM', f'💎 {player_name} a găsit un diamant! +5 | Total: {player["score"]}')
+        add_chat(game, 'SISTEM', f'💎 {player_name} a găsit un diamant! +5 | Total: {player["score"]}')
     elif item['type'] == 'heart':
         player['hp'] = min(5, player['hp'] + 1)
-        add_chat('SISTEM', f'❤️ {player_name} a găsit o inimă! +1 HP | HP: {player["hp"]}')
+        add_chat(game, 'SISTEM', f'❤️ {player_name} a găsit o inimă! +1 HP | HP: {player["hp"]}')
     elif item['type'] == 'bomb_extra':
         player['hp'] -= 1
         player['score'] = max(0, player['score'] - 1)
-        add_chat('SISTEM', f'💥 {player_name} a găsit o bombă! -1 HP')
+        add_chat(game, 'SISTEM', f'💥 {player_name} a găsit o bombă! -1 HP')
 
         if player['hp'] <= 0:
-            add_chat('SISTEM', f'💀 {player_name} ELIMINAT!')
-            eliminate_player(player_name)
+            add_chat(game, 'SISTEM', f'💀 {player_name} ELIMINAT!')
+            eliminate_player(game, player_name)
             return
 
     # RabbitMQ: Statistici
-    send_to_queue(QUEUE_STATISTICS, {
+    enqueue_message(QUEUE_STATISTICS, {
         'type': 'item_found',
+        'room': game['room'],
         'player': player_name,
         'item_type': item['type'],
         'score': player['score'],
         'hp': player['hp']
     })
 
-    check_game_over()
+    check_game_over(game)
 
-def eliminate_player(player_name):
+def eliminate_player(game, player_name):
     if player_name not in game['players']:
         return
 
-    emoji = game['players'][player_name]['emoji']
+    player = game['players'][player_name]
+    emoji = player['emoji']
 
     if emoji in PLAYER_EMOJIS:
         game['available_emojis'].append(emoji)
 
-    if player_name in game['player_order']:
-        game['player_order'].remove(player_name)
+    following = game['player_order'].remove(player_name)
 
+    game['grid'].remove_player(player_name, player['x'], player['y'])
     del game['players'][player_name]
 
     if game['current_turn'] == player_name:
-        if game['player_order']:
-            game['current_turn'] = game['player_order'][0]
-        else:
-            game['current_turn'] = None
+        set_turn(game, following)
+    stream_presence.forget(game['room'], player_name)
+
+    # RabbitMQ: Statistici
+    enqueue_message(QUEUE_STATISTICS, {
+        'type': 'player_eliminated',
+        'room': game['room'],
+        'player': player_name,
+        'score': player['score']
+    })
 
-    check_game_over()
+    check_game_over(game)
 
-def next_turn():
+def next_turn(game):
     if not game['player_order']:
-        game['current_turn'] = None
-        check_game_over()
+        set_turn(game, None)
+        check_game_over(game)
         return
 
-    if game['current_turn'] not in game['player_order']:
-        game['current_turn'] = game['player_order'][0]
-        add_chat('SISTEM', f'▶️ Turul lui {game["current_turn"]}')
+    set_turn(game, game['player_order'].next_of(game['current_turn']))
+    add_chat(game, 'SISTEM', f'▶️ Turul lui {game["current_turn"]}')
+
+def set_turn(game, player_name):
+    """Dă tura jucătorului și, în timpul jocului, pornește termenul ei"""
+    game['current_turn'] = player_name
+    if game['phase'] != 'playing' or player_name is None or not TURN_TIMEOUT:
+        game['turn_deadline'] = None
         return
+    game['turn_deadline'] = event_log.clock() + TURN_TIMEOUT
+    rooms.schedule(game['room'], game['turn_deadline'], 'turn')
 
-    try:
-        current_index = game['player_order'].index(game['current_turn'])
-        next_index = (current_index + 1) % len(game['player_order'])
-        game['current_turn'] = game['player_order'][next_index]
-        add_chat('SISTEM', f'▶️ Turul lui {game["current_turn"]}')
-    except ValueError:
-        if game['player_order']:
-            game['current_turn'] = game['player_order'][0]
-
-def check_game_over():
+def skip_turn(game, player_name):
+    """Jucătorul n-a mutat la timp: tura trece la următorul"""
+    if game['phase'] != 'playing' or game['current_turn'] != player_name:
+        return
+    add_chat(game, 'SISTEM', f'⏭️ {player_name} a pierdut tura (timp expirat)')
+    next_turn(game)
+
+def check_game_over(game):
     if game['phase'] != 'playing':
         return
 
-    all_items_found = len(game['items']) == 0
+    all_items_found = game['grid'].item_count == 0
     one_player = len(game['players']) == 1
     no_players = len(game['players']) == 0
 
@@ -475,7 +2683,8 @@ def check_game_over():
         game['phase'] = 'finished'
 
         if no_players:
-            add_chat('SISTEM', '🎮 Joc terminat! Toți eliminați!')
+            add_chat(game, 'SISTEM', '🎮 Joc terminat! Toți eliminați!')
+            notify_game_over(game)
             return
 
         if game['players']:
@@ -485,63 +2694,456 @@ def check_game_over():
             if len(winners) == 1:
                 game['winner'] = winners[0]
                 winner_emoji = game['players'][winners[0]]['emoji']
-                add_chat('SISTEM', f'🎉 {winner_emoji} {winners[0]} A CÂȘTIGAT cu {max_score} puncte!')
+                add_chat(game, 'SISTEM', f'🎉 {winner_emoji} {winners[0]} A CÂȘTIGAT cu {max_score} puncte!')
             else:
                 winner_names = ', '.join(winners)
-                add_chat('SISTEM', f'🎉 EGALITATE! {winner_names} cu {max_score} puncte!')
+                add_chat(game, 'SISTEM', f'🎉 EGALITATE! {winner_names} cu {max_score} puncte!')
                 game['winner'] = winner_names
 
-def add_chat(sender, message):
+        notify_game_over(game)
+
+def notify_game_over(game):
+    # RabbitMQ: Notificare sfârșit de meci (durata și scorurile finale, pentru statistici)
+    enqueue_message(QUEUE_STATE, {
+        'type': 'phase_change',
+        'room': game['room'],
+        'phase': 'finished',
+        'winner': game['winner'],
+        'duration': time.time() - game['started_at'] if game['started_at'] else 0,
+        'scores': {name: p['score'] for name, p in game['players'].items()}
+    })
+
+def add_chat(game, sender, message):
+    now = event_log.clock()
+    game['chat_seq'] += 1
     game['chat'].append({
+        'seq': game['chat_seq'],
         'sender': sender,
         'message': message,
-        'time': time.strftime('%H:%M:%S')
+        'time': time.strftime('%H:%M:%S', time.localtime(now)),
+        'ts': now
     })
-    if len(game['chat']) > 40:
-        game['chat'] = game['chat'][-40:]
 
-def remove_player(player_name):
+def remove_player(game, player_name):
     if player_name not in game['players']:
         return
 
-    emoji = game['players'][player_name]['emoji']
+    player = game['players'][player_name]
+    emoji = player['emoji']
 
     if emoji in PLAYER_EMOJIS:
         game['available_emojis'].append(emoji)
 
-    if player_name in game['player_order']:
-        game['player_order'].remove(player_name)
+    following = game['player_order'].remove(player_name)
 
     if game['phase'] == 'setup':
-        game['bombs'] = [b for b in game['bombs'] if b['owner'] != player_name]
+        game['grid'].remove_bombs_of(player_name)
 
+    game['grid'].remove_player(player_name, player['x'], player['y'])
     del game['players'][player_name]
 
     if game['current_turn'] == player_name:
-        if game['player_order']:
-            game['current_turn'] = game['player_order'][0]
-        else:
-            game['current_turn'] = None
+        set_turn(game, following)
 
-    add_chat('SISTEM', f'{emoji} {player_name} a părăsit jocul!')
-    check_game_over()
+    stream_presence.forget(game['room'], player_name)
+    add_chat(game, 'SISTEM', f'{emoji} {player_name} a părăsit jocul!')
+    check_game_over(game)
 
-def cleanup_inactive_players():
+def touch_player(game, player_name):
+    if player_name in game['players']:
+        game['players'][player_name]['last_seen'] = time.time()
+
+def reset_game(game):
+    game['phase'] = 'setup'
+    game['players'] = {}
+    game['grid'] = GridIndex(game['grid'].size)
+    game['chat'].clear()
+    game['current_turn'] = None
+    game['turn_deadline'] = None
+    game['player_order'] = TurnRing()
+    game['available_emojis'] = PLAYER_EMOJIS.copy()
+    game['found_items'] = []
+    game['winner'] = None
+    game['started_at'] = None
+    game['round'] += 1
+    stream_presence.forget_room(game['room'])
+
+    add_chat(game, 'SISTEM', '🔄 Joc resetat! Toți jucătorii pot reintra!')
+
+class StreamPresence:
+    """Semnele de viață văzute de acest proces: stream-uri deschise și cereri ale jucătorilor.
+
+    Orice cerere a unui jucător ține loc de heartbeat: se notează doar momentul (O(1),
+    fără comandă către actor), iar termenul de prezență îl citește când expiră.
+    """
+
+    def __init__(self):
+        self._streams = {}
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def connect(self, room_id, player_name):
+        key = (room_id, player_name)
+        with self._lock:
+            self._streams[key] = self._streams.get(key, 0) + 1
+
+    def disconnect(self, room_id, player_name):
+        key = (room_id, player_name)
+        with self._lock:
+            count = self._streams.get(key, 0) - 1
+            if count > 0:
+                self._streams[key] = count
+            else:
+                self._streams.pop(key, None)
+            # Perioada de grație PLAYER_TIMEOUT începe de la închiderea stream-ului
+            self._seen[key] = time.time()
+
+    def seen(self, room_id, player_name):
+        with self._lock:
+            self._seen[(room_id, player_name)] = time.time()
+
+    def last_seen(self, room_id, player_name):
+        return self._seen.get((room_id, player_name), 0)
+
+    def forget(self, room_id, player_name):
+        with self._lock:
+            self._seen.pop((room_id, player_name), None)
+
+    def forget_room(self, room_id):
+        # Reset / închiderea camerei: altfel intrările rămân până la take_seen, care în
+        # modul 'all' nu rulează
+        with self._lock:
+            self._seen = {key: seen for key, seen in self._seen.items() if key[0] != room_id}
+
+    def take_seen(self):
+        """Jucătorii văzuți de la ultimul apel (pentru relay-ul către workeri)"""
+        with self._lock:
+            seen, self._seen = self._seen, {}
+        return set(seen)
+
+    def is_connected(self, room_id, player_name):
+        return (room_id, player_name) in self._streams
+
+    def connected(self):
+        with self._lock:
+            return set(self._streams)
+
+stream_presence = StreamPresence()
+
+# Termene rulate pe actorul camerei: handler(registry, cameră, cheie, acum) -> starea s-a schimbat
+
+def schedule_room_timers(registry, room):
+    """Termenele unei stări primite de-a gata (jurnal, shard preluat)"""
+    now = time.time()
+    for player_name, player in room.state['players'].items():
+        registry.schedule(room.id, player.get('last_seen', now) + PLAYER_TIMEOUT, 'presence', player_name)
+    if room.state['found_items']:
+        registry.schedule(room.id, room.state['found_items'][0]['time'] + FOUND_ITEM_TTL, 'found')
+    if room.state['turn_deadline'] is not None:
+        registry.schedule(room.id, room.state['turn_deadline'], 'turn')
+
+def expire_player(registry, room, player_name, now):
+    game = room.state
+    player = game['players'].get(player_name)
+    if player is None or not registry.owns(room.id):
+        return False
+    if stream_presence.is_connected(room.id, player_name):
+        registry.schedule(room.id, now + PLAYER_TIMEOUT, 'presence', player_name)
+        return False
+
+    last_seen = max(player.get('last_seen', 0), stream_presence.last_seen(room.id, player_name))
+    if last_seen + PLAYER_TIMEOUT > now:
+        registry.schedule(room.id, last_seen + PLAYER_TIMEOUT, 'presence', player_name)
+        return False
+
+    # Expirarea depinde de ceas și de stream-uri: în jurnal intră ca plecare
+    with event_log.stamped(now):
+        event_log.append(room.id, 'leave', (player_name,))
+        remove_player(game, player_name)
+    return True
+
+def expire_found_items(registry, room, key, now):
+    found = room.state['found_items']
+    expired = 0
+    # Itemele sunt adăugate în ordinea găsirii, deci cele expirate sunt la început
+    while expired < len(found) and now - found[expired]['time'] >= FOUND_ITEM_TTL:
+        expired += 1
+    if expired:
+        room.state['found_items'] = found[expired:]
+    if room.state['found_items']:
+        registry.schedule(room.id, room.state['found_items'][0]['time'] + FOUND_ITEM_TTL, 'found')
+    return expired > 0
+
+def expire_room(registry, room, key, now):
+    if registry.owns(room.id) and registry.evict_if_idle(room.id, now):
+        return False
+    ttl = ROOM_FINISHED_TTL if room.state['phase'] == 'finished' else ROOM_IDLE_TIMEOUT
+    deadline = room.last_activity + ttl
+    registry.schedule(room.id, deadline if deadline > now else now + ttl, 'room')
+    return False
+
+def expire_turn(registry, room, key, now):
+    game = room.state
+    deadline = game['turn_deadline']
+    if game['phase'] != 'playing' or deadline is None or not registry.owns(room.id):
+        return False
+    if deadline > now:
+        registry.schedule(room.id, deadline, 'turn')
+        return False
+    with event_log.stamped(now):
+        event_log.append(room.id, 'skip', (game['current_turn'],))
+        skip_turn(game, game['current_turn'])
+    return True
+
+TIMER_HANDLERS = {
+    'presence': expire_player,
+    'found': expire_found_items,
+    'room': expire_room,
+    'turn': expire_turn
+}
+
+def note_presence(room_id, player_name):
+    """Apelat de cererile unui jucător: ține loc de heartbeat"""
+    room = rooms.peek(room_id)
+    if player_name and room is not None and player_name in room.snapshot()['players']:
+        stream_presence.seen(room_id, player_name)
+
+def cleanup_chat():
     while True:
         time.sleep(5)
         current_time = time.time()
-        inactive = [
-            name for name, player in game['players'].items()
-            if current_time - player.get('last_seen', current_time) > 10
-        ]
-
-        for player_name in inactive:
-            remove_player(player_name)
+        chat_hub.prune(current_time)
+        chat_limiter.prune(current_time)
+
+# JURNAL DE EVENIMENTE (DURABILITATE)
+
+# Fiecare comandă aplicată de un actor e adăugată, ca linie JSON [cameră, comandă, argumente, moment],
+# într-un segment append-only din EVENT_LOG_DIR. Un thread scrie liniile adunate și face un
+# singur fsync la fiecare EVENT_LOG_COMMIT_INTERVAL (group commit). După EVENT_LOG_SEGMENT_RECORDS
+# înregistrări se deschide un segment nou, fiecare actor își scrie acolo starea camerelor
+# (înregistrări 'state'), iar segmentele vechi se șterg: refacerea citește cel mult două segmente,
+# oricât de lungă ar fi partida. Comenzile se reaplică în ordine, cu RNG-ul salvat, deci dau
+# aceeași stare (cu momentul din înregistrare ca ceas). Pierderea maximă la o cădere: ultimul
+# interval de commit.
+
+JOURNAL_COMMANDS = {
+    'join': add_player,
+    'place_bomb': place_bomb_setup,
+    'move': move_player,
+    'leave': remove_player,
+    'reset': reset_game,
+    'skip': skip_turn,
+    'chat': add_message
+}
+JOURNALED_FUNCTIONS = {fn: command for command, fn in JOURNAL_COMMANDS.items()}
+
+class EventLog:
+    """Jurnal pe segmente al comenzilor aplicate, cu fsync în loturi și refacere la pornire"""
+
+    def __init__(self, directory, commit_interval, segment_records):
+        self.directory = directory
+        self.commit_interval = commit_interval
+        self.segment_records = segment_records
+        self.registry = None
+        self.replaying = False
+        self._pending = []
+        self._appended = 0
+        self._committed = 0
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._file = None
+        self._segment = 0
+        self._records = 0               # Înregistrări scrise în segmentul curent
+        self._checkpointing = False
+        self._stopped = threading.Event()
+        self._local = threading.local()  # Ceasul comenzii aplicate pe firul curent
+
+    def clock(self):
+        """Momentul comenzii în curs: la refacere, cel din înregistrarea jurnalului"""
+        now = getattr(self._local, 'now', None)
+        return time.time() if now is None else now
+
+    @contextlib.contextmanager
+    def stamped(self, now=None):
+        """Fixează ceasul comenzii pe durata aplicării ei, ca jurnalul să-l poată reda"""
+        previous = getattr(self._local, 'now', None)
+        self._local.now = time.time() if now is None else now
+        try:
+            yield self._local.now
+        finally:
+            self._local.now = previous
+
+    def append(self, room_id, command, args=()):
+        """Apelat de actori; scrierea pe disc are loc la următorul commit"""
+        if self._file is None or self.replaying:
+            return
+        line = json_bytes([room_id, command, list(args), self.clock()]) + b'\n'
+        with self._cond:
+            self._pending.append(line)
+            self._appended += 1
+
+    def record_room(self, room):
+        """Starea completă a camerei, de la care refacerea poate porni"""
+        if self._file is None or self.replaying:
+            return
+        self.append(room.id, 'state', (export_state(room.state), room.state['rng'].getstate()))
 
-        game['found_items'] = [
-            item for item in game['found_items']
-            if current_time - item['time'] < 3
-        ]
+    def open(self, registry):
+        """Reface camerele din jurnal și pornește scrierea într-un segment nou"""
+        if self.directory is None:
+            return
+        self.registry = registry
+        os.makedirs(self.directory, exist_ok=True)
+        segments = self.segments()
+        started = time.time()
+        records = self.replay(segments)
+        if records:
+            log(logging.INFO, '💾 Jurnal reaplicat', records=records, segments=len(segments),
+                seconds=round(time.time() - started, 2))
+
+        self._segment = segments[-1] if segments else 0
+        self._rotate()
+        start_thread(self.run, 'EventLog')
+        # Starea refăcută devine punctul de plecare al segmentului nou
+        self.checkpoint()
+        atexit.register(self.close)
+
+    def segments(self):
+        numbers = []
+        for name in os.listdir(self.directory):
+            if name.startswith('events-') and name.endswith('.log'):
+                numbers.append(int(name[len('events-'):-len('.log')]))
+        return sorted(numbers)
+
+    def segment_path(self, segment):
+        return os.path.join(self.directory, f'events-{segment:08d}.log')
+
+    def replay(self, segments):
+        self.replaying = True
+        records = 0
+        try:
+            for segment in segments:
+                with open(self.segment_path(segment), 'rb') as f:
+                    for line in f:
+                        try:
+                            record = json_decode(line)
+                        except ValueError:
+                            # Ultima linie poate fi scrisă pe jumătate la o cădere
+                            break
+                        # Segmentele mai vechi nu au momentul comenzii: se aplică cu ceasul curent
+                        room_id, command, args = record[:3]
+                        with self.stamped(record[3] if len(record) > 3 else None):
+                            self._apply(room_id, command, args)
+                        records += 1
+        finally:
+            self.replaying = False
+
+        now = time.time()
+        for room_id in self.registry.room_ids():
+            room = self.registry.peek(room_id)
+            # Versiunile o iau de la capăt: epocă nouă, ca ETag-urile vechi să nu se potrivească
+            room.state['epoch'] = os.urandom(4).hex()
+            for player in room.state['players'].values():
+                player['last_seen'] = now
+            # Timpul cât procesul a fost oprit nu se scade din tura jucătorului
+            if room.state['turn_deadline'] is not None:
+                room.state['turn_deadline'] = now + TURN_TIMEOUT
+            room.publish()
+        return records
+
+    def _apply(self, room_id, command, args):
+        if command == 'evict':
+            self.registry.discard(room_id)
+            return
+        room = self.registry.get(room_id)
+        if command == 'state':
+            exported, (version, internal, gauss) = args
+            room.state = import_state(exported)
+            room.state['rng'].setstate((version, tuple(internal), gauss))
+            schedule_room_timers(self.registry, room)
+        else:
+            try:
+                JOURNAL_COMMANDS[command](room.state, *args)
+            except Exception as e:
+                log(logging.ERROR, '❌ Comandă din jurnal nereaplicată', room=room_id, command=command, error=e)
+
+    def run(self):
+        while not self._stopped.wait(self.commit_interval):
+            self.commit()
+            if self._records >= self.segment_records and not self._checkpointing:
+                self._checkpointing = True
+                self._rotate()
+                start_thread(self.checkpoint, 'EventLogCheckpoint')
+
+    def commit(self):
+        """Scrie tot ce s-a adunat și face un singur fsync pentru întregul lot"""
+        with self._write_lock:
+            with self._cond:
+                batch, self._pending = self._pending, []
+            if batch and self._file is not None:
+                try:
+                    self._file.write(b''.join(batch))
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                except OSError as e:
+                    log(logging.ERROR, '❌ Scrierea jurnalului a eșuat', error=e)
+                    with self._cond:
+                        self._pending[:0] = batch
+                    return
+                self._records += len(batch)
+            with self._cond:
+                self._committed += len(batch)
+                self._cond.notify_all()
+
+    def sync(self, timeout=None):
+        """Așteaptă ca tot ce a fost adăugat până acum să ajungă pe disc"""
+        with self._cond:
+            target = self._appended
+            return self._cond.wait_for(lambda: self._committed >= target, timeout)
+
+    def close(self):
+        """Scrie ce a rămas și închide segmentul curent; comenzile de după nu mai sunt jurnalizate"""
+        self._stopped.set()
+        self.commit()
+        with self._write_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _rotate(self):
+        # Liniile adăugate de acum încolo ajung în segmentul nou
+        with self._write_lock:
+            if self._stopped.is_set():
+                return
+            if self._file is not None:
+                self._file.close()
+            self._segment += 1
+            self._file = open(self.segment_path(self._segment), 'ab')
+            self._records = 0
+
+    def checkpoint(self):
+        """Fiecare actor scrie starea camerelor sale în segmentul curent; apoi cele vechi se șterg"""
+        segment = self._segment
+        try:
+            for actor in self.registry.actors:
+                actor.submit(None, self._record_shard, actor.shard).result(timeout=ACTOR_CALL_TIMEOUT)
+            self.sync()
+            for old in self.segments():
+                if old < segment:
+                    os.remove(self.segment_path(old))
+        except Exception as e:
+            log(logging.ERROR, '❌ Checkpoint-ul jurnalului a eșuat', error=e)
+        finally:
+            self._checkpointing = False
+
+    def _record_shard(self, shard):
+        # Rulează pe actorul shard-ului: starea e cea de după ultima comandă jurnalizată
+        for room_id in self.registry.room_ids():
+            room = self.registry.peek(room_id)
+            if room is not None and room_shard(room_id) == shard:
+                self.record_room(room)
+
+event_log = EventLog(EVENT_LOG_DIR, EVENT_LOG_COMMIT_INTERVAL, EVENT_LOG_SEGMENT_RECORDS)
 
 # FLASK ROUTES
 
@@ -549,82 +3151,397 @@ def cleanup_inactive_players():
 def index():
     return HTML
 
+def request_room(data=None):
+    """Id-ul camerei din corpul JSON sau din query string"""
+    room_id = (data or {}).get('room') or request.args.get('room') or DEFAULT_ROOM
+    return str(room_id).strip()[:32] or DEFAULT_ROOM
+
+def request_body():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise InvalidCommand('corpul trebuie să fie un obiect JSON')
+    return data
+
+@app.errorhandler(InvalidCommand)
+def invalid_command(error):
+    return jsonify({'ok': False, 'error': 'invalid', 'detail': str(error)}), 400
+
+def publish_response(queue_name, command):
+    if not enqueue_command(queue_name, command.room, command.message()):
+        return jsonify({'ok': False, 'error': 'busy'}), 503
+    return jsonify({'ok': True})
+
 @app.route('/api/join', methods=['POST'])
 def api_join():
-    name = request.json.get('name', 'Anonim')
-    send_to_queue(QUEUE_ACTIONS, {'action': 'join', 'player': name})
-    return jsonify({'ok': True})
+    data = request_body()
+    command = JoinCommand.parse(request_room(data), {
+        'player': data.get('name', 'Anonim'),
+        'grid_size': data.get('grid_size')
+    })
+    return publish_response(QUEUE_ACTIONS, command)
 
 @app.route('/api/place_bomb', methods=['POST'])
 def api_place_bomb():
-    data = request.json
-    send_to_queue(QUEUE_MOVES, {
-        'action': 'place_bomb',
-        'player': data.get('player'),
-        'x': data.get('x'),
-        'y': data.get('y')
-    })
-    return jsonify({'ok': True})
+    data = request_body()
+    command = BombCommand.parse(request_room(data), data)
+    note_presence(command.room, command.player)
+    return publish_response(QUEUE_MOVES, command)
 
 @app.route('/api/move', methods=['POST'])
 def api_move():
-    data = request.json
-    send_to_queue(QUEUE_MOVES, {
-        'action': 'move',
-        'player': data.get('player'),
-        'direction': data.get('direction')
-    })
-    return jsonify({'ok': True})
+    data = request_body()
+    command = MoveCommand.parse(request_room(data), data)
+    note_presence(command.room, command.player)
+    return publish_response(QUEUE_MOVES, command)
 
 @app.route('/api/chat', methods=['POST'])
 def api_chat():
-    data = request.json
-    send_to_queue(QUEUE_CHAT, {
-        'action': 'chat',
-        'player': data.get('player'),
-        'message': data.get('message')
-    })
+    data = request_body()
+    command = ChatCommand.parse(request_room(data), data)
+    note_presence(command.room, command.player)
+    # Limita e per proces: cu mai multe front-end-uri, fiecare își aplică propria găleată
+    if not chat_limiter.allow((command.room, command.player)):
+        return jsonify({'ok': False, 'error': 'rate_limited'}), 429
+    if not publish_chat(command.room, command.player, command.message):
+        return jsonify({'ok': False, 'error': 'busy'}), 503
     return jsonify({'ok': True})
 
+@app.route('/api/stats', methods=['GET'])
+def api_stats():
+    """Statisticile precalculate (global sau ?room=...), servite ca atare"""
+    scope = request.args.get('room') or '*'
+    return Response(stats_engine.result(scope), mimetype='application/json')
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/chat', methods=['GET'])
+def api_chat_history():
+    """Mesajele jucătorilor de după cursorul `after` (seq); `missed` = unele au ieșit deja din inel"""
+    after = request.args.get('after', 0, type=int)
+    messages, missed = chat_hub.after(request_room(), after)
+    return jsonify({
+        'messages': messages,
+        'cursor': messages[-1]['seq'] if messages else after,
+        'missed': missed
+    })
+
+SSE_PING = b': ping\n\n'
+
+def chat_event(message):
+    return b'id: %d\nevent: chat\ndata: %s\n\n' % (message['seq'], json_bytes(message))
+
+def chat_stream(room_id, since):
+    """Generator SSE: mesajele de chat ale camerei, pe măsură ce ajung în acest proces"""
+    seq = since or 0
+    chat_hub.follow(room_id)
+    try:
+        while True:
+            messages, _ = chat_hub.after(room_id, seq)
+            if messages:
+                for message in messages:
+                    yield chat_event(message)
+                seq = messages[-1]['seq']
+            elif not chat_hub.wait(room_id, seq, STREAM_KEEPALIVE):
+                yield SSE_PING
+    finally:
+        chat_hub.unfollow(room_id)
+
+@app.route('/api/chat/stream', methods=['GET'])
+def api_chat_stream():
+    since = request.args.get('after', type=int)
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    if last_event_id is not None:
+        since = last_event_id
+
+    return Response(
+        chat_stream(request_room(), since),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def player_viewport(snapshot, player_name, view=None):
+    """Zona (x, y, lățime, înălțime) din grilă trimisă unui client.
+
+    `view` = 'x,y,w,h' cerut explicit de client; altfel VIEWPORT_SIZE×VIEWPORT_SIZE
+    centrat pe jucător (toată grila, dacă e mai mică).
+    """
+    size = snapshot['grid_size']
+    width = height = min(size, VIEWPORT_SIZE)
+    player = snapshot['players'].get(player_name)
+    x = (player['x'] if player else size // 2) - width // 2
+    y = (player['y'] if player else size // 2) - height // 2
+    if view:
+        try:
+            x, y, width, height = (int(value) for value in view.split(','))
+        except ValueError:
+            pass
+
+    width = max(1, min(width, VIEWPORT_MAX, size))
+    height = max(1, min(height, VIEWPORT_MAX, size))
+    x = max(0, min(x, size - width))
+    y = max(0, min(y, size - height))
+    return x, y, width, height
+
+def in_viewport(viewport, x, y):
+    vx, vy, width, height = viewport
+    return vx <= x < vx + width and vy <= y < vy + height
+
+def bomb_visible(snapshot, bomb, player_name):
+    # Bombele sunt ascunse; fiecare își vede doar bombele proprii, în faza de plasare
+    return snapshot['phase'] == 'setup' and bomb['owner'] == player_name
+
+def viewport_entries(snapshot, viewport, player_name):
+    """Bombele vizibile jucătorului și celulele explorate din viewport"""
+    vx, vy, width, height = viewport
+    size, board = snapshot['grid_size'], snapshot['board']
+    bombs, explored = [], []
+    for y in range(vy, vy + height):
+        start = y * size + vx
+        row = board[start:start + width]
+        if row.count(CELL_BOMB) + row.count(CELL_EXPLORED) == 0:
+            continue
+        for dx, code in enumerate(row):
+            if code == CELL_EXPLORED:
+                explored.append([vx + dx, y])
+            elif code == CELL_BOMB:
+                bomb = board_bomb(snapshot, vx + dx, y)
+                if bomb_visible(snapshot, bomb, player_name):
+                    bombs.append(bomb)
+    return bombs, explored
+
+def client_state(snapshot, player_name, viewport):
+    """Proiecția stării pentru un jucător: doar ce are voie să vadă, doar din viewport.
+
+    Item-urile ascunse nu pleacă niciodată (doar numărul lor), iar bombele altora nici atât.
+    """
+    state = {key: value for key, value in snapshot.items() if key not in BOARD_KEYS}
+    state['bombs'], state['explored'] = viewport_entries(snapshot, viewport, player_name)
+    state['found_items'] = [item for item in snapshot['found_items'] if in_viewport(viewport, item['x'], item['y'])]
+    state['viewport'] = list(viewport)
+    return state
+
+def state_delta(snapshot, changes, since, player_name, viewport):
+    """Doar ce s-a schimbat după versiunea `since`, în viewport-ul clientului.
+
+    None (=> stare completă) dacă versiunea a ieșit din istoric sau faza / grila
+    s-au schimbat între timp, pentru că atunci se schimbă și ce bombe sunt vizibile.
+    Clientul cere starea completă și când își mută viewport-ul.
+    """
+    if since == snapshot['version']:
+        return {'version': since, 'not_modified': True}
+
+    players, cells, chat_seq = set(), set(), None
+    for version, changed_players, changed_cells, seq, layout in changes:
+        if version == since:
+            if layout != board_layout(snapshot):
+                return None
+            chat_seq = seq
+        elif version > since and chat_seq is not None:
+            players |= changed_players
+            cells |= changed_cells
+    if chat_seq is None:
+        return None
+
+    found = found_cells(snapshot)
+    delta_cells = []
+    for x, y in cells:
+        if not in_viewport(viewport, x, y):
+            continue
+        bomb = board_bomb(snapshot, x, y)
+        if bomb is not None and not bomb_visible(snapshot, bomb, player_name):
+            bomb = None
+        explored = board_explored(snapshot, x, y)
+        if bomb is None and not explored and (x, y) not in found:
+            # Nimic vizibil: în aceeași rundă și fază o astfel de celulă n-a fost vizibilă
+            # nici înainte, iar trimiterea ei ar trăda bombele și item-urile altora
+            continue
+        delta_cells.append({'x': x, 'y': y, 'bomb': bomb, 'explored': explored, 'found': found.get((x, y))})
+
+    delta = {key: snapshot[key] for key in META_KEYS}
+    delta.update({
+        'version': snapshot['version'],
+        'delta': True,
+        'players': {name: snapshot['players'][name] for name in players if name in snapshot['players']},
+        'removed_players': [name for name in players if name not in snapshot['players']],
+        'cells': delta_cells,
+        'chat': chat_after(snapshot['chat'], chat_seq)
+    })
+    return delta
+
+class CachedBody:
+    """Un răspuns JSON serializat o singură dată; varianta gzip se face la prima cerere care o acceptă"""
+
+    def __init__(self, body):
+        self.body = body
+        self._gzip = None
+
+    def gzipped(self):
+        if self._gzip is None:
+            self._gzip = gzip.compress(self.body, GZIP_LEVEL)
+        return self._gzip
+
+def state_etag(snapshot, player_name, viewport, since):
+    """ETag-ul proiecției, calculat fără a o construi: camera, versiunea și cheia din cache"""
+    key = zlib.crc32(repr((player_name, viewport, since)).encode())
+    return f'{snapshot["epoch"]}-{snapshot["version"]}-{key:08x}'
+
+def project_state(published, player_name, viewport, since=None):
+    """Răspunsul JSON (serializat) al unui jucător pentru versiunea publicată.
+
+    Se calculează o singură dată per (jucător, viewport, since): cache-ul stă lângă
+    snapshot și dispare odată cu el, deci poll-urile repetate nu mai costă nimic.
+    """
+    snapshot, changes, cache = published
+    key = (player_name, viewport, since)
+    cached = cache.get(key)
+    if cached is None:
+        started = time.perf_counter()
+        state = state_delta(snapshot, changes, since, player_name, viewport) if since is not None else None
+        if state is None:
+            state = client_state(snapshot, player_name, viewport)
+        cached = CachedBody(json_bytes(state))
+        metrics.observe('joc_state_serialize_seconds', time.perf_counter() - started)
+        if len(cache) < PROJECTION_CACHE_SIZE:
+            cache[key] = cached
+    return cached
+
 @app.route('/api/state', methods=['GET'])
 def api_state():
     player_name = request.args.get('player', '')
-    state = dict(game)
+    since = request.args.get('since', type=int)
+    room_id = request_room()
+    published = rooms.published(room_id)
+    if player_name in published[0]['players']:
+        stream_presence.seen(room_id, player_name)
+    viewport = player_viewport(published[0], player_name, request.args.get('view'))
+
+    # Clientul are deja exact această proiecție: 304, fără nicio serializare
+    etag = state_etag(published[0], player_name, viewport, since)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        cached = project_state(published, player_name, viewport, since)
+        response = Response(cached.body, mimetype='application/json')
+        if len(cached.body) >= GZIP_MIN_SIZE and 'gzip' in request.accept_encodings:
+            response.set_data(cached.gzipped())
+            response.headers['Content-Encoding'] = 'gzip'
+        metrics.observe('joc_state_response_bytes', response.content_length)
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+def sse_event(version, body):
+    return b'id: %d\nevent: state\ndata: %s\n\n' % (version, body)
+
+class StateCursor:
+    """Ce a primit deja un stream SSE de stare: camera, versiunea și viewport-ul"""
+
+    def __init__(self, room_id, player_name, since, view=None):
+        self.room_id = room_id
+        self.player_name = player_name
+        self.view = view
+        self.room = None
+        self.version = since
+        self.viewport = None
+        self.placeholder = False
+
+    def next_event(self):
+        """Evenimentul SSE pentru versiunea publicată, sau None dacă clientul o are deja"""
+        # Un stream nu creează camera: până apare (ex. join-ul e încă în coadă) primește starea goală
+        current = rooms.peek(self.room_id)
+        if current is not self.room:
+            # Camera a apărut, a fost evacuată sau recreată: versiunile o iau de la capăt
+            if self.room is not None or self.placeholder:
+                self.version = None
+            self.room = current
+        self.placeholder = current is None
+        published = rooms.published(self.room_id) if current is None else current.published()
+        snapshot = published[0]
+        if self.version == snapshot['version']:
+            return None
+
+        # Viewport-ul urmărește jucătorul; când se mută, clientul primește starea
+        # completă (delta are sens doar pentru aceeași zonă). La reconectare zona
+        # clientului e sigur aceeași doar dacă acoperă toată grila.
+        previous, self.viewport = self.viewport, player_viewport(snapshot, self.player_name, self.view)
+        whole_grid = self.viewport == (0, 0, snapshot['grid_size'], snapshot['grid_size'])
+        if not (previous == self.viewport or (previous is None and whole_grid)):
+            self.version = None
+        cached = project_state(published, self.player_name, self.viewport, self.version)
+        self.version = snapshot['version']
+        return sse_event(self.version, cached.body)
+
+def state_stream(room_id, player_name, since, view=None):
+    """Generator SSE: trimite fiecare versiune nouă imediat ce actorul o publică"""
+    if player_name:
+        stream_presence.connect(room_id, player_name)
+    try:
+        cursor = StateCursor(room_id, player_name, since, view)
+        while True:
+            event = cursor.next_event()
+            if event is not None:
+                yield event
+            elif cursor.room is None:
+                if not rooms.wait_for_room(room_id, STREAM_KEEPALIVE):
+                    yield SSE_PING
+            elif not cursor.room.wait_for_change(cursor.version, STREAM_KEEPALIVE):
+                # Ping-ul detectează conexiunile închise de client
+                yield SSE_PING
+    finally:
+        if player_name:
+            stream_presence.disconnect(room_id, player_name)
+
+@app.route('/api/stream', methods=['GET'])
+def api_stream():
+    player_name = request.args.get('player', '')
+    since = request.args.get('since', type=int)
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    if last_event_id is not None:
+        since = last_event_id
+
+    return Response(
+        state_stream(request_room(), player_name, since, request.args.get('view')),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
-    if game['phase'] == 'setup' and player_name:
-        state['bombs'] = [b for b in game['bombs'] if b['owner'] == player_name]
+def room_command(command, fn, *args, wait=True):
+    """Rulează o comandă validată direct (fără RabbitMQ) pe camera ei, dacă există.
 
-    return jsonify(state)
+    Un front-end fără stare (modul 'web') nu deține camera: comanda pleacă la worker.
+    """
+    if not rooms.owns(command.room):
+        enqueue_command(QUEUE_ACTIONS, command.room, command.message())
+        return
+    if rooms.peek(command.room) is None:
+        return
+    if wait:
+        rooms.call(command.room, fn, *args, create=False)
+    else:
+        rooms.submit(command.room, fn, *args, create=False)
 
 @app.route('/api/heartbeat', methods=['POST'])
 def api_heartbeat():
-    player_name = request.json.get('player', '')
-    if player_name in game['players']:
-        game['players'][player_name]['last_seen'] = time.time()
+    """Pentru clienții vechi: orice altă cerere a jucătorului ține deja loc de heartbeat"""
+    data = request.get_json(silent=True) or {}
+    note_presence(request_room(data), data.get('player', ''))
     return jsonify({'ok': True})
 
 @app.route('/api/leave', methods=['POST'])
 def api_leave():
-    player_name = request.json.get('player', '')
-    remove_player(player_name)
+    data = request_body()
+    command = LeaveCommand.parse(request_room(data), data)
+    room_command(command, remove_player, command.player)
     return jsonify({'ok': True})
 
 @app.route('/api/reset', methods=['POST'])
 def api_reset():
     """Resetează jocul complet"""
-    global game
-    game['phase'] = 'setup'
-    game['players'] = {}
-    game['bombs'] = []
-    game['items'] = []
-    game['chat'] = []
-    game['current_turn'] = None
-    game['player_order'] = []
-    game['available_emojis'] = PLAYER_EMOJIS.copy()
-    game['found_items'] = []
-    game['winner'] = None
-
-    add_chat('SISTEM', '🔄 Joc resetat! Toți jucătorii pot reintra!')
+    data = request_body()
+    room_command(ResetCommand.parse(request_room(data), data), reset_game)
     return jsonify({'ok': True})
 
 HTML = '''<!DOCTYPE html>
@@ -690,6 +3607,8 @@ HTML = '''<!DOCTYPE html>
 
         <div id="login" class="login">
             <input type="text" id="nameInput" placeholder="Numele tău" maxlength="15">
+            <input type="text" id="roomInput" placeholder="Camera" maxlength="32">
+            <input type="number" id="gridSizeInput" placeholder="Grilă (15)" min="10" max="1000" style="width: 110px;">
             <button onclick="join()">INTRĂ ÎN JOC</button>
         </div>
 
@@ -725,7 +3644,7 @@ HTML = '''<!DOCTYPE html>
             <div class="info">
                 <h3>💬 Chat:</h3>
                 <div id="chat" class="chat"></div>
-                <input type="text" id="chatInput" placeholder="Mesaj..." style="width: 80%; padding: 8px; border-radius: 5px;">
+                <input type="text" id="chatInput" placeholder="Mesaj..." maxlength="200" style="width: 80%; padding: 8px; border-radius: 5px;">
                 <button onclick="sendChat()" style="padding: 8px 15px; border: none; background: #3498db; color: white; border-radius: 5px; cursor: pointer;">📤</button>
             </div>
 
@@ -745,41 +3664,52 @@ HTML = '''<!DOCTYPE html>
 
     <script>
         let myName = '';
+        let myRoom = new URLSearchParams(location.search).get('room') || 'lobby';
+        document.getElementById('roomInput').value = myRoom;
         let gridData = [];
-        let lastChatLength = 0;
-        let exploredCells = new Set(); // Păstrează celulele explorate
+        let stateVersion = null; // Ultima versiune primită (pentru ?since=)
+        let lastChatSeq = 0;
+        let stream = null;   // EventSource: starea vine prin push, fără polling
+        let chatStream = null; // EventSource separat pentru chat-ul jucătorilor (fan-out)
+        let chatLog = [];      // Mesajele jucătorilor; cele SISTEM vin în stare
+        let chatCursor = 0;
+        let polling = false; // Fallback pentru browsere fără EventSource
 
         function join() {
             myName = document.getElementById('nameInput').value.trim();
+            myRoom = document.getElementById('roomInput').value.trim() || 'lobby';
             if (!myName) { alert('Introdu un nume!'); return; }
+            // Mărimea contează doar pentru primul jucător din cameră
+            const gridSize = parseInt(document.getElementById('gridSizeInput').value) || null;
 
             fetch('/api/join', {
                 method: 'POST',
                 headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({name: myName})
+                body: JSON.stringify({name: myName, room: myRoom, grid_size: gridSize})
             });
 
             document.getElementById('login').classList.add('hidden');
             document.getElementById('game').classList.remove('hidden');
-            updateGame();
-            startHeartbeat();
+            startUpdates();
         }
 
-        function startHeartbeat() {
-            setInterval(() => {
-                if (myName) {
-                    fetch('/api/heartbeat', {
-                        method: 'POST',
-                        headers: {'Content-Type': 'application/json'},
-                        body: JSON.stringify({player: myName})
-                    });
-                }
-            }, 3000);
+        function startUpdates() {
+            if (window.EventSource) {
+                // Stream-ul ține și loc de heartbeat: cât e deschis, jucătorul e activ
+                stream = new EventSource(`/api/stream?player=${encodeURIComponent(myName)}&room=${encodeURIComponent(myRoom)}`);
+                stream.addEventListener('state', e => handleState(JSON.parse(e.data), stateVersion));
+                chatStream = new EventSource(`/api/chat/stream?room=${encodeURIComponent(myRoom)}`);
+                chatStream.addEventListener('chat', e => addChatMessages([JSON.parse(e.data)]));
+            } else if (!polling) {
+                // Fiecare poll cu numele jucătorului ține loc de heartbeat
+                polling = true;
+                updateGame();
+            }
         }
 
         window.addEventListener('beforeunload', () => {
             if (myName) {
-                const blob = new Blob([JSON.stringify({player: myName})], {type: 'application/json'});
+                const blob = new Blob([JSON.stringify({player: myName, room: myRoom})], {type: 'application/json'});
                 navigator.sendBeacon('/api/leave', blob);
             }
         });
@@ -797,7 +3727,7 @@ HTML = '''<!DOCTYPE html>
             fetch('/api/place_bomb', {
                 method: 'POST',
                 headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({player: myName, x: x, y: y})
+                body: JSON.stringify({player: myName, room: myRoom, x: x, y: y})
             });
         }
 
@@ -806,7 +3736,7 @@ HTML = '''<!DOCTYPE html>
             fetch('/api/move', {
                 method: 'POST',
                 headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({player: myName, direction: direction})
+                body: JSON.stringify({player: myName, room: myRoom, direction: direction})
             });
         }
 
@@ -817,7 +3747,9 @@ HTML = '''<!DOCTYPE html>
             fetch('/api/chat', {
                 method: 'POST',
                 headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({player: myName, message: msg})
+                body: JSON.stringify({player: myName, room: myRoom, message: msg})
+            }).then(r => {
+                if (r.status === 429) showNotification('⏳ Prea multe mesaje!');
             });
             input.value = '';
         }
@@ -834,16 +3766,75 @@ HTML = '''<!DOCTYPE html>
             else if (e.key === 'ArrowRight') move('RIGHT');
         });
 
+        function applyDelta(state, delta) {
+            const merged = Object.assign({}, state);
+            ['phase', 'current_turn', 'turn_deadline', 'player_order', 'available_emojis', 'winner', 'items_left'].forEach(k => merged[k] = delta[k]);
+            merged.version = delta.version;
+
+            merged.players = Object.assign({}, state.players, delta.players);
+            delta.removed_players.forEach(name => delete merged.players[name]);
+
+            // Celulele modificate se înlocuiesc complet
+            const changed = new Set(delta.cells.map(c => `${c.x},${c.y}`));
+            const keep = entry => !changed.has(`${entry.x},${entry.y}`);
+            merged.bombs = state.bombs.filter(keep);
+            merged.explored = state.explored.filter(([x, y]) => !changed.has(`${x},${y}`));
+            merged.found_items = state.found_items.filter(keep);
+            delta.cells.forEach(c => {
+                if (c.bomb) merged.bombs.push(c.bomb);
+                if (c.explored) merged.explored.push([c.x, c.y]);
+                if (c.found) merged.found_items.push(c.found);
+            });
+
+            merged.chat = state.chat.concat(delta.chat).slice(-40);
+            return merged;
+        }
+
+        function handleState(state, base) {
+            if (state.not_modified) return;
+            if (state.delta) {
+                // Răspuns întârziat, calculat față de altă versiune: îl ignorăm
+                if (gridData.version !== base) return;
+                state = applyDelta(gridData, state);
+            }
+            stateVersion = state.version;
+            gridData = state;
+            renderGame(state);
+        }
+
+        function desiredView() {
+            // Zona din grilă centrată pe jucătorul tău (la fel ca pe server); null = o alege serverul
+            if (!gridData.viewport || !gridData.players[myName]) return null;
+            const size = gridData.grid_size, w = gridData.viewport[2], h = gridData.viewport[3];
+            const me = gridData.players[myName];
+            const x = Math.max(0, Math.min(me.x - Math.floor(w / 2), size - w));
+            const y = Math.max(0, Math.min(me.y - Math.floor(h / 2), size - h));
+            return [x, y, w, h];
+        }
+
         function updateGame() {
-            fetch(`/api/state?player=${encodeURIComponent(myName)}`)
+            const view = desiredView();
+            // Delta doar pentru aceeași zonă; după o mutare a viewport-ului cerem starea completă
+            const base = view && view.join() !== gridData.viewport.join() ? null : stateVersion;
+            const since = base !== null ? `&since=${base}` : '';
+            const viewParam = view ? `&view=${view.join(',')}` : '';
+            fetch(`/api/state?player=${encodeURIComponent(myName)}&room=${encodeURIComponent(myRoom)}${since}${viewParam}`)
                 .then(r => r.json())
-                .then(state => {
-                    gridData = state;
-                    renderGame(state);
-                });
+                .then(state => handleState(state, base));
+            fetch(`/api/chat?room=${encodeURIComponent(myRoom)}&after=${chatCursor}`)
+                .then(r => r.json())
+                .then(data => addChatMessages(data.messages));
             setTimeout(updateGame, 500);
         }
 
+        function addChatMessages(messages) {
+            messages = messages.filter(m => m.seq > chatCursor);
+            if (!messages.length) return;
+            chatCursor = messages[messages.length - 1].seq;
+            chatLog = chatLog.concat(messages).slice(-40);
+            if (gridData.chat) renderChat(gridData);
+        }
+
         function renderGame(state) {
             renderPlayerInfo(state);
             renderPhase(state);
@@ -915,15 +3906,20 @@ HTML = '''<!DOCTYPE html>
         function resetGame() {
             fetch('/api/reset', {
                 method: 'POST',
-                headers: {'Content-Type': 'application/json'}
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({room: myRoom})
             }).then(() => {
                 // Resetează tot pe client
                 document.getElementById('winnerOverlay').classList.add('hidden');
                 document.getElementById('game').classList.add('hidden');
                 document.getElementById('login').classList.remove('hidden');
+                if (stream) { stream.close(); stream = null; }
+                if (chatStream) { chatStream.close(); chatStream = null; }
+                chatLog = [];
+                chatCursor = 0;
                 myName = '';
-                lastChatLength = 0;
-                exploredCells.clear(); // Resetează celulele explorate
+                stateVersion = null;
+                lastChatSeq = 0;
             });
         }
 
@@ -936,7 +3932,7 @@ HTML = '''<!DOCTYPE html>
             if (state.phase !== 'playing' && state.phase !== 'finished') return;
 
             const itemsDiv = document.getElementById('itemsList');
-            const total = state.items.length;
+            const total = state.items_left;
 
             itemsDiv.innerHTML = `📦 <strong>${total} items</strong> rămase`;
         }
@@ -945,30 +3941,33 @@ HTML = '''<!DOCTYPE html>
             const grid = document.getElementById('grid');
             grid.innerHTML = '';
 
-            const cells = Array(15).fill().map(() => Array(15).fill('⬜'));
+            // Se desenează doar viewport-ul primit; coordonatele rămân cele absolute
+            const [vx, vy, vw, vh] = state.viewport;
+            grid.style.gridTemplateColumns = `repeat(${vw}, 45px)`;
+            const cells = Array(vh).fill().map(() => Array(vw).fill('⬜'));
             const foundItemsMap = {};
+            // Celulele explorate vin de la server (doar cele din viewport)
+            const exploredCells = new Set(state.explored.map(([x, y]) => `${x},${y}`));
 
-            if (state.found_items) {
-                state.found_items.forEach(item => {
-                    const key = `${item.x},${item.y}`;
-                    foundItemsMap[key] = item.type;
-                    exploredCells.add(key); // Marchează ca explorată
-                });
-            }
+            state.found_items.forEach(item => {
+                foundItemsMap[`${item.x},${item.y}`] = item.type;
+            });
 
             if (state.phase === 'setup') {
                 state.bombs.forEach(bomb => {
-                    cells[bomb.y][bomb.x] = '💣';
+                    cells[bomb.y - vy][bomb.x - vx] = '💣';
                 });
             }
 
             // Mai întâi adaugă jucătorii
             Object.values(state.players).forEach(p => {
-                cells[p.y][p.x] = p.emoji;
+                if (p.x >= vx && p.x < vx + vw && p.y >= vy && p.y < vy + vh) {
+                    cells[p.y - vy][p.x - vx] = p.emoji;
+                }
             });
 
-            for (let y = 0; y < 15; y++) {
-                for (let x = 0; x < 15; x++) {
+            for (let y = vy; y < vy + vh; y++) {
+                for (let x = vx; x < vx + vw; x++) {
                     const div = document.createElement('div');
                     div.className = 'cell';
 
@@ -998,7 +3997,7 @@ HTML = '''<!DOCTYPE html>
                         div.style.fontSize = '20px';
                     } else {
                         // Afișează conținutul normal
-                        div.textContent = cells[y][x];
+                        div.textContent = cells[y - vy][x - vx];
                     }
 
                     if (state.phase === 'setup') {
@@ -1042,8 +4041,8 @@ HTML = '''<!DOCTYPE html>
         function renderChat(state) {
             const div = document.getElementById('chat');
 
-            if (state.chat.length > lastChatLength) {
-                const newMessages = state.chat.slice(lastChatLength);
+            const newMessages = state.chat.filter(m => m.seq > lastChatSeq);
+            if (newMessages.length) {
                 newMessages.forEach(msg => {
                     if (msg.sender === 'SISTEM') {
                         // Mesaje ELIMINARE - pentru TOȚI jucătorii
@@ -1065,10 +4064,12 @@ HTML = '''<!DOCTYPE html>
                         }
                     }
                 });
-                lastChatLength = state.chat.length;
+                lastChatSeq = newMessages[newMessages.length - 1].seq;
             }
 
-            div.innerHTML = state.chat.slice(-10).map(m =>
+            // Mesajele SISTEM din stare și cele ale jucătorilor, în ordinea trimiterii
+            const merged = state.chat.concat(chatLog).sort((a, b) => a.ts - b.ts);
+            div.innerHTML = merged.slice(-10).map(m =>
                 `[${m.time}] <b>${m.sender}:</b> ${m.message}`
             ).join('<br>');
             div.scrollTop = div.scrollHeight;
@@ -1078,7 +4079,80 @@ HTML = '''<!DOCTYPE html>
 </html>'''
 
 # MAIN
+
+def start_thread(target, name, *args):
+    thread = threading.Thread(target=target, args=args, daemon=True, name=name)
+    thread.start()
+    log(logging.INFO, '✅ Thread pornit', thread=thread.name)
+    return thread
+
+def run_all():
+    global consumer_engine
+    # Camerele de dinaintea unei reporniri, din jurnal, înaintea oricărei comenzi noi
+    event_log.open(rooms)
+    # Pornește toate consumer-ele RabbitMQ (un thread de conexiune per coadă)
+    consumer_engine = ConsumerEngine({**CONSUMERS, **CHAT_CONSUMERS, **STATS_CONSUMERS})
+    consumer_engine.start()
+    start_thread(cleanup_chat, 'Cleanup')
+    start_thread(stats_engine.run, 'Stats')
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = metrics.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_metrics(port):
+    """Expune /metrics pe un server HTTP separat (workerii nu rulează Flask)"""
+    try:
+        server = ThreadingHTTPServer(('0.0.0.0', port), MetricsHandler)
+    except OSError as e:
+        log(logging.ERROR, '❌ Serverul de metrici nu a pornit', port=port, error=e)
+        return None
+    server.daemon_threads = True
+    start_thread(server.serve_forever, 'Metrics')
+    log(logging.INFO, '📈 Metrici expuse', port=port, path='/metrics')
+    return server
+
+def run_worker(worker_id, metrics_port=METRICS_PORT):
+    global consumer_engine, shard_coordinator
+    rooms.on_publish = publish_room_snapshot
+    rooms.on_evict = publish_eviction
+    consumer_engine = ConsumerEngine(WORKER_CONSUMERS)
+    shard_coordinator = ShardCoordinator(worker_id, consumer_engine, rooms)
+    consumer_engine.start()
+    start_thread(shard_coordinator.run, 'Coordinator')
+    start_thread(cleanup_chat, 'Cleanup')
+    if metrics_port:
+        serve_metrics(metrics_port)
+
+def run_web():
+    global consumer_engine
+    # Nu deține niciun shard: starea vine doar din snapshot-urile workerilor
+    rooms.owned_shards = set()
+    consumer_engine = ConsumerEngine({**SNAPSHOT_CONSUMERS, **CHAT_CONSUMERS, **STATS_CONSUMERS})
+    consumer_engine.start()
+    start_thread(relay_presence, 'Presence')
+    start_thread(stats_engine.run, 'Stats')
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Joc multiplayer cu RabbitMQ')
+    parser.add_argument('mode', nargs='?', default='all', choices=['all', 'worker', 'web'])
+    parser.add_argument('--id', default=PROCESS_ID, help='id-ul workerului (implicit host-pid)')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT,
+                        help='portul /metrics în modul worker (0 = oprit)')
+    args = parser.parse_args()
+
     print('=' * 80)
     print('🎮 JOC MULTIPLAYER CU RABBITMQ')
     print('=' * 80)
@@ -1088,25 +4162,22 @@ if __name__ == '__main__':
     print('   3️⃣  game_moves      - Mișcări jucători')
     print('   4️⃣  game_chat       - Mesaje chat')
     print('   5️⃣  game_actions    - Acțiuni generale')
+    print(f'   Comenzile trec prin exchange-ul {EXCHANGE_GAME}, în {STATE_SHARDS} shard-uri per coadă')
+    print(f'   Mod: {args.mode}')
     print('=' * 80)
 
-    # Pornește toate consumer-ele RabbitMQ în thread-uri separate
-    threads = [
-        threading.Thread(target=statistics_consumer, daemon=True, name='Statistics'),
-        threading.Thread(target=state_consumer, daemon=True, name='State'),
-        threading.Thread(target=moves_consumer, daemon=True, name='Moves'),
-        threading.Thread(target=chat_consumer, daemon=True, name='Chat'),
-        threading.Thread(target=actions_consumer, daemon=True, name='Actions'),
-        threading.Thread(target=cleanup_inactive_players, daemon=True, name='Cleanup')
-    ]
-
-    for thread in threads:
-        thread.start()
-        print(f'✅ Thread {thread.name} pornit!')
-        time.sleep(0.3)
+    if args.mode == 'worker':
+        run_worker(args.id, args.metrics_port)
+        print('=' * 80)
+        threading.Event().wait()
+    else:
+        if args.mode == 'web':
+            run_web()
+        else:
+            run_all()
 
-    print('=' * 80)
-    print('🌐 Deschide în browser: http://localhost:5000')
-    print('=' * 80)
+        print('=' * 80)
+        print(f'🌐 Deschide în browser: http://localhost:{args.port}')
+        print('=' * 80)
 
-    app.run(host='0.0.0.0', port=5000, debug=False)
+        app.run(host='0.0.0.0', port=args.port, debug=False)
@@ -0,0 +1,545 @@
+"""Joc multiplayer cu RabbitMQ - server ASGI (asyncio + aio-pika).
+
+Aceleași rute, aceeași logică și aceiași actori ca joc.py, dar cererile HTTP,
+stream-urile SSE și consumer-ele AMQP rulează pe o singură buclă asyncio: un client
+conectat costă o corutină, nu un thread. Modul threaded (python joc.py) rămâne varianta
+de rezervă.
+
+    pip install starlette uvicorn aio-pika
+    python joc_asgi.py            # totul într-un proces (ca python joc.py)
+    python joc_asgi.py web        # front-end fără stare (ca python joc.py web)
+"""
+import argparse
+import asyncio
+import collections
+import contextlib
+import logging
+import threading
+import time
+
+import joc
+from joc import log
+
+try:
+    import aio_pika
+    import uvicorn
+    from starlette.applications import Starlette
+    from starlette.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
+    from starlette.routing import Route
+except ImportError as e:
+    raise SystemExit(f'❌ Modul lipsă pentru serverul ASGI ({e.name}): pip install starlette uvicorn aio-pika')
+
+# RABBITMQ - PRODUCER (AIO-PIKA)
+
+class AioPublisher:
+    """Înlocuiește joc.async_publisher: aceeași interfață enqueue(), publicare pe bucla asyncio.
+
+    enqueue() poate fi apelat din orice thread (actori, consumer-e, rute); mesajele
+    așteaptă într-un deque și sunt publicate în loturi. Într-un lot, mesajele cu același
+    routing key (aceeași cameră / shard) pleacă în ordine, iar cozile diferite în paralel.
+    """
+
+    def __init__(self, maxsize, batch_size):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.stats = {'enqueued': 0, 'confirmed': 0, 'nacked': 0, 'dropped': 0, 'failed': 0}
+        # enqueue() vine din orice thread, _publish de pe buclă: += pe dicționar nu e atomic
+        self._stats_lock = threading.Lock()
+        self.channel = None
+        self.loop = None
+        self._pending = collections.deque()
+        self._ready = None
+        self._busy = False
+        self._exchanges = {}
+
+    async def start(self, connection):
+        self.channel = await connection.channel(publisher_confirms=True)
+        # Topologia o singură dată, nu la primul mesaj al fiecărui exchange
+        self._exchanges[''] = self.channel.default_exchange
+        for name in joc.EXCHANGE_TYPES:
+            self._exchanges[name] = await declare_exchange(self.channel, name)
+        self._ready = asyncio.Event()
+        self.loop = asyncio.get_running_loop()
+        if self._pending:
+            # Mesajele puse în coadă înainte de pornire
+            self._ready.set()
+        asyncio.create_task(self._run())
+
+    def enqueue(self, queue_name, data, exchange=''):
+        if len(self._pending) >= self.maxsize:
+            self.count('dropped')
+            return False
+        self._pending.append((exchange, queue_name, data, time.time()))
+        self.count('enqueued')
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._ready.set)
+        return True
+
+    def count(self, key, value=1):
+        with self._stats_lock:
+            self.stats[key] += value
+
+    def snapshot(self):
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def pending(self):
+        return len(self._pending)
+
+    async def drain(self, timeout=5):
+        """Așteaptă publicarea mesajelor din coadă (la oprire); False dacă expiră timeout-ul"""
+        deadline = time.monotonic() + timeout
+        while self._pending or self._busy:
+            if self.loop is None or time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.01)
+        return True
+
+    def flush(self, timeout=5):
+        # Din alt thread (ex. predarea shard-urilor în joc.py); bucla nu se poate bloca singură
+        if self.loop is None:
+            return not self._pending
+        return asyncio.run_coroutine_threadsafe(self.drain(timeout), self.loop).result(timeout + 1)
+
+    async def _run(self):
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            while self._pending:
+                self._busy = True
+                try:
+                    by_key = collections.defaultdict(list)
+                    for _ in range(min(self.batch_size, len(self._pending))):
+                        item = self._pending.popleft()
+                        by_key[(item[0], item[1])].append(item)
+                    await asyncio.gather(*(self._publish_in_order(items) for items in by_key.values()))
+                finally:
+                    self._busy = False
+
+    async def _publish_in_order(self, items):
+        for item in items:
+            await self._publish(*item)
+
+    async def _publish(self, exchange_name, routing_key, data, sent_at):
+        body, content_type = data if isinstance(data, tuple) else joc.encode_message(data)
+        label = joc.metric_queue(exchange_name, routing_key)
+        started = time.perf_counter()
+        try:
+            await self._exchanges[exchange_name].publish(
+                aio_pika.Message(
+                    body,
+                    content_type=content_type,
+                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                    headers={joc.SENT_AT_HEADER: int(sent_at * 1000)}
+                ),
+                routing_key=routing_key
+            )
+        except aio_pika.exceptions.DeliveryError:
+            self.count('nacked')
+            joc.metrics.inc('joc_publish_failures_total', queue=label)
+        except Exception as e:
+            self.count('failed')
+            joc.metrics.inc('joc_publish_failures_total', queue=label)
+            log(logging.ERROR, '❌ Eroare RabbitMQ', queue=routing_key, error=e)
+        else:
+            self.count('confirmed')
+            joc.metrics.observe('joc_publish_seconds', time.perf_counter() - started, queue=label)
+            joc.metrics.inc('joc_published_total', queue=label)
+
+# Topologia, ca declare_* din joc.py, pe un canal aio-pika
+
+async def declare_exchange(channel, name):
+    exchange = await channel.declare_exchange(name, aio_pika.ExchangeType(joc.EXCHANGE_TYPES[name]), durable=True)
+    if name == joc.EXCHANGE_GAME:
+        for queue_name in joc.COMMAND_QUEUES:
+            for shard in range(joc.STATE_SHARDS):
+                command_queue = joc.command_queue(queue_name, shard)
+                queue = await channel.declare_queue(
+                    command_queue, durable=True, arguments={'x-single-active-consumer': True})
+                await queue.bind(exchange, routing_key=command_queue)
+    return exchange
+
+async def declare_queue(channel, queue_name):
+    return await channel.declare_queue(queue_name, durable=True)
+
+async def declare_command_queue(channel, queue_name):
+    await declare_exchange(channel, joc.EXCHANGE_GAME)
+    return await channel.declare_queue(queue_name, durable=True, arguments={'x-single-active-consumer': True})
+
+def exclusive_queue(exchange_name, routing_key):
+    async def declare(channel, queue_name):
+        exchange = await declare_exchange(channel, exchange_name)
+        queue = await channel.declare_queue(queue_name, exclusive=True, auto_delete=True)
+        await queue.bind(exchange, routing_key=routing_key)
+        return queue
+    return declare
+
+async def request_sync(workers):
+    body, content_type = joc.encode_message({'type': 'sync', 'process': joc.PROCESS_ID})
+    await workers.publish(aio_pika.Message(body, content_type=content_type), routing_key='')
+
+async def declare_snapshot_queue(channel, queue_name):
+    queue = await exclusive_queue(joc.EXCHANGE_SNAPSHOTS, 'snapshot.#')(channel, queue_name)
+    # Ca în joc.py: abia după legare cerem workerilor starea curentă a camerelor
+    workers = await declare_exchange(channel, joc.EXCHANGE_WORKERS)
+    await request_sync(workers)
+    # La reconectare coada exclusivă e nouă și a pierdut snapshot-urile de între timp:
+    # canalul robust o redeclară și o leagă, apoi cerem din nou starea camerelor
+    channel.reopen_callbacks.add(lambda _channel: request_sync(workers))
+    return queue
+
+async def declare_chat_queue(channel, queue_name):
+    exchange = await declare_exchange(channel, joc.EXCHANGE_CHAT)
+    queue = await channel.declare_queue(queue_name, exclusive=True, auto_delete=True)
+    asyncio.create_task(bind_chat_rooms(queue, exchange))
+    return queue
+
+async def bind_chat_rooms(queue, exchange):
+    """Ca joc.bind_chat_rooms: coada e legată doar la camerele cu stream-uri în proces.
+
+    Coada robustă își reface singură legăturile după o reconectare.
+    """
+    loop = asyncio.get_running_loop()
+    changed = asyncio.Event()
+    joc.chat_hub.watch_follows(lambda: loop.call_soon_threadsafe(changed.set))
+    bound = set()
+    while True:
+        changed.clear()
+        followed = joc.chat_hub.followed()
+        try:
+            for room_id in followed - bound:
+                await queue.bind(exchange, routing_key=joc.chat_routing_key(room_id))
+            for room_id in bound - followed:
+                await queue.unbind(exchange, routing_key=joc.chat_routing_key(room_id))
+            bound = followed
+        except Exception as e:
+            # Canalul e refăcut de conexiunea robustă; reîncercăm la următoarea schimbare
+            log(logging.ERROR, '❌ Legarea chat-ului a eșuat', error=e)
+        await changed.wait()
+
+DECLARATIONS = {
+    joc.declare_queue: declare_queue,
+    joc.declare_command_queue: declare_command_queue,
+    joc.declare_chat_queue: declare_chat_queue,
+    joc.declare_stats_queue: exclusive_queue(joc.EXCHANGE_STATS, ''),
+    joc.declare_snapshot_queue: declare_snapshot_queue,
+}
+
+# RABBITMQ - CONSUMERS (AIO-PIKA)
+
+async def consume(connection, queue_name, config):
+    """Un canal per coadă; handler-ele (sincrone, pot aștepta actorii) rulează în executor.
+
+    Câte `workers` mesaje se procesează în paralel; ack-ul pleacă după handler, ca
+    la consumer-ele din joc.py (și după o excepție, care e doar logată).
+    """
+    handler = config['handler']
+    metric_label = queue_name.removesuffix(f'.{joc.PROCESS_ID}')
+    channel = await connection.channel()
+    await channel.set_qos(prefetch_count=config['prefetch'])
+    queue = await DECLARATIONS[config['declare']](channel, queue_name)
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(config['workers'])
+
+    async def process(message):
+        async with slots:
+            started = time.time()
+            try:
+                data = joc.decode_message(message.body, message.content_type)
+                await loop.run_in_executor(None, handler, data)
+            except Exception as e:
+                joc.metrics.inc('joc_consumer_errors_total', handler=handler.__name__)
+                log(logging.ERROR, '❌ Eroare handler', queue=queue_name, handler=handler.__name__, error=e)
+            await message.ack()
+            done = time.time()
+            joc.metrics.observe('joc_consumer_seconds', done - started, handler=handler.__name__)
+            sent_at = (message.headers or {}).get(joc.SENT_AT_HEADER)
+            if sent_at is not None:
+                joc.metrics.observe('joc_queue_lag_seconds', max(0.0, started - sent_at / 1000), queue=metric_label)
+                joc.metrics.observe('joc_end_to_end_seconds', max(0.0, done - sent_at / 1000), queue=metric_label)
+
+    await queue.consume(process)
+    log(logging.INFO, '📥 Consumer pornit', queue=queue_name, prefetch=config['prefetch'], workers=config['workers'])
+
+# AȘTEPTARE FĂRĂ THREAD-URI
+
+async def wait_until(watch, unwatch, ready, timeout):
+    """Ca Condition.wait_for, dar pe bucla asyncio: callback-ul e apelat din thread-ul care notifică"""
+    loop = asyncio.get_running_loop()
+    changed = asyncio.Event()
+
+    def notify():
+        loop.call_soon_threadsafe(changed.set)
+
+    watch(notify)
+    try:
+        if ready():
+            return True
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return ready()
+    finally:
+        unwatch(notify)
+
+# RUTE
+
+def query_int(request, name):
+    try:
+        return int(request.query_params[name])
+    except (KeyError, ValueError):
+        return None
+
+def request_room(request, data=None):
+    room_id = (data or {}).get('room') or request.query_params.get('room') or joc.DEFAULT_ROOM
+    return str(room_id).strip()[:32] or joc.DEFAULT_ROOM
+
+async def request_json(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+async def request_body(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        raise joc.InvalidCommand('corpul trebuie să fie un obiect JSON')
+    return data
+
+async def invalid_command(request, error):
+    return JSONResponse({'ok': False, 'error': 'invalid', 'detail': str(error)}, status_code=400)
+
+def publish_response(queue_name, command):
+    if not joc.enqueue_command(queue_name, command.room, command.message()):
+        return JSONResponse({'ok': False, 'error': 'busy'}, status_code=503)
+    return JSONResponse({'ok': True})
+
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+async def index(request):
+    return HTMLResponse(joc.HTML)
+
+async def api_join(request):
+    data = await request_body(request)
+    command = joc.JoinCommand.parse(request_room(request, data), {
+        'player': data.get('name', 'Anonim'),
+        'grid_size': data.get('grid_size')
+    })
+    return publish_response(joc.QUEUE_ACTIONS, command)
+
+async def api_place_bomb(request):
+    data = await request_body(request)
+    command = joc.BombCommand.parse(request_room(request, data), data)
+    joc.note_presence(command.room, command.player)
+    return publish_response(joc.QUEUE_MOVES, command)
+
+async def api_move(request):
+    data = await request_body(request)
+    command = joc.MoveCommand.parse(request_room(request, data), data)
+    joc.note_presence(command.room, command.player)
+    return publish_response(joc.QUEUE_MOVES, command)
+
+async def api_chat(request):
+    data = await request_body(request)
+    command = joc.ChatCommand.parse(request_room(request, data), data)
+    joc.note_presence(command.room, command.player)
+    if not joc.chat_limiter.allow((command.room, command.player)):
+        return JSONResponse({'ok': False, 'error': 'rate_limited'}, status_code=429)
+    if not joc.publish_chat(command.room, command.player, command.message):
+        return JSONResponse({'ok': False, 'error': 'busy'}, status_code=503)
+    return JSONResponse({'ok': True})
+
+async def api_stats(request):
+    return Response(joc.stats_engine.result(request.query_params.get('room') or '*'), media_type='application/json')
+
+async def metrics_endpoint(request):
+    return Response(joc.metrics.render(), media_type='text/plain; version=0.0.4')
+
+async def api_chat_history(request):
+    after = query_int(request, 'after') or 0
+    messages, missed = joc.chat_hub.after(request_room(request), after)
+    return Response(joc.json_bytes({
+        'messages': messages,
+        'cursor': messages[-1]['seq'] if messages else after,
+        'missed': missed
+    }), media_type='application/json')
+
+async def chat_stream(room_id, since):
+    seq = since or 0
+    joc.chat_hub.follow(room_id)
+    try:
+        while True:
+            messages, _ = joc.chat_hub.after(room_id, seq)
+            if messages:
+                for message in messages:
+                    yield joc.chat_event(message)
+                seq = messages[-1]['seq']
+                continue
+            last = seq
+            ready = lambda: bool(joc.chat_hub.after(room_id, last)[0])
+            if not await wait_until(lambda cb: joc.chat_hub.watch(room_id, cb),
+                                    lambda cb: joc.chat_hub.unwatch(room_id, cb),
+                                    ready, joc.STREAM_KEEPALIVE):
+                yield joc.SSE_PING
+    finally:
+        joc.chat_hub.unfollow(room_id)
+
+async def api_chat_stream(request):
+    since = query_int(request, 'after')
+    last_event_id = request.headers.get('last-event-id')
+    if last_event_id is not None and last_event_id.isdigit():
+        since = int(last_event_id)
+    return StreamingResponse(chat_stream(request_room(request), since),
+                             media_type='text/event-stream', headers=SSE_HEADERS)
+
+async def api_state(request):
+    player_name = request.query_params.get('player', '')
+    since = query_int(request, 'since')
+    room_id = request_room(request)
+    published = joc.rooms.published(room_id)
+    if player_name in published[0]['players']:
+        joc.stream_presence.seen(room_id, player_name)
+    viewport = joc.player_viewport(published[0], player_name, request.query_params.get('view'))
+
+    etag = joc.state_etag(published[0], player_name, viewport, since)
+    headers = {'ETag': f'W/"{etag}"', 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+    if f'"{etag}"' in request.headers.get('if-none-match', ''):
+        return Response(status_code=304, headers=headers)
+
+    cached = joc.project_state(published, player_name, viewport, since)
+    body = cached.body
+    if len(body) >= joc.GZIP_MIN_SIZE and 'gzip' in request.headers.get('accept-encoding', ''):
+        body = cached.gzipped()
+        headers['Content-Encoding'] = 'gzip'
+    joc.metrics.observe('joc_state_response_bytes', len(body))
+    return Response(body, media_type='application/json', headers=headers)
+
+async def state_stream(room_id, player_name, since, view):
+    if player_name:
+        joc.stream_presence.connect(room_id, player_name)
+    try:
+        cursor = joc.StateCursor(room_id, player_name, since, view)
+        while True:
+            event = cursor.next_event()
+            if event is not None:
+                yield event
+                continue
+            room, version = cursor.room, cursor.version
+            if room is None:
+                if not await wait_until(joc.rooms.watch, joc.rooms.unwatch,
+                                        lambda: joc.rooms.peek(room_id) is not None, joc.STREAM_KEEPALIVE):
+                    yield joc.SSE_PING
+                continue
+            if not await wait_until(room.watch, room.unwatch,
+                                    lambda: room.snapshot()['version'] != version, joc.STREAM_KEEPALIVE):
+                yield joc.SSE_PING
+    finally:
+        if player_name:
+            joc.stream_presence.disconnect(room_id, player_name)
+
+async def api_stream(request):
+    since = query_int(request, 'since')
+    last_event_id = request.headers.get('last-event-id')
+    if last_event_id is not None and last_event_id.isdigit():
+        since = int(last_event_id)
+    return StreamingResponse(
+        state_stream(request_room(request), request.query_params.get('player', ''), since,
+                     request.query_params.get('view')),
+        media_type='text/event-stream', headers=SSE_HEADERS)
+
+async def room_command(command, fn, *args):
+    """Ca joc.room_command: direct pe actor dacă procesul deține camera, altfel prin RabbitMQ"""
+    if not joc.rooms.owns(command.room):
+        joc.enqueue_command(joc.QUEUE_ACTIONS, command.room, command.message())
+    elif joc.rooms.peek(command.room) is not None:
+        await asyncio.wrap_future(joc.rooms.submit(command.room, fn, *args, create=False))
+    return JSONResponse({'ok': True})
+
+async def api_heartbeat(request):
+    data = await request_json(request)
+    joc.note_presence(request_room(request, data), data.get('player', ''))
+    return JSONResponse({'ok': True})
+
+async def api_leave(request):
+    data = await request_body(request)
+    command = joc.LeaveCommand.parse(request_room(request, data), data)
+    return await room_command(command, joc.remove_player, command.player)
+
+async def api_reset(request):
+    data = await request_body(request)
+    return await room_command(joc.ResetCommand.parse(request_room(request, data), data), joc.reset_game)
+
+ROUTES = [
+    Route('/', index),
+    Route('/api/join', api_join, methods=['POST']),
+    Route('/api/place_bomb', api_place_bomb, methods=['POST']),
+    Route('/api/move', api_move, methods=['POST']),
+    Route('/api/chat', api_chat, methods=['POST']),
+    Route('/api/chat', api_chat_history, methods=['GET']),
+    Route('/api/chat/stream', api_chat_stream),
+    Route('/api/stats', api_stats),
+    Route('/metrics', metrics_endpoint),
+    Route('/api/state', api_state),
+    Route('/api/stream', api_stream),
+    Route('/api/heartbeat', api_heartbeat, methods=['POST']),
+    Route('/api/leave', api_leave, methods=['POST']),
+    Route('/api/reset', api_reset, methods=['POST']),
+]
+
+# MAIN
+
+def create_app(mode='all'):
+    async def startup():
+        if mode == 'web':
+            # Nu deține niciun shard: starea vine doar din snapshot-urile workerilor
+            joc.rooms.owned_shards = set()
+            consumers = {**joc.SNAPSHOT_CONSUMERS, **joc.CHAT_CONSUMERS, **joc.STATS_CONSUMERS}
+        else:
+            joc.event_log.open(joc.rooms)
+            consumers = {**joc.CONSUMERS, **joc.CHAT_CONSUMERS, **joc.STATS_CONSUMERS}
+
+        connection = await aio_pika.connect_robust(host=joc.RABBITMQ_HOST)
+        await publisher.start(connection)
+        for queue_name, config in consumers.items():
+            await consume(connection, queue_name, config)
+
+        # Thread-urile periodice rămân cele din joc.py (nu țin clienți)
+        if mode == 'web':
+            joc.start_thread(joc.relay_presence, 'Presence')
+        else:
+            joc.start_thread(joc.cleanup_chat, 'Cleanup')
+        joc.start_thread(joc.stats_engine.run, 'Stats')
+
+    publisher = AioPublisher(joc.PUBLISH_QUEUE_MAXSIZE, joc.PUBLISH_BATCH_SIZE)
+    # Actorii și logica jocului publică prin joc.async_publisher: îl înlocuim
+    joc.async_publisher = publisher
+    joc.metrics.gauge('joc_publish_pending', 'Mesaje care așteaptă publicarea', publisher.pending)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        await startup()
+        try:
+            yield
+        finally:
+            if not await publisher.drain():
+                log(logging.WARNING, '⚠️ Mesaje nepublicate la oprire', pending=publisher.pending())
+
+    return Starlette(routes=ROUTES, lifespan=lifespan, exception_handlers={joc.InvalidCommand: invalid_command})
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Joc multiplayer cu RabbitMQ (ASGI)')
+    parser.add_argument('mode', nargs='?', default='all', choices=['all', 'web'])
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    args = parser.parse_args()
+
+    print('=' * 80)
+    print(f'🎮 JOC MULTIPLAYER CU RABBITMQ - ASGI (mod: {args.mode})')
+    print(f'🌐 Deschide în browser: http://localhost:{args.port}')
+    print('=' * 80)
+    uvicorn.run(create_app(args.mode), host=args.host, port=args.port, log_level='warning')
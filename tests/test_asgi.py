@@ -0,0 +1,109 @@
+"""AioPublisher (joc_asgi.py) publicând pe un exchange fals, fără broker."""
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip('aio_pika')
+pytest.importorskip('starlette')
+pytest.importorskip('uvicorn')
+
+import joc
+import joc_asgi
+
+
+class FakeExchange:
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, message, routing_key):
+        self.published.append((routing_key, message))
+
+
+class FakeQueue:
+    async def bind(self, exchange, routing_key=None):
+        pass
+
+
+class FakeChannel:
+    def __init__(self):
+        self.default_exchange = self.exchange = FakeExchange()
+        self.reopen_callbacks = joc_asgi.aio_pika.tools.CallbackCollection(self)
+
+    async def declare_exchange(self, name, kind, durable=False):
+        return self.exchange
+
+    async def declare_queue(self, name, **kwargs):
+        return FakeQueue()
+
+
+class FakeConnection:
+    def __init__(self):
+        self.fake_channel = FakeChannel()
+
+    async def channel(self, publisher_confirms=False):
+        return self.fake_channel
+
+
+@pytest.mark.parametrize('json_backend', ['stdlib', 'orjson'])
+def test_publisher_sends_bytes_for_every_message(monkeypatch, json_backend):
+    if json_backend == 'stdlib':
+        monkeypatch.setattr(joc, 'orjson', None)
+    elif joc.orjson is None:
+        pytest.skip('orjson lipsește')
+    messages = [
+        (joc.command_queue(joc.QUEUE_ACTIONS, 0), {'action': 'join', 'player': 'ana', 'room': 'r'}, joc.EXCHANGE_GAME),
+        (joc.command_queue(joc.QUEUE_MOVES, 0), {'action': 'move', 'player': 'ana', 'direction': 'UP', 'room': 'r'},
+         joc.EXCHANGE_GAME),
+        (joc.chat_routing_key('r'), {'type': 'chat', 'room': 'r', 'sender': 'ana', 'message': 'salut'},
+         joc.EXCHANGE_CHAT),
+        ('', {'type': 'sync', 'process': 'p'}, joc.EXCHANGE_WORKERS),
+    ]
+
+    async def run():
+        connection = FakeConnection()
+        publisher = joc_asgi.AioPublisher(100, 10)
+        await publisher.start(connection)
+        for routing_key, data, exchange in messages:
+            assert publisher.enqueue(routing_key, data, exchange=exchange)
+        assert await publisher.drain()
+        return publisher, connection.fake_channel.exchange.published
+
+    publisher, published = asyncio.run(run())
+    assert publisher.stats['confirmed'] == len(messages)
+    assert publisher.stats['failed'] == publisher.stats['nacked'] == 0
+    bodies = {routing_key: message for routing_key, message in published}
+    for routing_key, data, _ in messages:
+        message = bodies[routing_key]
+        assert isinstance(message.body, bytes)
+        assert joc.decode_message(message.body, message.content_type) == data
+
+
+def test_enqueue_counts_are_exact_across_threads():
+    publisher = joc_asgi.AioPublisher(100000, 10)
+
+    def enqueue_many():
+        for i in range(5000):
+            publisher.enqueue('q', {'i': i})
+
+    threads = [threading.Thread(target=enqueue_many) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert publisher.snapshot()['enqueued'] == 20000 == publisher.pending()
+
+
+def test_snapshot_queue_asks_for_sync_again_after_a_reconnect():
+    async def run():
+        channel = FakeChannel()
+        await joc_asgi.declare_snapshot_queue(channel, 'snapshots.p')
+        syncs = len(channel.exchange.published)
+        # Canalul robust redeclară coada după reconectare, apoi apelează reopen_callbacks
+        await channel.reopen_callbacks()
+        return syncs, channel.exchange.published
+
+    syncs, published = asyncio.run(run())
+    assert syncs == 1 and len(published) == 2
+    for routing_key, message in published:
+        assert joc.decode_message(message.body, message.content_type) == {'type': 'sync', 'process': joc.PROCESS_ID}
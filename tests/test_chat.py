@@ -0,0 +1,116 @@
+"""Chat-ul jucătorilor: seq dat de actorul camerei, istoricul din proces și legăturile cozii."""
+import pytest
+
+import joc
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = joc.RoomRegistry(joc.STATE_SHARDS)
+    # ChatHub își umple istoricul din camerele procesului (joc.rooms)
+    monkeypatch.setattr(joc, 'rooms', registry)
+    return registry
+
+
+@pytest.fixture
+def hub():
+    return joc.ChatHub()
+
+
+def chat(seq, epoch='e1', room='r', message='salut'):
+    return {'type': 'chat', 'room': room, 'epoch': epoch, 'seq': seq, 'sender': 'ana',
+            'message': message, 'time': '12:00:00', 'ts': joc.time.time()}
+
+
+class RecordingChannel:
+    def __init__(self):
+        self.calls = []
+
+    def queue_bind(self, queue, exchange, routing_key):
+        self.calls.append(('bind', routing_key))
+
+    def queue_unbind(self, queue, exchange, routing_key):
+        self.calls.append(('unbind', routing_key))
+
+
+def test_the_room_actor_numbers_messages_once(registry, monkeypatch):
+    published = []
+
+    def enqueue(routing_key, data, exchange=''):
+        if exchange == joc.EXCHANGE_CHAT:
+            published.append((routing_key, data))
+        return True
+    monkeypatch.setattr(joc.async_publisher, 'enqueue', enqueue)
+    registry.call('r', joc.add_player, 'ana', None)
+    for text in ('unu', 'doi', 'trei'):
+        registry.call('r', joc.add_message, 'ana', text, create=False)
+
+    state = registry.peek('r').state
+    assert [m['seq'] for m in state['messages']] == [1, 2, 3]
+    assert [(key, data['seq'], data['message']) for key, data in published] == [
+        ('chat.r', 1, 'unu'), ('chat.r', 2, 'doi'), ('chat.r', 3, 'trei')]
+    assert all(data['epoch'] == state['epoch'] for _, data in published)
+    # Mesajele și contorul călătoresc în snapshot-urile dintre procese
+    imported = joc.import_state(joc.export_state(state))
+    assert list(imported['messages']) == list(state['messages']) and imported['message_seq'] == 3
+
+
+def test_deliver_drops_redelivered_messages_and_resets_on_a_new_epoch(hub):
+    for seq in (1, 2, 2, 1, 3):
+        hub.deliver('r', chat(seq))
+    messages, missed = hub.after('r', 0)
+    assert [m['seq'] for m in messages] == [1, 2, 3] and not missed
+
+    # Camera recreată: seq-urile o iau de la 1, istoricul vechi nu mai e valid
+    hub.deliver('r', chat(1, epoch='e2', message='nou'))
+    messages, _ = hub.after('r', 0)
+    assert [(m['seq'], m['message']) for m in messages] == [(1, 'nou')]
+
+
+def test_first_follower_seeds_history_from_the_room_state(hub, registry, monkeypatch):
+    monkeypatch.setattr(joc.async_publisher, 'enqueue', lambda *args, **kwargs: True)
+    registry.call('r', joc.add_player, 'ana', None)
+    for text in ('unu', 'doi'):
+        registry.call('r', joc.add_message, 'ana', text, create=False)
+    epoch = registry.peek('r').state['epoch']
+
+    hub.follow('r')
+    assert [m['message'] for m in hub.after('r', 0)[0]] == ['unu', 'doi']
+    # Mesajul live de după seed continuă secvența; duplicatele din seed se ignoră
+    hub.deliver('r', chat(2, epoch=epoch, message='doi'))
+    hub.deliver('r', chat(3, epoch=epoch, message='trei'))
+    assert [m['seq'] for m in hub.after('r', 1)[0]] == [2, 3]
+
+
+def test_snapshot_seed_fills_gaps_in_order(hub):
+    hub.deliver('r', chat(1))
+    hub.deliver('r', chat(4))
+    hub.seed('r', 'e1', [chat(2), chat(3)])
+    assert [m['seq'] for m in hub.after('r', 0)[0]] == [1, 2, 3, 4]
+    # Camerele neurmărite de proces nu primesc istoric din snapshot-uri
+    hub.seed('altă', 'e1', [chat(1, room='altă')])
+    assert hub.after('altă', 0) == ([], False)
+
+
+def test_queue_is_bound_only_to_followed_rooms(hub, monkeypatch):
+    monkeypatch.setattr(joc, 'chat_hub', hub)
+    monkeypatch.setattr(joc, 'chat_bindings', set())
+    changed = joc.threading.Event()
+    monkeypatch.setattr(joc, 'chat_bindings_changed', changed)
+    hub.watch_follows(changed.set)
+    channel = RecordingChannel()
+
+    hub.follow('a')
+    hub.follow('a')
+    hub.follow('b')
+    joc.rebind_chat_queue(channel, 'q')
+    assert sorted(channel.calls) == [('bind', 'chat.a'), ('bind', 'chat.b')]
+
+    channel.calls.clear()
+    hub.unfollow('a')
+    joc.rebind_chat_queue(channel, 'q')
+    assert channel.calls == []
+    hub.unfollow('a')
+    joc.rebind_chat_queue(channel, 'q')
+    assert channel.calls == [('unbind', 'chat.a')]
+    assert hub.followed() == {'b'}
@@ -0,0 +1,55 @@
+"""Codecurile mesajelor din cozi: JSON, msgpack și mișcările împachetate binar."""
+import pytest
+
+import joc
+
+MOVE = {'action': 'move', 'player': 'ana', 'direction': 'LEFT', 'room': 'lobby'}
+BOMB = {'action': 'place_bomb', 'player': 'bob', 'x': 999, 'y': 0, 'room': 'camera-ă'}
+JOIN = {'action': 'join', 'player': 'ana', 'grid_size': 40, 'room': 'lobby'}
+EVENT = {'type': 'phase_change', 'room': 'lobby', 'phase': 'finished', 'scores': {'ana': 3}, 'duration': 12.5}
+
+
+@pytest.mark.parametrize('data', [MOVE, BOMB, JOIN, EVENT])
+@pytest.mark.parametrize('codec', ['json', 'msgpack', 'binary'])
+def test_round_trip(codec, data):
+    if codec == 'msgpack' and joc.msgpack is None:
+        pytest.skip('msgpack lipsește')
+    body, content_type = joc.encode_message(data, codec)
+    assert isinstance(body, bytes)
+    assert joc.decode_message(body, content_type) == data
+
+
+def test_json_without_orjson_is_bytes(monkeypatch):
+    monkeypatch.setattr(joc, 'orjson', None)
+    body, content_type = joc.encode_message(EVENT, 'json')
+    assert isinstance(body, bytes) and content_type == joc.CONTENT_JSON
+    assert joc.decode_message(body, content_type) == EVENT
+
+
+def test_binary_packs_only_moves():
+    assert joc.encode_message(MOVE, 'binary')[1] == joc.CONTENT_MOVE
+    assert joc.encode_message(BOMB, 'binary')[1] == joc.CONTENT_MOVE
+    # Ce nu se potrivește formatului binar pleacă în JSON
+    assert joc.encode_message(JOIN, 'binary')[1] == joc.CONTENT_JSON
+    assert joc.encode_message(EVENT, 'binary')[1] == joc.CONTENT_JSON
+
+
+@pytest.mark.parametrize('data', [
+    dict(BOMB, x=40000),
+    dict(BOMB, y=-40000),
+    dict(BOMB, x=1.5),
+    dict(MOVE, direction='NOWHERE'),
+    dict(MOVE, action='teleport'),
+    dict(MOVE, extra=1),
+    dict(MOVE, player=None),
+    dict(MOVE, room='r' * 256),
+])
+def test_pack_move_rejects_what_the_format_cannot_hold(data):
+    assert joc.pack_move(data) is None
+
+
+def test_messages_without_content_type_are_json():
+    body = b'{"type": "player_join", "room": "lobby"}'
+    assert joc.decode_message(body, None) == {'type': 'player_join', 'room': 'lobby'}
+    with pytest.raises(ValueError):
+        joc.decode_message(body, 'application/x-necunoscut')
@@ -0,0 +1,89 @@
+"""Validatoarele compilate ale comenzilor și răspunsurile 400 de la margine."""
+import pytest
+
+import joc
+
+
+@pytest.fixture
+def client():
+    return joc.app.test_client()
+
+
+@pytest.mark.parametrize('command_type, data, expected', [
+    (joc.JoinCommand, {'player': 'ana', 'grid_size': 20}, {'player': 'ana', 'grid_size': 20}),
+    (joc.JoinCommand, {'player': 'ana'}, {'player': 'ana', 'grid_size': None}),
+    # O mărime în afara limitelor se ajustează, nu se respinge
+    (joc.JoinCommand, {'player': 'ana', 'grid_size': 5000}, {'player': 'ana', 'grid_size': joc.GRID_MAX_SIZE}),
+    (joc.MoveCommand, {'player': 'ana', 'direction': 'LEFT'}, {'player': 'ana', 'direction': 'LEFT'}),
+    (joc.BombCommand, {'player': 'ana', 'x': 0, 'y': joc.GRID_MAX_SIZE - 1},
+     {'player': 'ana', 'x': 0, 'y': joc.GRID_MAX_SIZE - 1}),
+    (joc.ChatCommand, {'player': 'ana', 'message': 'x' * joc.CHAT_MAX_LENGTH},
+     {'player': 'ana', 'message': 'x' * joc.CHAT_MAX_LENGTH}),
+    (joc.ResetCommand, {}, {'player': None}),
+])
+def test_accepted_payloads(command_type, data, expected):
+    command = command_type.parse('camera', data)
+    assert command.room == 'camera'
+    assert {name: getattr(command, name) for name in command_type.fields} == expected
+
+
+@pytest.mark.parametrize('command_type, data, field', [
+    (joc.JoinCommand, {'player': ''}, 'player'),
+    (joc.JoinCommand, {'player': 'x' * (joc.PLAYER_NAME_MAX_LENGTH + 1)}, 'player'),
+    (joc.JoinCommand, {'player': 'ana', 'grid_size': '20'}, 'grid_size'),
+    (joc.MoveCommand, {'player': 'ana', 'direction': 'up'}, 'direction'),
+    (joc.MoveCommand, {'player': 'ana'}, 'direction'),
+    (joc.MoveCommand, {'player': 7, 'direction': 'UP'}, 'player'),
+    (joc.BombCommand, {'player': 'ana', 'x': -1, 'y': 0}, 'x'),
+    (joc.BombCommand, {'player': 'ana', 'x': 0, 'y': joc.GRID_MAX_SIZE}, 'y'),
+    (joc.BombCommand, {'player': 'ana', 'x': 1.5, 'y': 0}, 'x'),
+    (joc.BombCommand, {'player': 'ana', 'x': True, 'y': 0}, 'x'),
+    (joc.BombCommand, {'player': 'ana', 'x': '3', 'y': 0}, 'x'),
+    (joc.ChatCommand, {'player': 'ana', 'message': ''}, 'message'),
+    (joc.ChatCommand, {'player': 'ana', 'message': 'x' * (joc.CHAT_MAX_LENGTH + 1)}, 'message'),
+    (joc.ChatCommand, {'player': 'ana', 'message': ['salut']}, 'message'),
+    (joc.ResetCommand, {'player': 3}, 'player'),
+])
+def test_rejected_payloads(command_type, data, field):
+    with pytest.raises(joc.InvalidCommand, match=f'^{field}: '):
+        command_type.parse('camera', data)
+
+
+def test_validator_rejects_non_objects():
+    with pytest.raises(joc.InvalidCommand):
+        joc.MoveCommand.validate(['ana', 'UP'])
+
+
+def test_message_command_ignores_unknown_and_invalid_actions():
+    assert joc.message_command({'action': 'teleport', 'player': 'ana'}) is None
+    assert joc.message_command({'player': 'ana'}) is None
+    assert joc.message_command({'action': 'move', 'player': 'ana', 'direction': 'NOWHERE'}) is None
+    command = joc.message_command({'action': 'move', 'player': 'ana', 'direction': 'UP', 'room': 'r'})
+    assert type(command) is joc.MoveCommand and command.room == 'r'
+    assert command.message() == {'action': 'move', 'player': 'ana', 'direction': 'UP'}
+    assert type(joc.message_command({'player': 'ana', 'message': 'hi'}, joc.ChatCommand)) is joc.ChatCommand
+
+
+@pytest.mark.parametrize('path, body', [
+    ('/api/join', {'name': ''}),
+    ('/api/move', {'player': 'ana', 'direction': 'SIDEWAYS'}),
+    ('/api/place_bomb', {'player': 'ana', 'x': 0, 'y': -3}),
+    ('/api/place_bomb', {'player': 'ana', 'x': 'a', 'y': 0}),
+    ('/api/chat', {'player': 'ana', 'message': ''}),
+    ('/api/leave', {'player': None}),
+    ('/api/reset', {'player': 12}),
+])
+def test_invalid_requests_get_400_without_publishing(client, path, body):
+    enqueued = joc.async_publisher.snapshot()['enqueued']
+    response = client.post(path, json=body)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'invalid'
+    assert response.get_json()['detail']
+    assert joc.async_publisher.snapshot()['enqueued'] == enqueued
+
+
+@pytest.mark.parametrize('path', ['/api/join', '/api/move', '/api/chat', '/api/leave'])
+def test_non_object_bodies_get_400(client, path):
+    response = client.post(path, data='[1, 2]', content_type='application/json')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'invalid'
@@ -0,0 +1,112 @@
+"""Jurnalul de evenimente: rotirea segmentelor, checkpoint-ul și refacerea stării la pornire."""
+import random
+
+import pytest
+
+import joc
+
+ROOM = 'jurnal'
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    """Deschide un jurnal nou peste același director, ca la o repornire a procesului"""
+    opened = []
+
+    def open_journal(segment_records=1000):
+        event_log = joc.EventLog(str(tmp_path), 0.01, segment_records)
+        registry = joc.RoomRegistry(joc.STATE_SHARDS)
+        # Actorii și logica jocului jurnalizează prin instanța globală
+        monkeypatch.setattr(joc, 'event_log', event_log)
+        event_log.open(registry)
+        opened.append(event_log)
+        return event_log, registry
+
+    yield open_journal
+    for event_log in opened:
+        event_log.close()
+
+
+def play(registry, moves, seed=7):
+    """Doi jucători, bombele, apoi mutări care caută item-urile ascunse"""
+    rng = random.Random(seed)
+    registry.call(ROOM, joc.add_player, 'ana', None)
+    registry.call(ROOM, joc.add_player, 'bob', None)
+    for name, row in (('ana', 0), ('bob', 9)):
+        for x in range(joc.MAX_BOMBS):
+            registry.call(ROOM, joc.place_bomb_setup, name, x, row)
+    for _ in range(moves):
+        name, direction = registry.call(ROOM, next_move, rng)
+        if name is None:
+            break
+        registry.call(ROOM, joc.move_player, name, direction)
+
+
+def next_move(game, rng):
+    # Rulează pe actor: o mutare spre un item vecin, altfel una la întâmplare
+    name = game['current_turn']
+    if game['phase'] != 'playing' or name is None:
+        return None, None
+    grid, player = game['grid'], game['players'][name]
+    steps = {'UP': (0, -1), 'DOWN': (0, 1), 'LEFT': (-1, 0), 'RIGHT': (1, 0)}
+    for direction, (dx, dy) in steps.items():
+        x, y = player['x'] + dx, player['y'] + dy
+        if grid.in_bounds(x, y) and grid.board[y * grid.size + x] >= joc.FIRST_ITEM_CODE:
+            return name, direction
+    return name, rng.choice(sorted(steps))
+
+
+def comparable(registry):
+    """Starea camerei fără ce refacerea reînnoiește intenționat (epoca, prezența, termenul turei)"""
+    def read(game):
+        data = joc.export_state(game)
+        for key in ('epoch', 'turn_deadline'):
+            data.pop(key)
+        for player in data['players'].values():
+            player.pop('last_seen')
+        # Prin JSON, ca tuplurile unei stări importate să arate ca listele celei vii
+        return joc.json_decode(joc.json_bytes(data)), game['rng'].getstate()
+    return registry.call(ROOM, read, create=False)
+
+
+def test_replay_rebuilds_the_live_state(journal):
+    event_log, registry = journal()
+    play(registry, moves=60)
+    live = comparable(registry)
+    assert live[0]['found_items'], 'mutările trebuie să găsească măcar un item'
+    event_log.close()
+
+    # Momentele item-urilor găsite și ale mesajelor vin din jurnal, nu din ceasul refacerii
+    _, replayed = journal()
+    assert comparable(replayed) == live
+
+
+def test_rotation_and_checkpoint_then_replay(journal):
+    event_log, registry = journal(segment_records=5)
+    play(registry, moves=60)
+    live = comparable(registry)
+    event_log.sync(timeout=5)
+    # Checkpoint-ul șterge segmentele vechi; rămân doar cele de după ultima stare scrisă
+    deadline = joc.time.time() + 5
+    while (event_log._checkpointing or 1 in event_log.segments()) and joc.time.time() < deadline:
+        joc.time.sleep(0.01)
+    assert event_log.segments()[0] > 1
+    event_log.close()
+
+    _, replayed = journal()
+    assert comparable(replayed) == live
+
+
+def test_truncated_final_record_is_skipped(journal):
+    event_log, registry = journal()
+    play(registry, moves=10)
+    live = comparable(registry)
+    event_log.close()
+
+    # Căderea a lăsat pe disc doar începutul ultimei înregistrări
+    last = event_log.segment_path(event_log.segments()[-1])
+    with open(last, 'ab') as f:
+        f.write(b'["jurnal", "move", ["ana", "UP"')
+
+    _, replayed = journal()
+    assert comparable(replayed) == live
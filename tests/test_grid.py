@@ -0,0 +1,38 @@
+"""GridIndex: eșantionarea celulelor libere și plasarea item-urilor."""
+import joc
+
+
+def seeded_state(monkeypatch, room_id, seed='7'):
+    monkeypatch.setattr(joc, 'ROOM_SEED', seed)
+    return joc.new_game_state(room_id)
+
+
+def test_sample_free_is_deterministic_under_a_room_seed(monkeypatch):
+    first = seeded_state(monkeypatch, 'seeded')
+    second = seeded_state(monkeypatch, 'seeded')
+    cells = first['grid'].sample_free(40, first['rng'])
+    assert cells == second['grid'].sample_free(40, second['rng'])
+    assert len(set(cells)) == 40
+
+    other = seeded_state(monkeypatch, 'seeded', seed='8')
+    assert other['grid'].sample_free(40, other['rng']) != cells
+
+
+def test_sample_free_skips_occupied_cells_and_stops_when_full(monkeypatch):
+    state = seeded_state(monkeypatch, 'dense')
+    grid = state['grid']
+    for index in range(grid.size * grid.size - 5):
+        grid.add_bomb(index % grid.size, index // grid.size, 'ana')
+    grid.place_player('ana', grid.size - 1, grid.size - 1)
+
+    cells = grid.sample_free(50, state['rng'])
+    assert len(cells) == 4 == grid.free_cells()
+    assert all(grid.is_free(x, y) for x, y in cells)
+
+
+def test_generate_hidden_items_places_ten_per_player(monkeypatch):
+    state = seeded_state(monkeypatch, 'items')
+    for name in ('ana', 'bob'):
+        joc.add_player(state, name)
+    joc.generate_hidden_items(state)
+    assert state['grid'].item_count == 20
@@ -0,0 +1,71 @@
+"""Camerele replicate (modul distribuit): instalarea snapshot-urilor primite de la deținător."""
+import pytest
+
+import joc
+
+
+@pytest.fixture
+def registry():
+    return joc.RoomRegistry(joc.STATE_SHARDS)
+
+
+def owner_state(room_id, players=('ana',)):
+    """Starea exportată de un deținător, cu jucătorii dați"""
+    state = joc.new_game_state(room_id)
+    for name in players:
+        joc.add_player(state, name)
+    return joc.export_state(state)
+
+
+def install(registry, room_id, data, version):
+    return registry.install(room_id, data, version).result(timeout=5)
+
+
+def test_same_epoch_ignores_stale_versions(registry):
+    data = owner_state('replica1')
+    assert install(registry, 'replica1', data, 10)
+    stale = dict(data, players={})
+    assert not install(registry, 'replica1', stale, 9)
+    assert registry.peek('replica1').snapshot()['version'] == 10
+    assert list(registry.peek('replica1').snapshot()['players']) == ['ana']
+
+
+def test_new_epoch_replaces_the_replica_whatever_the_version(registry):
+    assert install(registry, 'replica2', owner_state('replica2'), 500)
+    old_room = registry.peek('replica2')
+
+    # Workerii au repornit: camera recreată are altă epocă și versiuni mici
+    recreated = owner_state('replica2', players=('bob',))
+    assert install(registry, 'replica2', recreated, 3)
+    room = registry.peek('replica2')
+    assert room is not old_room
+    snapshot = room.snapshot()
+    assert (snapshot['epoch'], snapshot['version']) == (recreated['epoch'], 3)
+    assert list(snapshot['players']) == ['bob']
+    # Următoarele versiuni ale noii epoci se aplică normal
+    assert install(registry, 'replica2', dict(recreated, players={}), 4)
+    assert registry.peek('replica2').snapshot()['players'] == {}
+
+
+def test_snapshot_without_board_changes_reuses_the_replica_grid(registry):
+    state = joc.new_game_state('replica3')
+    joc.add_player(state, 'ana')
+    data = joc.export_state(state)
+    assert install(registry, 'replica3', data, 1)
+    grid = registry.peek('replica3').state['grid']
+
+    # O mutare: harta e aceeași, doar jucătorul are altă poziție
+    player = dict(data['players']['ana'], x=(data['players']['ana']['x'] + 1) % joc.GRID_SIZE)
+    assert install(registry, 'replica3', dict(data, players={'ana': player}), 2)
+    state = registry.peek('replica3').state
+    assert state['grid'] is grid
+    assert grid.players == {(player['x'], player['y']): {'ana'}}
+
+    # O bombă schimbă harta: grila se reconstruiește din snapshot
+    owner = joc.new_game_state('replica3')
+    owner['grid'].add_bomb(0, 0, 'ana')
+    assert install(registry, 'replica3', dict(data, grid=owner['grid'].exported()), 3)
+    state = registry.peek('replica3').state
+    assert state['grid'] is not grid
+    assert state['grid'].bomb_owners == {0: 'ana'}
+    assert registry.peek('replica3').snapshot()['board'][0] == joc.CELL_BOMB
@@ -0,0 +1,82 @@
+"""Răspunsurile delta din /api/state: aplicate peste o stare veche reproduc starea completă."""
+import json
+import random
+
+import joc
+
+# Ce actualizează applyDelta din pagină; restul cheilor rămân din starea veche
+DELTA_KEYS = joc.META_KEYS + ('version', 'players', 'bombs', 'explored', 'found_items', 'chat')
+
+
+def apply_delta(state, delta):
+    """Ca applyDelta din HTML: celulele schimbate se înlocuiesc complet"""
+    merged = dict(state)
+    for key in joc.META_KEYS + ('version',):
+        merged[key] = delta[key]
+    merged['players'] = {**state['players'], **delta['players']}
+    for name in delta['removed_players']:
+        del merged['players'][name]
+
+    changed = {(cell['x'], cell['y']) for cell in delta['cells']}
+    merged['bombs'] = [bomb for bomb in state['bombs'] if (bomb['x'], bomb['y']) not in changed]
+    merged['explored'] = [cell for cell in state['explored'] if tuple(cell) not in changed]
+    merged['found_items'] = [item for item in state['found_items'] if (item['x'], item['y']) not in changed]
+    for cell in delta['cells']:
+        if cell['bomb']:
+            merged['bombs'].append(cell['bomb'])
+        if cell['explored']:
+            merged['explored'].append([cell['x'], cell['y']])
+        if cell['found']:
+            merged['found_items'].append(cell['found'])
+    merged['chat'] = (state['chat'] + delta['chat'])[-joc.CHAT_HISTORY:]
+    return merged
+
+
+def comparable(state):
+    result = {key: state[key] for key in DELTA_KEYS}
+    for key in ('bombs', 'explored', 'found_items'):
+        result[key] = sorted(result[key], key=lambda entry: json.dumps(entry, sort_keys=True))
+    return result
+
+
+def project(published, player, since=None):
+    viewport = joc.player_viewport(published[0], player)
+    return json.loads(joc.project_state(published, player, viewport, since).body)
+
+
+def test_delta_over_any_recent_version_reproduces_the_full_state(monkeypatch):
+    monkeypatch.setattr(joc, 'ROOM_SEED', 'delta')
+    monkeypatch.setattr(joc, 'TURN_TIMEOUT', 0)
+    room = joc.Room('delta')
+    state = room.state
+    for name in ('ana', 'bob', 'cris'):
+        joc.add_player(state, name, grid_size=12)
+    for name in ('ana', 'bob', 'cris'):
+        for x in range(joc.MAX_BOMBS):
+            joc.place_bomb_setup(state, name, x, {'ana': 2, 'bob': 6, 'cris': 9}[name])
+    if state['phase'] != 'playing':
+        joc.start_game(state)
+    room.publish()
+
+    rng = random.Random(1)
+    history = [room.published()]
+    while len(history) < 40 and state['phase'] == 'playing':
+        joc.move_player(state, state['current_turn'], rng.choice(joc.MOVE_DIRECTIONS[1:]))
+        if room.publish():
+            history.append(room.published())
+
+    latest = room.published()
+    applied = 0
+    for player in ('ana', 'bob', 'cris'):
+        full = project(latest, player)
+        for published in history[:-1]:
+            since = published[0]['version']
+            response = project(latest, player, since)
+            if not response.get('delta'):
+                # Fază schimbată (ex. joc terminat): clientul primește starea completă
+                assert comparable(response) == comparable(full)
+                continue
+            old = project(published, player)
+            assert comparable(apply_delta(old, response)) == comparable(full)
+            applied += 1
+    assert applied > 0
@@ -0,0 +1,53 @@
+"""Statisticile în modul distribuit: front-end-ul 'web' agregă evenimentele workerilor."""
+import time
+
+import pytest
+
+import bench
+import joc
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def web_mode(monkeypatch):
+    """Procesul ca front-end 'web' pe brokerul din bench.py; la final revine la modul 'all'"""
+    # Evenimentele altor teste (fără broker) nu trebuie să ajungă în același lot cu ale noastre
+    joc.async_publisher.flush()
+    monkeypatch.setattr(joc.pika, 'BlockingConnection', bench.FakeConnection)
+    engine, owned_shards = joc.consumer_engine, joc.rooms.owned_shards
+    joc.run_web()
+    yield
+    joc.consumer_engine.stop()
+    joc.consumer_engine = engine
+    joc.rooms.owned_shards = owned_shards
+
+
+def test_web_front_end_serves_stats_published_by_workers(web_mode):
+    assert wait_for(lambda: bench.broker.bindings[joc.EXCHANGE_STATS])
+
+    # Ce publică un worker când aplică un join și un item găsit
+    joc.enqueue_message(joc.QUEUE_STATE, {'type': 'player_join', 'room': 'stats1', 'player': 'ana'})
+    joc.enqueue_message(joc.QUEUE_STATISTICS, {'type': 'item_found', 'room': 'stats1', 'item_type': 'star'})
+    assert joc.async_publisher.flush()
+
+    client = joc.app.test_client()
+
+    def aggregated():
+        # Cele două notificări pot sosi în orice ordine (cozi diferite, benzi de publicare diferite)
+        joc.stats_engine.flush()
+        stats = client.get('/api/stats?room=stats1').get_json()
+        return stats['joins'] == 1 and stats['items_found_total'] == 1
+
+    assert wait_for(aggregated)
+    stats = client.get('/api/stats?room=stats1').get_json()
+    assert stats['joins'] == 1
+    assert stats['items_found'] == {'star': 1}
+    assert client.get('/api/stats').get_json()['joins'] >= 1
@@ -0,0 +1,59 @@
+"""TurnRing: ordinea turelor la intrări, eliminări și rotire."""
+import pytest
+
+import joc
+
+
+def test_ring_keeps_join_order_and_wraps_around():
+    ring = joc.TurnRing(['ana', 'bob', 'cris'])
+    ring.append('ana')
+    assert ring.order() == ('ana', 'bob', 'cris')
+    assert [ring.next_of(name) for name in ring] == ['bob', 'cris', 'ana']
+    # Un jucător necunoscut (ex. tura unui eliminat) trece la primul
+    assert ring.next_of('nimeni') == 'ana'
+
+
+@pytest.mark.parametrize('removed, following, order', [
+    ('ana', 'bob', ('bob', 'cris', 'dan')),
+    ('cris', 'dan', ('ana', 'bob', 'dan')),
+    ('dan', 'ana', ('ana', 'bob', 'cris')),
+])
+def test_remove_returns_the_next_player_and_relinks(removed, following, order):
+    ring = joc.TurnRing(['ana', 'bob', 'cris', 'dan'])
+    assert ring.remove(removed) == following
+    assert ring.order() == order
+    assert removed not in ring and len(ring) == 3
+    assert [ring.next_of(name) for name in order] == list(order[1:] + order[:1])
+
+
+def test_ring_survives_eliminations_down_to_empty():
+    ring = joc.TurnRing(['ana', 'bob', 'cris'])
+    assert ring.remove('bob') == 'cris'
+    ring.append('dan')
+    assert ring.order() == ('ana', 'cris', 'dan')
+    assert ring.remove('ana') == 'cris'
+    assert ring.remove('dan') == 'cris'
+    assert ring.order() == ('cris',) and ring.next_of('cris') == 'cris'
+    assert ring.remove('cris') is None
+    assert ring.order() == () and ring.head is None
+    assert ring.remove('cris') is None
+
+
+def test_eliminating_the_current_player_passes_the_turn_on(monkeypatch):
+    monkeypatch.setattr(joc, 'TURN_TIMEOUT', 0)
+    game = joc.new_game_state('turns')
+    for name in ('ana', 'bob', 'cris', 'dan'):
+        joc.add_player(game, name)
+    game['phase'] = 'playing'
+    joc.set_turn(game, 'bob')
+
+    joc.eliminate_player(game, 'bob')
+    assert game['current_turn'] == 'cris'
+    joc.next_turn(game)
+    assert game['current_turn'] == 'dan'
+    # Eliminarea altui jucător nu mută tura
+    joc.eliminate_player(game, 'ana')
+    assert game['current_turn'] == 'dan'
+    joc.next_turn(game)
+    assert game['current_turn'] == 'cris'
+    assert list(game['player_order']) == ['cris', 'dan']